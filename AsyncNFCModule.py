@@ -0,0 +1,715 @@
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+try:
+    from time import ticks_ms, ticks_us, ticks_diff
+except ImportError:  # CPython, for off-device testing
+    from time import monotonic
+
+    def ticks_ms():
+        return int(monotonic() * 1000)
+
+    def ticks_us():
+        return int(monotonic() * 1000000)
+
+    def ticks_diff(a, b):
+        return a - b
+
+from mifare_keys import MifareKeyManager
+from mifare_layout import (MIFARE_BLOCK_SIZE, MIFARE_1K_SECTORS, classic_trailer, mifare_block_writable,
+                           mifare_sector_blocks, mifare_sector_first_block, mifare_sector_of)
+from ndef import NDEFDecoder
+from nfc_stats import STAT_BUS_ERRORS, STAT_ACK_FAILURES, STAT_NACKS, STAT_RETRIES, STAT_ABORTS, STAT_RESETS
+from NFCModule import (
+    NFC_Module,
+    PN532_I2C_ADDRESS,
+    PN532_ACK_TIMEOUT_MS,
+    PN532_COMMAND_TIMEOUTS,
+    PN532_DEFAULT_TIMEOUT_MS,
+    PN532_POLL_MIN_MS,
+    PN532_POLL_MAX_MS,
+    PN532_HEADER_LEN,
+    PN532_FRAME_ERROR,
+    PN532_RETRIES,
+    PN532_RETRY_BACKOFF_MS,
+    PN532_RESET_PULSE_MS,
+    PN532_RESET_BOOT_MS,
+    PN532_SAM_NORMAL_FRAME,
+    PN532_COMMAND_GETFIRMWAREVERSION,
+    PN532_COMMAND_SAMCONFIGURATION,
+    PN532_COMMAND_SETPARAMETERS,
+    PN532_COMMAND_POWERDOWN,
+    PN532_WAKE_POLL_MS,
+    PN532_WAKE_TIMEOUT_MS,
+    WAKE_I2C,
+    WAKE_RF,
+    PN532_COMMAND_TGGETDATA,
+    PN532_MAX_TARGETS,
+    MIFARE_CMD_READ,
+    NTAG_CMD_GET_VERSION,
+    NTAG_CMD_READ,
+    NTAG_CMD_FAST_READ,
+    NTAG_PAGE_SIZE,
+    NTAG_READ_PAGES,
+    NTAG_DATA_START_PAGE,
+    NTAG_CONFIG_START_PAGE,
+    NTAG_CONFIG_TAIL_PAGES,
+    NTAG_FAST_READ_MAX_PAGES,
+    AUTOPOLL_ENDLESS,
+    AUTOPOLL_EXPECT,
+    AUTOPOLL_TIMEOUT_MS,
+    AUTOPOLL_TYPE_MIFARE,
+    RF_PROFILES,
+    RFCFG_FIELD,
+    RF_FIELD_DATA,
+    P2P_BAUD_424,
+    P2P_MI,
+    P2P_STATUS_MASK,
+    P2P_CHUNK_MAX,
+    P2P_TIMEOUT_MS,
+    P2P_ATR_EXPECT,
+)
+
+# One lock per I2C bus, shared by every driver instance on that bus
+_bus_locks = {}
+
+
+def bus_lock(i2c):
+    """Get the lock that serialises commands on ``i2c``"""
+    lock = _bus_locks.get(id(i2c))
+    if lock is None:
+        lock = _bus_locks[id(i2c)] = asyncio.Lock()
+    return lock
+
+
+class AsyncNFC_Module(NFC_Module):
+    """
+    uasyncio twin of NFC_Module
+
+    Commands are awaitable and yield to the event loop while the PN532 is
+    busy, so LEDs, other readers and networking keep running. Frame encoding
+    and decoding are inherited from NFC_Module; only the transport differs.
+    Every command holds the bus lock from the command frame to its response.
+    """
+    def __init__(self, i2c, irq=None, lock=None, reset=None, retries=PN532_RETRIES, bus_factory=None,
+                 address=PN532_I2C_ADDRESS):
+        """
+        Args:
+            i2c (I2C): Bus the PN532 is attached to
+            irq (Pin, optional): PN532 IRQ line (active low)
+            lock (Lock, optional): Overrides the per-bus lock from bus_lock()
+            reset, retries, bus_factory: Recovery settings, as for NFC_Module
+            address (int): 7-bit I2C address of this PN532
+        """
+        super().__init__(i2c, irq, reset, retries, bus_factory, address)
+        self.lock = lock if lock is not None else bus_lock(i2c)
+
+    async def get_version(self):
+        """Get PN532 firmware version"""
+        async with self.lock:
+            self.nfc_buf[0] = PN532_COMMAND_GETFIRMWAREVERSION
+            return self._parse_version(await self._transceive(1, 4))
+
+    async def sam_configuration(self, mode=0x01, timeout=0x14, irq=0x00):
+        """Configure the Secure Access Module"""
+        async with self.lock:
+            self.nfc_buf[0] = PN532_COMMAND_SAMCONFIGURATION
+            self.nfc_buf[1] = mode
+            self.nfc_buf[2] = timeout
+            self.nfc_buf[3] = irq
+            return await self._transceive(4, 0) is not None
+
+    async def power_down(self, wake=WAKE_I2C | WAKE_RF, generate_irq=None):
+        """Put the PN532 into PowerDown until one of the ``wake`` sources fires"""
+        if generate_irq is None:
+            generate_irq = self.irq is not None
+        async with self.lock:
+            self.nfc_buf[0] = PN532_COMMAND_POWERDOWN
+            self.nfc_buf[1] = wake
+            self.nfc_buf[2] = 0x01 if generate_irq else 0x00
+            if not self._parse_ok(await self._transceive(3, 1)):
+                return False
+            self._went_down()
+            return True
+
+    async def wake(self):
+        """Bring the chip out of PowerDown, yielding while its oscillator starts"""
+        if not self.asleep:
+            return True
+        start = ticks_ms()
+        while not self._wake_probe():
+            if ticks_diff(ticks_ms(), start) >= PN532_WAKE_TIMEOUT_MS:
+                return False
+            await asyncio.sleep(PN532_WAKE_POLL_MS / 1000)
+        return True
+
+    async def set_parameters(self, flags):
+        """Set the SetParameters flags; skipped if the chip already has them"""
+        if flags == self._params:
+            return True
+        async with self.lock:
+            self.nfc_buf[0] = PN532_COMMAND_SETPARAMETERS
+            self.nfc_buf[1] = flags
+            if await self._transceive(2, 0) is None:
+                return False
+            self._params = flags
+            return True
+
+    async def rf_configuration(self, item, data):
+        """Send one RFConfiguration item; skipped if the chip already has ``data``"""
+        if self._rf_config.get(item) == data:
+            return True
+        async with self.lock:
+            cmd_len = self._prep_rf_config(item, data)
+            if await self._transceive(cmd_len, 0) is None:
+                return False
+            self._rf_config[item] = bytes(data)
+            return True
+
+    async def rf_field(self, on, auto_rfca=False):
+        """Switch the RF field on or off"""
+        return await self.rf_configuration(RFCFG_FIELD, RF_FIELD_DATA[(2 if auto_rfca else 0) | (1 if on else 0)])
+
+    async def apply_profile(self, name):
+        """Switch to one of RF_PROFILES, sending only the settings that differ"""
+        if name == self.profile:
+            return True
+        profile = RF_PROFILES[name]
+        self.profile = None
+        if not await self.set_parameters(profile.params):
+            return False
+        for item, data in profile.items:
+            if not await self.rf_configuration(item, data):
+                return False
+        self.profile = name
+        return True
+
+    async def in_list_passive_target(self, brty=0x00, maxtg=0x01):
+        """Look for NFC tags"""
+        async with self.lock:
+            return await self._poll(brty, maxtg)
+
+    async def _poll(self, brty=0x00, maxtg=0x01):
+        """in_list_passive_target() with the bus lock already held"""
+        cmd_len = self._prep_in_list(maxtg, brty)
+        return self._parse_uid(await self._transceive(cmd_len, 13))
+
+    async def inventory(self, maxtg=PN532_MAX_TARGETS, brty=0x00):
+        """List every ISO14443A target in the field in one round trip"""
+        maxtg = min(maxtg, PN532_MAX_TARGETS)
+        async with self.lock:
+            cmd_len = self._prep_in_list(maxtg, brty)
+            return self._parse_inventory(await self._transceive(cmd_len, 1 + 12 * maxtg))
+
+    async def autopoll(self, timeout_ms=AUTOPOLL_TIMEOUT_MS, poll_nr=AUTOPOLL_ENDLESS, period=1, types=(AUTOPOLL_TYPE_MIFARE,)):
+        """
+        Wait for a target with InAutoPoll without blocking the event loop
+
+        The bus lock is held for the whole poll, so other readers on the same
+        bus should use their own bus or a short ``timeout_ms``.
+
+        Returns:
+            list: PN532Target records, empty if nothing was found in time
+        """
+        async with self.lock:
+            cmd_len = self._prep_autopoll(poll_nr, period, types)
+            if not await self._write_cmd_check_ack_async(cmd_len):
+                return []
+            if not await self._await_ready(timeout_ms):
+                self.cancel_autopoll()
+                return []
+            return self._parse_autopoll(await self._read_response_async(AUTOPOLL_EXPECT))
+
+    async def mifare_authenticate(self, auth_type, block, uid, key):
+        """Authenticate a Mifare card block"""
+        async with self.lock:
+            return await self._authenticate(auth_type, block, uid, key)
+
+    async def _authenticate(self, auth_type, block, uid, key):
+        """mifare_authenticate() with the bus lock already held"""
+        cmd_len = self._prep_auth(auth_type, block, uid, key)
+        return self._parse_ok(await self._transceive(cmd_len, 1))
+
+    async def mifare_read_block(self, block, buf=None, use_cache=True):
+        """Read a Mifare card block"""
+        data = self._cache_get(block, buf, use_cache)
+        if data is not None:
+            return data
+        async with self.lock:
+            return await self._read_block(block, buf)
+
+    async def _read_block(self, block, buf=None):
+        """mifare_read_block() from the card, with the bus lock already held"""
+        cmd_len = self._prep_exchange(MIFARE_CMD_READ, block)
+        data = self._parse_block(await self._transceive(cmd_len, 17), buf)
+        self._cache_put(block, data)
+        return data
+
+    async def mifare_write_block(self, block, data):
+        """Write data to a Mifare card block; the content cache is written through"""
+        if len(data) != 16:
+            return False
+        async with self.lock:
+            return await self._write_block(block, data)
+
+    async def _write_block(self, block, data):
+        """mifare_write_block() with the bus lock already held"""
+        cmd_len = self._prep_write(block, data)
+        ok = self._parse_ok(await self._transceive(cmd_len, 1))
+        self._cache_write(block, data, ok and not classic_trailer(block))
+        return ok
+
+    async def mifare_auth_sector(self, sector, uid, keys):
+        """Authenticate a sector with the first key of a MifareKeyManager that works"""
+        async with self.lock:
+            return await self._auth_sector(sector, uid, keys)
+
+    async def _auth_sector(self, sector, uid, keys):
+        """mifare_auth_sector() with the bus lock already held"""
+        first = mifare_sector_first_block(sector)
+        for auth_type, key in keys.candidates(uid, sector):
+            if await self._authenticate(auth_type, first, uid, key):
+                keys.remember(uid, sector, auth_type, key)
+                return auth_type, key
+            if not self._same_uid(await self._poll(), uid):
+                return None
+        keys.forget(uid, sector)
+        return None
+
+    async def read_sector(self, sector, uid, key, buf, offset=0, auth_type=0, use_cache=True):
+        """Authenticate once and read every block of a sector"""
+        first = mifare_sector_first_block(sector)
+        blocks = mifare_sector_blocks(sector)
+        if use_cache and self.cache is not None and self.cache.read_into(uid, first, blocks, buf, offset):
+            return True
+        # One lock hold from authentication to the last block, so no other
+        # command on this reader can reselect the card in between
+        async with self.lock:
+            if isinstance(key, MifareKeyManager):
+                if await self._auth_sector(sector, uid, key) is None:
+                    return False
+            elif not await self._authenticate(auth_type, first, uid, key):
+                return False
+
+            cmd_len = self._prep_exchange(MIFARE_CMD_READ, first)
+            pos = offset
+            for block in range(first, first + blocks):
+                self.nfc_buf[3] = block
+                if not self._parse_pages(await self._transceive(cmd_len, 17), MIFARE_BLOCK_SIZE, buf, pos):
+                    return False
+                pos += MIFARE_BLOCK_SIZE
+            if self.cache is not None:
+                self.cache.write_from(uid, first, blocks, MIFARE_BLOCK_SIZE, buf, offset)
+            return True
+
+    async def dump_card(self, uid, key, buf, sectors=MIFARE_1K_SECTORS, auth_type=0, use_cache=True):
+        """Read a whole Mifare Classic card; returns the sectors that failed"""
+        failed = []
+        for sector in range(sectors):
+            offset = mifare_sector_first_block(sector) * MIFARE_BLOCK_SIZE
+            if not await self.read_sector(sector, uid, key, buf, offset, auth_type, use_cache):
+                failed.append(sector)
+                if not self._same_uid(await self.in_list_passive_target(), uid):
+                    failed.extend(range(sector + 1, sectors))
+                    break
+        return failed
+
+    async def mifare_write_image(self, uid, key, image, first_block=0, auth_type=0, verify=True,
+                                 allow_trailers=False, use_cache=True):
+        """Bring a run of Mifare Classic blocks to ``image``, writing only blocks that differ"""
+        end = first_block + len(image) // MIFARE_BLOCK_SIZE
+        img = memoryview(image)
+        cur = bytearray(MIFARE_BLOCK_SIZE)
+        failed = []
+        self.write_blocks = 0
+        block = first_block
+        while block < end:
+            sector = mifare_sector_of(block)
+            last = min(end, mifare_sector_first_block(sector) + mifare_sector_blocks(sector))
+            blocks = [b for b in range(block, last) if mifare_block_writable(b, allow_trailers)]
+            if blocks:
+                await self._write_sector_image(sector, uid, key, auth_type, blocks, img, first_block,
+                                               cur, verify, use_cache, failed)
+            block = last
+        return failed
+
+    async def _write_sector_image(self, sector, uid, key, auth_type, blocks, img, first_block,
+                                  cur, verify, use_cache, failed):
+        """Diff, write and verify ``blocks`` of one sector under one bus lock hold"""
+        # No other command on this reader may poll or authenticate between
+        # the authentication and the last write or verify read
+        async with self.lock:
+            authed = False
+            todo = []
+            for i, block in enumerate(blocks):
+                if classic_trailer(block):
+                    todo.append(block)
+                    continue
+                data = self.cache.get(uid, block) if use_cache and self.cache is not None else None
+                if data is None:
+                    if not authed:
+                        authed = await self._auth_key(sector, uid, key, auth_type)
+                    data = await self._read_block(block, cur) if authed else None
+                    if data is None:
+                        return await self._abandon_write(uid, todo + blocks[i:], failed)
+                if not self._same_data(data, img, (block - first_block) * MIFARE_BLOCK_SIZE, MIFARE_BLOCK_SIZE):
+                    todo.append(block)
+            if not todo:
+                return
+            if not authed and not await self._auth_key(sector, uid, key, auth_type):
+                return await self._abandon_write(uid, todo, failed)
+
+            for i, block in enumerate(todo):
+                pos = (block - first_block) * MIFARE_BLOCK_SIZE
+                if not await self._write_block(block, img[pos:pos + MIFARE_BLOCK_SIZE]):
+                    return await self._abandon_write(uid, todo[i:], failed)
+                self.write_blocks += 1
+            if not verify:
+                return
+            for i, block in enumerate(todo):
+                if classic_trailer(block):
+                    continue
+                if await self._read_block(block, cur) is None:
+                    return await self._abandon_write(uid, todo[i:], failed)
+                if not self._same_data(cur, img, (block - first_block) * MIFARE_BLOCK_SIZE, MIFARE_BLOCK_SIZE):
+                    failed.append(block)
+
+    async def _abandon_write(self, uid, blocks, failed):
+        """Give up on ``blocks`` and reselect the card; the caller holds the bus lock"""
+        failed.extend(blocks)
+        await self._poll()
+
+    async def _auth_key(self, sector, uid, key, auth_type):
+        """_auth_sector() or _authenticate(); the caller holds the bus lock"""
+        if isinstance(key, MifareKeyManager):
+            return await self._auth_sector(sector, uid, key) is not None
+        return await self._authenticate(auth_type, mifare_sector_first_block(sector), uid, key)
+
+    async def ntag_page_count(self):
+        """Get the total number of pages of an NTAG21x from GET_VERSION"""
+        async with self.lock:
+            self._prep_thru(NTAG_CMD_GET_VERSION)
+            return self._parse_page_count(await self._transceive(2, 9))
+
+    async def ntag_read_pages(self, page, buf=None):
+        """Read four pages with the Type 2 READ command"""
+        async with self.lock:
+            self._prep_thru(NTAG_CMD_READ, page)
+            return self._parse_block(await self._transceive(3, 17), buf)
+
+    async def ntag_fast_read(self, start, end, buf, offset=0):
+        """Read pages ``start`` to ``end`` (inclusive) with one FAST_READ"""
+        count = (end - start + 1) * NTAG_PAGE_SIZE
+        async with self.lock:
+            self._prep_thru(NTAG_CMD_FAST_READ, start, end)
+            return self._parse_pages(await self._transceive(4, count + 1), count, buf, offset)
+
+    async def ntag_read(self, start, pages, buf, offset=0, fast=True, use_cache=True):
+        """Read a page range, split into as few transactions as the frame allows"""
+        uid = self._selected_uid()
+        cache = self.cache if uid is not None else None
+        if use_cache and cache is not None and cache.read_into(uid, start, pages, buf, offset):
+            return True
+
+        end = start + pages
+        page = start
+        pos = offset
+        while page < end:
+            if fast:
+                last = min(end, page + NTAG_FAST_READ_MAX_PAGES) - 1
+                if not await self.ntag_fast_read(page, last, buf, pos):
+                    return False
+                pos += (last - page + 1) * NTAG_PAGE_SIZE
+                page = last + 1
+                continue
+
+            count = min(NTAG_READ_PAGES, end - page) * NTAG_PAGE_SIZE
+            async with self.lock:
+                self._prep_thru(NTAG_CMD_READ, page)
+                if not self._parse_pages(await self._transceive(3, 17), count, buf, pos):
+                    return False
+            pos += count
+            page += count // NTAG_PAGE_SIZE
+        if cache is not None:
+            cache.write_from(uid, start, pages, NTAG_PAGE_SIZE, buf, offset)
+        return True
+
+    async def ntag_write_page(self, page, data):
+        """Write one 4-byte page of a Type 2 tag; the content cache is written through"""
+        if len(data) != NTAG_PAGE_SIZE:
+            return False
+        async with self.lock:
+            cmd_len = self._prep_ntag_write(page, data)
+            ok = self._parse_ok(await self._transceive(cmd_len, 1))
+            self._cache_write(page, data, ok)
+            return ok
+
+    async def ntag_write_image(self, start, image, verify=True, allow_config=False, fast=True, use_cache=True):
+        """Bring a page range of a Type 2 tag to ``image``, writing only pages that differ"""
+        pages = len(image) // NTAG_PAGE_SIZE
+        first = max(start, NTAG_CONFIG_START_PAGE if allow_config else NTAG_DATA_START_PAGE)
+        end = start + pages
+        self.write_blocks = 0
+        if first >= end:
+            return []
+        if not allow_config:
+            total = await self.ntag_page_count()
+            if not total:
+                return list(range(first, end))
+            end = min(end, total - NTAG_CONFIG_TAIL_PAGES)
+            if first >= end:
+                return []
+        cur = bytearray(pages * NTAG_PAGE_SIZE)
+        if not await self.ntag_read(start, end - start, cur, 0, fast, use_cache):
+            return list(range(first, end))
+
+        img = memoryview(image)
+        curmv = memoryview(cur)
+        failed = []
+        written = []
+        for page in range(first, end):
+            pos = (page - start) * NTAG_PAGE_SIZE
+            if self._same_data(curmv[pos:], img, pos, NTAG_PAGE_SIZE):
+                continue
+            if not await self.ntag_write_page(page, img[pos:pos + NTAG_PAGE_SIZE]):
+                failed.append(page)
+                continue
+            written.append(page)
+        self.write_blocks = len(written)
+        if not verify or not written:
+            return failed
+
+        # One read from the first to the last page written; pages in between
+        # that were skipped or failed are not checked
+        low = written[0]
+        pos = (low - start) * NTAG_PAGE_SIZE
+        if not await self.ntag_read(low, written[-1] + 1 - low, cur, pos, fast, False):
+            return sorted(failed + written)
+        for page in written:
+            pos = (page - start) * NTAG_PAGE_SIZE
+            if not self._same_data(curmv[pos:], img, pos, NTAG_PAGE_SIZE):
+                failed.append(page)
+        return sorted(failed)
+
+    async def ntag_read_ndef(self, buf, stop=None, fast=True):
+        """Read the NDEF message of a Type 2 tag, fetching only the pages it needs"""
+        dec = NDEFDecoder(buf)
+        records = []
+        avail = 0
+        while not dec.done:
+            want = max(dec.need, avail + NTAG_READ_PAGES * NTAG_PAGE_SIZE)
+            if dec.end:
+                # Without a stop callback the rest of the message goes in one read
+                want = dec.end if stop is None else min(want, dec.end)
+            pages = min((want - avail + NTAG_PAGE_SIZE - 1) // NTAG_PAGE_SIZE, (len(buf) - avail) // NTAG_PAGE_SIZE)
+            if avail + pages * NTAG_PAGE_SIZE < dec.need:
+                return None
+            if not await self.ntag_read(NTAG_DATA_START_PAGE + avail // NTAG_PAGE_SIZE, pages, buf, avail, fast):
+                return None
+            avail += pages * NTAG_PAGE_SIZE
+            for record in dec.feed(avail):
+                records.append(record)
+                if stop is not None and stop(record):
+                    return records
+        return records
+
+    async def p2p_initiator_init(self, baud=P2P_BAUD_424, active=True, gi=None, debug=False):
+        """Configure PN532 as an initiator in Peer-to-Peer mode (InJumpForDEP)"""
+        async with self.lock:
+            cmd_len = self._prep_jump_for_dep(baud, active, gi)
+            resp = await self._transceive(cmd_len, 17)
+            if debug and resp is not None:
+                print("Response after InJumpForDEP command:")
+                print(" ".join(f"{byte:02X}" for byte in resp.data))
+            if not self._parse_ok(resp) or len(resp.data) < 2:
+                return False
+            self.target = resp.data[1]
+            return True
+
+    async def p2p_exchange(self, tx, rx, offset=0):
+        """Send ``tx`` to the DEP target and receive its chained reply into ``rx``"""
+        async with self.lock:
+            start = ticks_us()
+            resp = await self._dep_send(tx, self._prep_dep_data, P2P_CHUNK_MAX + 1)
+            count = await self._dep_receive(resp, rx, offset, self._prep_dep_data(b'', False))
+            self._p2p_done(len(tx), count, start)
+            return count
+
+    async def p2p_target_init(self, timeout_ms=None, gt=None):
+        """
+        Wait to be activated as a DEP target (TgInitAsTarget)
+
+        The bus lock is held while waiting, as in autopoll().
+        """
+        async with self.lock:
+            cmd_len = self._prep_tg_init(gt)
+            if not await self._write_cmd_check_ack_async(cmd_len):
+                return False
+            if not await self._await_ready(timeout_ms):
+                self._abort()
+                return False
+            resp = await self._read_response_async(P2P_ATR_EXPECT)
+            if resp is None or resp.kind == PN532_FRAME_ERROR or not len(resp.data):
+                return False
+            self.p2p_mode = resp.data[0]
+            return True
+
+    async def p2p_target_receive(self, rx, offset=0):
+        """Receive the initiator's payload into ``rx``, following MI chaining"""
+        async with self.lock:
+            start = ticks_us()
+            self.nfc_buf[0] = PN532_COMMAND_TGGETDATA
+            resp = await self._transceive(1, P2P_CHUNK_MAX + 1, P2P_TIMEOUT_MS)
+            count = await self._dep_receive(resp, rx, offset, 1)
+            self._p2p_done(0, count, start)
+            return count
+
+    async def p2p_target_send(self, tx):
+        """Answer the initiator with ``tx``, chained with TgSetMetaData"""
+        async with self.lock:
+            start = ticks_us()
+            ok = self._parse_ok(await self._dep_send(tx, self._prep_tg_data, 1))
+            self._p2p_done(len(tx) if ok else 0, 0, start)
+            return ok
+
+    async def _dep_send(self, tx, prep, expect):
+        tx = memoryview(tx)
+        total = len(tx)
+        sent = 0
+        while True:
+            n = min(P2P_CHUNK_MAX, total - sent)
+            more = sent + n < total
+            resp = await self._transceive(prep(tx[sent:sent + n], more), expect if not more else 1, P2P_TIMEOUT_MS)
+            sent += n
+            if not more or resp is None or resp.status & P2P_STATUS_MASK:
+                return resp
+
+    async def _dep_receive(self, resp, rx, offset, pull_len):
+        pos = offset
+        while True:
+            if resp is None or resp.status & P2P_STATUS_MASK:
+                return None
+            data = resp.data[1:]
+            end = pos + len(data)
+            if end > len(rx):
+                return None
+            rx[pos:end] = data
+            pos = end
+            if not resp.status & P2P_MI:
+                return pos - offset
+            resp = await self._transceive(pull_len, P2P_CHUNK_MAX + 1, P2P_TIMEOUT_MS)
+
+    # Transport: same sequence as NFC_Module, but every wait yields
+
+    async def _transceive(self, cmd_len, expect=None, timeout_ms=None):
+        """Send the command in nfc_buf and await its response"""
+        stats = self.stats
+        if stats is None:
+            return await self._exchange_async(cmd_len, expect, timeout_ms)
+        start = ticks_us()
+        resp = await self._exchange_async(cmd_len, expect, timeout_ms)
+        stats.command(self._cmd, resp is not None, ticks_diff(ticks_us(), start))
+        return resp
+
+    async def _exchange_async(self, cmd_len, expect, timeout_ms=None):
+        for attempt in range(self.retries + 1):
+            if attempt:
+                await self._recover_async(attempt)
+            if not await self._write_cmd_check_ack_async(cmd_len):
+                continue
+            if not await self._await_ready(timeout_ms):
+                self._timed_out()  # ACKed but unanswered: not retried, see NFC_Module._exchange
+                return None
+            resp = await self._read_response_async(expect)
+            if resp is not None:
+                return None if resp.kind == PN532_FRAME_ERROR else resp
+        return None
+
+    async def _recover_async(self, attempt):
+        self._count(STAT_RETRIES)
+        if self._abort():
+            self._count(STAT_ABORTS)
+        await asyncio.sleep((PN532_RETRY_BACKOFF_MS << (attempt - 1)) / 1000)
+        if attempt == self.retries and (self.reset is not None or self.bus_factory is not None):
+            self._count(STAT_RESETS)
+            await self._reset_chip_async()
+
+    async def _reset_chip_async(self):
+        """reset_chip() with the pulse and boot waits yielding; runs under the bus lock"""
+        if self.reset is not None:
+            self.reset.value(0)
+            await asyncio.sleep(PN532_RESET_PULSE_MS / 1000)
+            self.reset.value(1)
+            await asyncio.sleep(PN532_RESET_BOOT_MS / 1000)
+            self._forget_config()
+            self.asleep = False
+        elif self.bus_factory is not None:
+            self.i2c = self.bus_factory()
+        else:
+            return False
+
+        cmd = self._cmd
+        self._cmd = PN532_COMMAND_SAMCONFIGURATION
+        ok = (self._write_raw(PN532_SAM_NORMAL_FRAME) and
+              await self._await_ready(PN532_ACK_TIMEOUT_MS) and self._read_ack() and
+              await self._await_ready() and await self._read_response_async(0) is not None)
+        self._cmd = cmd
+        return ok
+
+    def _write_cmd_check_ack(self, cmd, cmd_len):
+        """Sync path of start_scan() and start_autopoll(); wake() here is a coroutine"""
+        if self.asleep and not NFC_Module.wake(self):
+            self._cmd = cmd[0]
+            self._count(STAT_BUS_ERRORS)
+            return False
+        return super()._write_cmd_check_ack(cmd, cmd_len)
+
+    async def _write_cmd_check_ack_async(self, cmd_len):
+        self._cmd = self.nfc_buf[0]
+        if self.asleep and not await self.wake():
+            self._count(STAT_BUS_ERRORS)
+            return False
+        if (self._write_cmd(self.nfc_buf, cmd_len) and
+                await self._await_ready(PN532_ACK_TIMEOUT_MS) and
+                self._read_ack()):
+            return True
+        self._count(STAT_ACK_FAILURES)
+        return False
+
+    async def _read_response_async(self, expect=None):
+        if expect is None:
+            count = PN532_HEADER_LEN
+        else:
+            count = PN532_HEADER_LEN + expect + 4
+        nacks = 0
+        while True:
+            need = self._read_frame(count)
+            if not need:
+                return None
+            if need > 0:
+                if count + 1 >= need:
+                    return self._decode_response()
+                count = need - 1
+            else:
+                if nacks >= self.retries:
+                    return None
+                nacks += 1
+                self._count(STAT_NACKS)
+            if not self._write_nack() or not await self._await_ready():
+                return None
+
+    async def _await_ready(self, timeout_ms=None):
+        """Yield to the event loop until the PN532 is ready or the deadline passes"""
+        if timeout_ms is None:
+            timeout_ms = PN532_COMMAND_TIMEOUTS.get(self._cmd, PN532_DEFAULT_TIMEOUT_MS)
+        start = ticks_ms()
+        delay = PN532_POLL_MIN_MS
+        while not self._is_ready():
+            if ticks_diff(ticks_ms(), start) >= timeout_ms:
+                return False
+            await asyncio.sleep(delay / 1000)
+            if delay < PN532_POLL_MAX_MS:
+                delay <<= 1
+        return True
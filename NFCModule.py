@@ -1,19 +1,31 @@
-from machine import I2C, Pin
 import time
+from card_cache import CardCache
+from mifare_keys import MifareKeyManager
+from mifare_layout import (MIFARE_BLOCK_SIZE, MIFARE_1K_SECTORS, MIFARE_4K_SECTORS, MIFARE_1K_SIZE,
+                           MIFARE_4K_SIZE, classic_trailer, mifare_block_writable, mifare_sector_blocks,
+                           mifare_sector_first_block, mifare_sector_of)
+from ndef import NDEFDecoder
+from nfc_stats import (NFCStats, STAT_ACK_FAILURES, STAT_CHECKSUM_FAILURES, STAT_TIMEOUTS,
+                       STAT_BUS_ERRORS, STAT_RETRIES, STAT_NACKS, STAT_ABORTS, STAT_RESETS)
 
 # Constants
-PN532_I2C_ADDRESS = 0x24
+PN532_I2C_ADDRESS = 0x24        # Default; each NFC_Module can be given its own
 
 # Commands
 PN532_COMMAND_GETFIRMWAREVERSION = 0x02
+PN532_COMMAND_POWERDOWN = 0x16
 PN532_COMMAND_SAMCONFIGURATION = 0x14
 PN532_COMMAND_INLISTPASSIVETARGET = 0x4A
 PN532_COMMAND_INDATAEXCHANGE = 0x40
+PN532_COMMAND_INCOMMUNICATETHRU = 0x42
 PN532_COMMAND_INJUMPFORDEP = 0x56
+PN532_COMMAND_INAUTOPOLL = 0x60
 PN532_COMMAND_TGINITASTARGET = 0x8C
 PN532_COMMAND_TGGETDATA = 0x86
 PN532_COMMAND_TGSETDATA = 0x8E
+PN532_COMMAND_TGSETMETADATA = 0x94
 PN532_COMMAND_SETPARAMETERS = 0x12
+PN532_COMMAND_RFCONFIGURATION = 0x32
 
 # Response bytes
 PN532_PREAMBLE = 0x00
@@ -21,38 +33,346 @@ PN532_STARTCODE1 = 0x00
 PN532_STARTCODE2 = 0xFF
 PN532_POSTAMBLE = 0x00
 PN532_HOSTTOPN532 = 0xD4
+PN532_PN532TOHOST = 0xD5
+PN532_ERROR_TFI = 0x7F  # TFI of the application-level error frame
+PN532_ACK = b'\x00\x00\xFF\x00\xFF\x00'
+PN532_NACK = b'\x00\x00\xFF\xFF\x00\x00'  # Asks the PN532 to resend its last response
+
+# Response frame kinds
+PN532_FRAME_NORMAL = 0
+PN532_FRAME_EXTENDED = 1
+PN532_FRAME_ERROR = 2
+
+# Frame layout
+PN532_FRAME_MAX = 255       # Largest LEN of a normal frame (TFI + data)
+PN532_FRAME_OVERHEAD = 7    # Preamble, start code, LEN, LCS, DCS, postamble
+PN532_TX_DATA_OFFSET = 6    # First command byte after 00 00 FF LEN LCS TFI
+PN532_HEADER_LEN = 5        # 00 00 FF LEN LCS
+PN532_EXT_HEADER_LEN = 8    # 00 00 FF FF FF LENM LENL LCS
 
 # Frame Identifiers
 NFC_FRAME_ID_INDEX = 6
 
+# Frame buffers that NFC_Module._view() cuts reusable views from
+VIEW_TX = 0
+VIEW_RX = 1
+VIEW_UID = 2
+
+# InAutoPoll target types
+AUTOPOLL_TYPE_GENERIC_106A = 0x00   # ISO14443-4A, Mifare and DEP at 106 kbps
+AUTOPOLL_TYPE_MIFARE = 0x10
+AUTOPOLL_TYPE_FELICA_212 = 0x11
+AUTOPOLL_TYPE_FELICA_424 = 0x12
+AUTOPOLL_TYPE_ISO14443_4A = 0x20
+AUTOPOLL_TYPE_ISO14443_4B = 0x23
+AUTOPOLL_ENDLESS = 0xFF
+AUTOPOLL_EXPECT = 16                # NbTg + one type A target with a 7-byte UID
+AUTOPOLL_TIMEOUT_MS = 10000
+
+# Ready polling
+PN532_I2C_READY = 0x01          # Bit 0 of the I2C status byte
+PN532_ACK_TIMEOUT_MS = 30       # ACK is sent within ~1 ms of a valid frame
+PN532_DEFAULT_TIMEOUT_MS = 100
+PN532_POLL_MIN_MS = 1           # First backoff step while polling the status byte
+PN532_POLL_MAX_MS = 8           # Backoff ceiling
+
+# Recovery
+PN532_RETRIES = 2               # Extra attempts per transaction, and NACKs per frame
+PN532_RETRY_BACKOFF_MS = 2      # Pause before the first retry; doubles on each one
+PN532_RESET_PULSE_MS = 10       # RSTPDN low time
+PN532_RESET_BOOT_MS = 20        # Time for the chip to start after RSTPDN goes high
+# SAMConfiguration(normal mode, 1 s, no IRQ) as a ready-made frame, sent after a reset
+PN532_SAM_NORMAL_FRAME = b'\x00\x00\xFF\x05\xFB\xD4\x14\x01\x14\x00\x03\x00'
+
+# Response deadlines per command (ms); anything missing uses PN532_DEFAULT_TIMEOUT_MS
+PN532_COMMAND_TIMEOUTS = {
+    PN532_COMMAND_GETFIRMWAREVERSION: 100,
+    PN532_COMMAND_SAMCONFIGURATION: 100,
+    PN532_COMMAND_SETPARAMETERS: 100,
+    PN532_COMMAND_POWERDOWN: 100,
+    PN532_COMMAND_RFCONFIGURATION: 100,
+    PN532_COMMAND_INLISTPASSIVETARGET: 1000,
+    PN532_COMMAND_INDATAEXCHANGE: 200,
+    PN532_COMMAND_INCOMMUNICATETHRU: 200,
+    PN532_COMMAND_INJUMPFORDEP: 1000,
+    PN532_COMMAND_TGINITASTARGET: 5000,
+    PN532_COMMAND_TGGETDATA: 1000,
+    PN532_COMMAND_TGSETDATA: 1000,
+    PN532_COMMAND_TGSETMETADATA: 1000,
+}
+
 # Mifare Commands
 MIFARE_CMD_AUTH_A = 0x60
 MIFARE_CMD_AUTH_B = 0x61
 MIFARE_CMD_READ = 0x30
 MIFARE_CMD_WRITE = 0xA0
 
+# SEL_RES (SAK) values
+SAK_ISO14443_4 = 0x20       # Bit set when the target speaks ISO/IEC 14443-4; ATS follows the UID
+SAK_MIFARE_ULTRALIGHT = 0x00  # Also NTAG2xx and other Type 2 tags
+SAK_MIFARE_MINI = 0x09
+SAK_MIFARE_1K = 0x08
+SAK_MIFARE_4K = 0x18
+PN532_MAX_TARGETS = 2
+
+# NTAG/Ultralight (Type 2) Commands
+NTAG_CMD_GET_VERSION = 0x60
+NTAG_CMD_READ = 0x30
+NTAG_CMD_FAST_READ = 0x3A
+NTAG_CMD_WRITE = 0xA2
+
+# NTAG/Ultralight layout
+NTAG_PAGE_SIZE = 4
+NTAG_READ_PAGES = 4         # Pages returned by one READ
+NTAG_DATA_START_PAGE = 4    # First page of the TLV/NDEF data area
+NTAG_CONFIG_START_PAGE = 2  # Static lock bytes and CC; one-time programmable
+NTAG_CONFIG_TAIL_PAGES = 5  # Last pages: dynamic lock bytes, CFG0, CFG1, PWD, PACK
+NTAG_FAST_READ_MAX_PAGES = 60  # Keeps a FAST_READ response inside one normal frame
+NTAG_STORAGE_PAGES = {      # GET_VERSION storage size byte -> total pages
+    0x0F: 45,   # NTAG213
+    0x11: 135,  # NTAG215
+    0x13: 231,  # NTAG216
+}
+
+# SetParameters flags
+PARAM_NAD_USED = 0x01
+PARAM_DID_USED = 0x02
+PARAM_AUTO_ATR_RES = 0x04   # Chip answers ATR_REQ itself in target mode
+PARAM_AUTO_RATS = 0x10      # Chip sends RATS when activating an ISO14443-4 card
+PARAM_ISO14443_4_PICC = 0x20
+PARAM_REMOVE_PRE_POST = 0x40
+PARAM_DEFAULT = PARAM_AUTO_ATR_RES | PARAM_AUTO_RATS  # Power-on value
+
+# RFConfiguration items (CfgItem)
+RFCFG_FIELD = 0x01          # bit 1 AutoRFCA, bit 0 RF on
+RFCFG_TIMINGS = 0x02        # RFU, ATR_RES timeout, non-DEP timeout (codes 0x00-0x10: 0, 100 us * 2^(n-1))
+RFCFG_MAX_RTY_COM = 0x04    # Retries of InCommunicateThru/InDataExchange
+RFCFG_MAX_RETRIES = 0x05    # MxRtyATR, MxRtyPSL, MxRtyPassiveActivation (0xFF: forever)
+RFCFG_ANALOG_106A = 0x0A    # CIU_RFCfg, GsNOn, CWGsP, ModGsP, DemodOwnRFOn, RxThreshold,
+                            # DemodOwnRFOff, GsNOff, ModWidth, MifNFC, TxBitPhase
+RFCFG_ANALOG_106A_DEFAULT = b'\x59\xF4\x3F\x11\x4D\x85\x61\x6F\x26\x62\x87'
+RFCFG_ANALOG_106A_HIGH_GAIN = b'\x79\xFF\x3F\x11\x4D\x85\x61\x6F\x26\x62\x87'  # 48 dB RxGain, full drive
+
+RF_FIELD_DATA = (b'\x00', b'\x01', b'\x02', b'\x03')  # Indexed by AutoRFCA << 1 | RF on
+
+# Profile names
+PROFILE_FAST_POLL = 'fast poll'
+PROFILE_LONG_RANGE = 'long range'
+PROFILE_P2P = 'P2P'
+
+# PowerDown wake-up sources (WakeUpEnable bits)
+WAKE_INT0 = 0x01
+WAKE_INT1 = 0x02
+WAKE_RF = 0x08              # RF level detector: an external field, e.g. a phone
+WAKE_HSU = 0x10
+WAKE_SPI = 0x20
+WAKE_GPIO = 0x40
+WAKE_I2C = 0x80             # Any access to our address
+PN532_WAKE_POLL_MS = 1      # Gap between I2C accesses while the chip wakes
+PN532_WAKE_TIMEOUT_MS = 20  # The oscillator is up well within this
+
+# Peer-to-peer (NFC-DEP)
+P2P_BAUD_106 = 0x00
+P2P_BAUD_212 = 0x01
+P2P_BAUD_424 = 0x02
+P2P_MI = 0x40               # More Information: on the Tg byte going out, the status byte coming in
+P2P_STATUS_MASK = 0x3F      # Error code part of a DEP status byte
+P2P_CHUNK_MAX = PN532_FRAME_MAX - 3  # Data per frame next to TFI, command and Tg/status
+P2P_TIMEOUT_MS = 1000       # The peer's host has to answer within each DEP exchange
+P2P_ATR_EXPECT = 18         # TgInitAsTarget: mode byte + ATR_REQ without general bytes
+P2P_FELICA_POLLING = b'\x00\xFF\xFF\x00\x00'  # Initiator data for passive 212/424 kbps
+P2P_TG_MODE_DEP_ONLY = 0x02
+P2P_TG_MIFARE_PARAMS = b'\x04\x00\x12\x34\x56\x40'  # SENS_RES, NFCID1t, SEL_RES (DEP)
+P2P_TG_FELICA_PARAMS = (b'\x01\xFE\xA2\xA3\xA4\xA5\xA6\xA7'  # NFCID2t
+                        b'\xC0\xC1\xC2\xC3\xC4\xC5\xC6\xC7'  # PAD
+                        b'\xFF\xFF')                              # System code
+P2P_NFCID3 = b'\xAA\x99\x88\x77\x66\x55\x44\x33\x22\x11'
+
+
+class RFProfile:
+    """
+    Named set of SetParameters flags and RFConfiguration items
+    
+    Args:
+        name (str): Profile name
+        params (int): SetParameters flags (PARAM_*)
+        items (tuple): (CfgItem, ConfigurationData) pairs, sent in order
+    """
+    def __init__(self, name, params, items):
+        self.name = name
+        self.params = params
+        self.items = items
+
+
+RF_PROFILES = {
+    # One activation retry and short timeouts: InListPassiveTarget comes
+    # back within a few ms when the field is empty
+    PROFILE_FAST_POLL: RFProfile(PROFILE_FAST_POLL, PARAM_DEFAULT, (
+        (RFCFG_FIELD, b'\x01'),
+        (RFCFG_TIMINGS, b'\x00\x0B\x07'),         # ATR_RES 102.4 ms, 6.4 ms
+        (RFCFG_MAX_RTY_COM, b'\x00'),
+        (RFCFG_MAX_RETRIES, b'\x00\x01\x01'),
+        (RFCFG_ANALOG_106A, RFCFG_ANALOG_106A_DEFAULT),
+    )),
+    # Full receiver gain and more patience for cards at the edge of the field
+    PROFILE_LONG_RANGE: RFProfile(PROFILE_LONG_RANGE, PARAM_DEFAULT, (
+        (RFCFG_FIELD, b'\x01'),
+        (RFCFG_TIMINGS, b'\x00\x0B\x0A'),         # ATR_RES 102.4 ms, 51.2 ms
+        (RFCFG_MAX_RTY_COM, b'\x02'),
+        (RFCFG_MAX_RETRIES, b'\x02\x01\x10'),
+        (RFCFG_ANALOG_106A, RFCFG_ANALOG_106A_HIGH_GAIN),
+    )),
+    # Collision avoidance for active mode and a long ATR_RES wait
+    PROFILE_P2P: RFProfile(PROFILE_P2P, PARAM_DEFAULT, (
+        (RFCFG_FIELD, b'\x03'),
+        (RFCFG_TIMINGS, b'\x00\x0E\x0B'),         # ATR_RES 819.2 ms, 102.4 ms
+        (RFCFG_MAX_RTY_COM, b'\x01'),
+        (RFCFG_MAX_RETRIES, b'\x02\x01\x04'),
+        (RFCFG_ANALOG_106A, RFCFG_ANALOG_106A_DEFAULT),
+    )),
+}
+
+
+class PN532Response:
+    """
+    Typed view of a validated response frame
+    
+    NFC_Module reuses a single instance for every transaction, so the fields
+    are only valid until the next command is sent.
+    """
+    def __init__(self):
+        self.kind = PN532_FRAME_NORMAL
+        self.code = 0      # Response code (command + 1)
+        self.data = None   # memoryview of the bytes after the response code
+    
+    @property
+    def status(self):
+        """First payload byte; the error/status byte of most responses"""
+        if not self.data:
+            return -1
+        return self.data[0]
+
+
+class PN532Target:
+    """ISO14443A target reported by InListPassiveTarget"""
+    def __init__(self, tg, atqa, sak, uid, ats=None):
+        self.tg = tg      # Logical target number for InDataExchange
+        self.atqa = atqa  # SENS_RES, as an int
+        self.sak = sak    # SEL_RES
+        self.uid = uid
+        self.ats = ats    # Answer To Select, only for ISO14443-4 targets
+    
+    @property
+    def is_classic(self):
+        """True for Mifare Classic Mini/1K/4K"""
+        return self.sak in (SAK_MIFARE_MINI, SAK_MIFARE_1K, SAK_MIFARE_4K)
+    
+    @property
+    def is_type2(self):
+        """True for Ultralight/NTAG (NFC Forum Type 2) tags"""
+        return self.sak == SAK_MIFARE_ULTRALIGHT
+    
+    def __repr__(self):
+        return f"PN532Target(tg={self.tg}, atqa=0x{self.atqa:04X}, sak=0x{self.sak:02X}, uid={self.uid.hex().upper()})"
+
+
 class NFC_Module:
-    def __init__(self, i2c):
+    def __init__(self, i2c, irq=None, reset=None, retries=PN532_RETRIES, bus_factory=None,
+                 address=PN532_I2C_ADDRESS):
+        """
+        Args:
+            i2c (I2C): Bus the PN532 is attached to
+            irq (Pin, optional): PN532 IRQ line (active low). When given, readiness
+                is taken from the pin instead of polling the I2C status byte.
+            reset (Pin, optional): Output wired to RSTPDN; pulsed before the
+                last retry of a failing transaction
+            retries (int): Extra attempts for a transaction hit by a bus, ACK
+                or frame fault, and NACK resends for a corrupt frame. A command
+                that was ACKed but not answered in time is aborted, not retried.
+            bus_factory (callable, optional): Returns a freshly initialised I2C
+                object; used to recover the bus when there is no reset pin
+            address (int): 7-bit I2C address of this PN532
+        """
         self.i2c = i2c
-        self.nfc_buf = bytearray(64)  # Buffer for commands/responses
+        self.address = address
+        self.irq = irq
+        self.reset = reset
+        self.retries = retries
+        self.bus_factory = bus_factory
+        # Long-lived frame buffers; commands are encoded in place and responses
+        # decoded in place. Slicing a memoryview allocates on MicroPython, so
+        # the views handed to the bus and to decoders are cut once per distinct
+        # range and reused: once every frame size in use has been seen, frame
+        # I/O allocates nothing. Decoders that return bytes still copy.
+        self._tx = bytearray(PN532_FRAME_MAX + PN532_FRAME_OVERHEAD)
+        self._tx[0] = PN532_PREAMBLE
+        self._tx[1] = PN532_STARTCODE1
+        self._tx[2] = PN532_STARTCODE2
+        self._tx[5] = PN532_HOSTTOPN532
+        self._txmv = memoryview(self._tx)
+        self._rx = bytearray(PN532_FRAME_MAX + PN532_FRAME_OVERHEAD + 4)  # + status byte, extended header
+        self._rxmv = memoryview(self._rx)
+        self._uid = bytearray(10)  # UID of the last target found
+        self._uidmv = memoryview(self._uid)
+        self._uid_len = 0  # 0 while no card is selected
+        self._mvs = (self._txmv, self._rxmv, self._uidmv)  # Indexed by VIEW_*
+        self._views = {}  # Range key -> memoryview, see _view()
+        self.nfc_buf = self._txmv[PN532_TX_DATA_OFFSET:PN532_TX_DATA_OFFSET + PN532_FRAME_MAX - 1]  # Command payload
+        self._status = bytearray(1)  # I2C status byte
+        self._cmd = 0  # Command currently in flight
+        self._scan_maxtg = 1  # MaxTg of the scan in flight
+        self._resp = PN532Response()
+        self.target = 1  # Logical target used by InDataExchange commands
+        self.p2p_mode = 0  # Mode byte from the last TgInitAsTarget (baud rate, framing)
+        self.p2p_bytes = 0  # Payload bytes moved by the last P2P transfer
+        self.p2p_us = 0  # Duration of the last P2P transfer
+        self.write_blocks = 0  # Blocks/pages written by the last image write
+        self.asleep = False  # In PowerDown; the next command wakes the chip first
+        self.stats = None  # NFCStats when instrumentation is enabled
+        self.cache = None  # CardCache when content caching is enabled
+        self.profile = None  # Name of the RF profile last applied
+        self._params = PARAM_DEFAULT  # Configuration the chip holds, so nothing is resent
+        self._rf_config = {}
         
     def begin(self):
         """Initialize the NFC module"""
         pass  # No specific initialization needed for MicroPython
         
+    def enable_stats(self, stats=None):
+        """
+        Start recording per-command counters, bus traffic and latency
+        
+        Returns:
+            NFCStats: The attached collector; query with as_dict(), clear with reset()
+        """
+        self.stats = stats if stats is not None else NFCStats()
+        return self.stats
+        
+    def disable_stats(self):
+        """Stop recording; hooks reduce to one attribute check"""
+        self.stats = None
+        
+    def enable_cache(self, cache=None):
+        """
+        Serve repeated block/page reads of a known card from memory
+        
+        Reads of the selected card are answered from the cache when every
+        requested block/page is in it, and writes update it. Pass
+        ``use_cache=False`` to a read to go to the card regardless.
+        
+        Returns:
+            CardCache: The attached cache; share one between drivers or clear() it
+        """
+        self.cache = cache if cache is not None else CardCache()
+        return self.cache
+        
+    def disable_cache(self):
+        self.cache = None
+        
     def get_version(self):
         """Get PN532 firmware version"""
         self.nfc_buf[0] = PN532_COMMAND_GETFIRMWAREVERSION
-        if not self._write_cmd_check_ack(self.nfc_buf, 1):
-            return 0
-            
-        self._wait_ready()
-        data = self._read_data(12)
-        if data[5] != 0xD5:
-            return 0
-            
-        version = (data[7] << 24) | (data[8] << 16) | (data[9] << 8) | data[10]
-        return version
+        return self._parse_version(self._transceive(1, 4))
         
     def sam_configuration(self, mode=0x01, timeout=0x14, irq=0x00):
         """Configure the Secure Access Module"""
@@ -61,133 +381,1227 @@ class NFC_Module:
         self.nfc_buf[2] = timeout
         self.nfc_buf[3] = irq
         
-        if not self._write_cmd_check_ack(self.nfc_buf, 4):
+        return self._transceive(4, 0) is not None
+        
+    def set_parameters(self, flags):
+        """
+        Set the SetParameters flags (PARAM_*); skipped if the chip already has them
+        
+        Returns:
+            bool: True if the chip holds ``flags`` afterwards
+        """
+        if flags == self._params:
+            return True
+        self.nfc_buf[0] = PN532_COMMAND_SETPARAMETERS
+        self.nfc_buf[1] = flags
+        if self._transceive(2, 0) is None:
+            return False
+        self._params = flags
+        return True
+        
+    def rf_configuration(self, item, data):
+        """
+        Send one RFConfiguration item; skipped if the chip already has ``data``
+        
+        Args:
+            item (int): CfgItem (RFCFG_*)
+            data (bytes): ConfigurationData
+        
+        Returns:
+            bool: True if the chip holds ``data`` afterwards
+        """
+        if self._rf_config.get(item) == data:
+            return True
+        cmd_len = self._prep_rf_config(item, data)
+        if self._transceive(cmd_len, 0) is None:
             return False
-            
-        data = self._read_data(8)
-        return data[6] == PN532_COMMAND_SAMCONFIGURATION
+        self._rf_config[item] = bytes(data)
+        return True
+        
+    def rf_field(self, on, auto_rfca=False):
+        """Switch the RF field on or off"""
+        return self.rf_configuration(RFCFG_FIELD, RF_FIELD_DATA[(2 if auto_rfca else 0) | (1 if on else 0)])
+        
+    def apply_profile(self, name):
+        """
+        Switch to one of RF_PROFILES, sending only the settings that differ
+        from what the chip already holds
+        
+        Returns:
+            bool: True if every setting was accepted
+        """
+        if name == self.profile:
+            return True
+        profile = RF_PROFILES[name]
+        self.profile = None
+        if not self.set_parameters(profile.params):
+            return False
+        for item, data in profile.items:
+            if not self.rf_configuration(item, data):
+                return False
+        self.profile = name
+        return True
+        
+    def _forget_config(self):
+        """The chip is back at its power-on configuration"""
+        self.profile = None
+        self._params = PARAM_DEFAULT
+        self._rf_config = {}
+        
+    def power_down(self, wake=WAKE_I2C | WAKE_RF, generate_irq=None):
+        """
+        Put the PN532 into PowerDown until one of the ``wake`` sources fires
+        
+        The RF field goes off and selected targets are lost. The next command
+        wakes the chip over I2C first (see wake()); include WAKE_I2C or only
+        the reset pin will bring it back.
+        
+        Args:
+            wake (int): WAKE_* bits
+            generate_irq (bool, optional): Pull IRQ low on waking; defaults to
+                whether an IRQ pin was given
+        
+        Returns:
+            bool: True if the chip acknowledged and is now asleep
+        """
+        if generate_irq is None:
+            generate_irq = self.irq is not None
+        self.nfc_buf[0] = PN532_COMMAND_POWERDOWN
+        self.nfc_buf[1] = wake
+        self.nfc_buf[2] = 0x01 if generate_irq else 0x00
+        if not self._parse_ok(self._transceive(3, 1)):
+            return False
+        self._went_down()
+        return True
+        
+    def _went_down(self):
+        """
+        The chip is in PowerDown: targets are lost and the field is off
+        
+        Other settings survive, so apply_profile() after the wake-up only
+        resends the field.
+        """
+        self.asleep = True
+        self._uid_len = 0
+        self._rf_config.pop(RFCFG_FIELD, None)
+        self.profile = None
+        
+    def wake(self):
+        """
+        Bring the chip out of PowerDown with I2C accesses
+        
+        The access that wakes the PN532 is NAKed while its oscillator starts,
+        so the status byte is read until it answers.
+        
+        Returns:
+            bool: True once the chip responds (at once if it was awake)
+        """
+        if not self.asleep:
+            return True
+        start = time.ticks_ms()
+        while not self._wake_probe():
+            if time.ticks_diff(time.ticks_ms(), start) >= PN532_WAKE_TIMEOUT_MS:
+                return False
+            time.sleep_ms(PN532_WAKE_POLL_MS)
+        return True
+        
+    def _wake_probe(self):
+        """One wake-up access; True and awake if the chip answered"""
+        try:
+            self.i2c.readfrom_into(self.address, self._status)
+        except OSError:
+            return False
+        self.asleep = False
+        return True
         
     def in_list_passive_target(self, brty=0x00, maxtg=0x01):
         """Look for NFC tags"""
-        self.nfc_buf[0] = PN532_COMMAND_INLISTPASSIVETARGET
-        self.nfc_buf[1] = maxtg
-        self.nfc_buf[2] = brty
+        cmd_len = self._prep_in_list(maxtg, brty)
         
-        if not self._write_cmd_check_ack(self.nfc_buf, 3):
-            return None
-            
-        self._wait_ready()
-        data = self._read_data(20)
+        # NbTg, Tg, SENS_RES (2), SEL_RES, NFCIDLength, NFCID1 (up to 7)
+        return self._parse_uid(self._transceive(cmd_len, 13))
         
-        if data[NFC_FRAME_ID_INDEX] != (PN532_COMMAND_INLISTPASSIVETARGET + 1):
-            return None
-            
-        if data[NFC_FRAME_ID_INDEX + 1] != 1:
+    def inventory(self, maxtg=PN532_MAX_TARGETS, brty=0x00):
+        """
+        List every ISO14443A target in the field in one round trip
+        
+        Args:
+            maxtg (int): Maximum number of targets, at most PN532_MAX_TARGETS
+            brty (int): Baud rate and modulation; only 0x00 (106 kbps type A) is parsed
+        
+        Returns:
+            list or None: PN532Target records (empty if no card), None if failed
+        """
+        maxtg = min(maxtg, PN532_MAX_TARGETS)
+        cmd_len = self._prep_in_list(maxtg, brty)
+        return self._parse_inventory(self._transceive(cmd_len, 1 + 12 * maxtg))
+        
+    def start_scan(self, maxtg=0x01, brty=0x00):
+        """
+        Send InListPassiveTarget and return once it is acknowledged
+        
+        The chip works on it alone; poll scan_ready() and collect the targets
+        with finish_scan(), driving other readers in between (see ReaderPool).
+        
+        Returns:
+            bool: True if the PN532 accepted the command
+        """
+        maxtg = min(maxtg, PN532_MAX_TARGETS)
+        cmd_len = self._prep_in_list(maxtg, brty)
+        self._scan_maxtg = maxtg
+        return self._write_cmd_check_ack(self.nfc_buf, cmd_len)
+        
+    def scan_ready(self):
+        """True once the scan started by start_scan() has a response waiting"""
+        return self._is_ready()
+        
+    def finish_scan(self):
+        """
+        Read the response of start_scan(); call once scan_ready() is True
+        
+        Returns:
+            list or None: PN532Target records (empty if no card), None if failed
+        """
+        return self._parse_inventory(self._read_response(1 + 12 * self._scan_maxtg))
+        
+    def cancel_scan(self):
+        """Abort a scan started with start_scan()"""
+        return self._abort()
+        
+    def start_autopoll(self, poll_nr=AUTOPOLL_ENDLESS, period=1, types=(AUTOPOLL_TYPE_MIFARE,)):
+        """
+        Let the PN532 poll for targets on its own (InAutoPoll)
+        
+        Returns as soon as the command is acknowledged; the chip raises its
+        ready bit/IRQ only once a target is found or the polls run out. Use
+        check_autopoll() to collect the result, or autopoll() to block.
+        
+        Args:
+            poll_nr (int): Polls per type, 1-254 or AUTOPOLL_ENDLESS
+            period (int): Time between polls in units of 150 ms, 1-15
+            types (tuple): AUTOPOLL_TYPE_* values to poll for, at most 15
+        
+        Returns:
+            bool: True if the PN532 accepted the command
+        """
+        cmd_len = self._prep_autopoll(poll_nr, period, types)
+        return self._write_cmd_check_ack(self.nfc_buf, cmd_len)
+        
+    def check_autopoll(self):
+        """
+        Collect the result of start_autopoll() without blocking
+        
+        Returns:
+            list or None: None while the PN532 is still polling, otherwise the
+            PN532Target records found (empty if none or on a bad frame)
+        """
+        if not self._is_ready():
             return None
+        return self._parse_autopoll(self._read_response(AUTOPOLL_EXPECT))
+        
+    def autopoll(self, timeout_ms=AUTOPOLL_TIMEOUT_MS, poll_nr=AUTOPOLL_ENDLESS, period=1, types=(AUTOPOLL_TYPE_MIFARE,)):
+        """
+        Block until the PN532 reports a target, sleeping between status checks
+        
+        Returns:
+            list: PN532Target records, empty if nothing was found in time
+        """
+        if not self.start_autopoll(poll_nr, period, types):
+            return []
+        if not self._wait_ready(timeout_ms):
+            self.cancel_autopoll()
+            return []
+        return self._parse_autopoll(self._read_response(AUTOPOLL_EXPECT))
+        
+    def cancel_autopoll(self):
+        """Abort a running InAutoPoll"""
+        return self._abort()
+        
+    def reset_chip(self):
+        """
+        Hard-reset the PN532, or rebuild the bus when there is no reset pin,
+        and put the chip back in normal mode
+        
+        nfc_buf is left untouched so the command being retried survives.
+        
+        Returns:
+            bool: True if the chip acknowledged SAMConfiguration afterwards
+        """
+        if self.reset is not None:
+            self.reset.value(0)
+            time.sleep_ms(PN532_RESET_PULSE_MS)
+            self.reset.value(1)
+            time.sleep_ms(PN532_RESET_BOOT_MS)
+            self._forget_config()
+            self.asleep = False
+        elif self.bus_factory is not None:
+            self.i2c = self.bus_factory()
+        else:
+            return False
             
-        uid_length = data[12]
-        uid = data[13:13 + uid_length]
-        return uid
+        cmd = self._cmd
+        self._cmd = PN532_COMMAND_SAMCONFIGURATION
+        ok = (self._write_raw(PN532_SAM_NORMAL_FRAME) and
+              self._wait_ready(PN532_ACK_TIMEOUT_MS) and self._read_ack() and
+              self._wait_ready() and self._read_response(0) is not None)
+        self._cmd = cmd
+        return ok
         
     def mifare_authenticate(self, auth_type, block, uid, key):
         """Authenticate a Mifare card block"""
+        cmd_len = self._prep_auth(auth_type, block, uid, key)
+        return self._parse_ok(self._transceive(cmd_len, 1))
+    
+    def mifare_read_block(self, block, buf=None, use_cache=True):
+        """
+        Read a Mifare card block
+        
+        Args:
+            block (int): Block number
+            buf (bytearray, optional): 16-byte destination; avoids allocating
+                a new bytes object per read
+            use_cache (bool): False reads the card even if the block is cached
+        
+        Returns:
+            bytes or bytearray or None: Block data (``buf`` when given) or None if failed
+        """
+        data = self._cache_get(block, buf, use_cache)
+        if data is not None:
+            return data
+        cmd_len = self._prep_exchange(MIFARE_CMD_READ, block)
+        data = self._parse_block(self._transceive(cmd_len, 17), buf)
+        self._cache_put(block, data)
+        return data
+        
+    def mifare_write_block(self, block, data):
+        """Write data to a Mifare card block; the content cache is written through"""
+        if len(data) != 16:
+            return False
+            
+        cmd_len = self._prep_write(block, data)
+        ok = self._parse_ok(self._transceive(cmd_len, 1))
+        self._cache_write(block, data, ok and not classic_trailer(block))
+        return ok
+    
+    def mifare_auth_sector(self, sector, uid, keys):
+        """
+        Authenticate a sector with the first key of ``keys`` that works
+        
+        The key cached for this UID/sector goes first. A failed attempt
+        halts the card, so it is reselected before the next key is tried.
+        
+        Args:
+            sector (int): Sector number
+            uid (bytes): UID of the selected card
+            keys (MifareKeyManager): Dictionary and working-key cache
+        
+        Returns:
+            tuple or None: (auth_type, key) that worked, None if no key did
+            or the card left the field
+        """
+        first = mifare_sector_first_block(sector)
+        for auth_type, key in keys.candidates(uid, sector):
+            if self.mifare_authenticate(auth_type, first, uid, key):
+                keys.remember(uid, sector, auth_type, key)
+                return auth_type, key
+            if not self._reselect(uid):
+                return None
+        keys.forget(uid, sector)
+        return None
+        
+    def read_sector(self, sector, uid, key, buf, offset=0, auth_type=0, use_cache=True):
+        """
+        Authenticate once and read every block of a sector
+        
+        With a content cache holding the whole sector nothing is sent, not
+        even the authentication.
+        
+        Args:
+            sector (int): Sector number
+            uid (bytes): UID of the selected card
+            key (bytes or MifareKeyManager): 6-byte key, or a key manager
+                to search (``auth_type`` is then ignored)
+            buf (bytearray): Destination; blocks are stored back to back
+            offset (int): Position in ``buf`` of the first block
+            auth_type (int): 0 for key A, 1 for key B
+            use_cache (bool): False reads the card even if the sector is cached
+        
+        Returns:
+            bool: True if the whole sector was read
+        """
+        first = mifare_sector_first_block(sector)
+        blocks = mifare_sector_blocks(sector)
+        if use_cache and self.cache is not None and self.cache.read_into(uid, first, blocks, buf, offset):
+            return True
+        if not self._auth_key(sector, uid, key, auth_type):
+            return False
+            
+        # Command header stays in place; only the block number changes
+        cmd_len = self._prep_exchange(MIFARE_CMD_READ, first)
+        pos = offset
+        for block in range(first, first + blocks):
+            self.nfc_buf[3] = block
+            if not self._parse_pages(self._transceive(cmd_len, 17), MIFARE_BLOCK_SIZE, buf, pos):
+                return False
+            pos += MIFARE_BLOCK_SIZE
+        if self.cache is not None:
+            self.cache.write_from(uid, first, blocks, MIFARE_BLOCK_SIZE, buf, offset)
+        return True
+        
+    def dump_card(self, uid, key, buf, sectors=MIFARE_1K_SECTORS, auth_type=0, use_cache=True):
+        """
+        Read a whole Mifare Classic card into one buffer
+        
+        A sector that fails is left untouched in ``buf`` and the card is
+        reselected so the remaining sectors can still be read.
+        
+        Args:
+            uid (bytes): UID of the selected card
+            key (bytes or MifareKeyManager): 6-byte key used for every
+                sector, or a key manager searched per sector
+            buf (bytearray): Destination, at least MIFARE_1K_SIZE (or
+                MIFARE_4K_SIZE with sectors=MIFARE_4K_SECTORS) bytes
+            sectors (int): Number of sectors to read
+            auth_type (int): 0 for key A, 1 for key B
+            use_cache (bool): As for read_sector()
+        
+        Returns:
+            list: Numbers of the sectors that could not be read
+        """
+        failed = []
+        for sector in range(sectors):
+            offset = mifare_sector_first_block(sector) * MIFARE_BLOCK_SIZE
+            if not self.read_sector(sector, uid, key, buf, offset, auth_type, use_cache):
+                failed.append(sector)
+                # A failed auth halts the card; wake it before the next sector
+                if not self._reselect(uid):
+                    failed.extend(range(sector + 1, sectors))
+                    break
+        return failed
+        
+    def mifare_write_image(self, uid, key, image, first_block=0, auth_type=0, verify=True,
+                           allow_trailers=False, use_cache=True):
+        """
+        Bring a run of Mifare Classic blocks to ``image``, writing only blocks that differ
+        
+        Current contents come from the content cache when it has them,
+        otherwise from reading the block. Each sector is authenticated once
+        for the reads, writes and verification together. Block 0 is never
+        written; trailers are skipped unless ``allow_trailers``, and an
+        allowed trailer is always written since key A cannot be read back
+        to compare. A failure abandons the rest of its sector and the card
+        is reselected before the next one.
+        
+        Args:
+            uid (bytes): UID of the selected card
+            key (bytes or MifareKeyManager): As for read_sector(); must grant write access
+            image (bytes or bytearray): Block contents back to back
+            first_block (int): Block the image starts at
+            auth_type (int): 0 for key A, 1 for key B
+            verify (bool): Read written blocks back from the card and compare
+            allow_trailers (bool): Also write sector trailers (keys and access bits)
+            use_cache (bool): False reads the current contents from the card
+        
+        Returns:
+            list: Numbers of the blocks that were not written or did not
+            verify; write_blocks holds the number written
+        """
+        end = first_block + len(image) // MIFARE_BLOCK_SIZE
+        img = memoryview(image)
+        cur = bytearray(MIFARE_BLOCK_SIZE)
+        failed = []
+        self.write_blocks = 0
+        block = first_block
+        while block < end:
+            sector = mifare_sector_of(block)
+            last = min(end, mifare_sector_first_block(sector) + mifare_sector_blocks(sector))
+            blocks = [b for b in range(block, last) if mifare_block_writable(b, allow_trailers)]
+            if blocks:
+                self._write_sector_image(sector, uid, key, auth_type, blocks, img, first_block,
+                                         cur, verify, use_cache, failed)
+            block = last
+        return failed
+        
+    def _write_sector_image(self, sector, uid, key, auth_type, blocks, img, first_block,
+                            cur, verify, use_cache, failed):
+        """Diff, write and verify ``blocks`` of one sector"""
+        authed = False
+        todo = []
+        for i, block in enumerate(blocks):
+            if classic_trailer(block):
+                todo.append(block)
+                continue
+            data = self.cache.get(uid, block) if use_cache and self.cache is not None else None
+            if data is None:
+                if not authed:
+                    authed = self._auth_key(sector, uid, key, auth_type)
+                data = self.mifare_read_block(block, cur, False) if authed else None
+                if data is None:
+                    return self._abandon_write(uid, todo + blocks[i:], failed)
+            if not self._same_data(data, img, (block - first_block) * MIFARE_BLOCK_SIZE, MIFARE_BLOCK_SIZE):
+                todo.append(block)
+        if not todo:
+            return
+        if not authed and not self._auth_key(sector, uid, key, auth_type):
+            return self._abandon_write(uid, todo, failed)
+            
+        for i, block in enumerate(todo):
+            pos = (block - first_block) * MIFARE_BLOCK_SIZE
+            if not self.mifare_write_block(block, img[pos:pos + MIFARE_BLOCK_SIZE]):
+                return self._abandon_write(uid, todo[i:], failed)
+            self.write_blocks += 1
+        if not verify:
+            return
+        for i, block in enumerate(todo):
+            if classic_trailer(block):
+                continue
+            if self.mifare_read_block(block, cur, False) is None:
+                return self._abandon_write(uid, todo[i:], failed)
+            if not self._same_data(cur, img, (block - first_block) * MIFARE_BLOCK_SIZE, MIFARE_BLOCK_SIZE):
+                failed.append(block)
+        
+    def _abandon_write(self, uid, blocks, failed):
+        """Record the blocks left undone and wake the card a failure has halted"""
+        failed.extend(blocks)
+        self._reselect(uid)
+        
+    def ntag_page_count(self):
+        """
+        Get the total number of pages of an NTAG21x from GET_VERSION
+        
+        Returns:
+            int: Page count, or 0 if the tag did not answer or is unknown
+        """
+        self._prep_thru(NTAG_CMD_GET_VERSION)
+        return self._parse_page_count(self._transceive(2, 9))
+        
+    def ntag_read_pages(self, page, buf=None):
+        """
+        Read four pages with the Type 2 READ command
+        
+        Args:
+            page (int): First page
+            buf (bytearray, optional): 16-byte destination
+        
+        Returns:
+            bytes or bytearray or None: Page data (``buf`` when given) or None if failed
+        """
+        self._prep_thru(NTAG_CMD_READ, page)
+        return self._parse_block(self._transceive(3, 17), buf)
+        
+    def ntag_fast_read(self, start, end, buf, offset=0):
+        """
+        Read pages ``start`` to ``end`` (inclusive) with one FAST_READ
+        
+        The range must not exceed NTAG_FAST_READ_MAX_PAGES; use ntag_read()
+        for longer ranges.
+        
+        Returns:
+            bool: True if every page was read into ``buf``
+        """
+        count = (end - start + 1) * NTAG_PAGE_SIZE
+        self._prep_thru(NTAG_CMD_FAST_READ, start, end)
+        return self._parse_pages(self._transceive(4, count + 1), count, buf, offset)
+        
+    def ntag_read(self, start, pages, buf, offset=0, fast=True, use_cache=True):
+        """
+        Read a page range, split into as few transactions as the frame allows
+        
+        Args:
+            start (int): First page
+            pages (int): Number of pages
+            buf (bytearray): Destination, at least ``pages * NTAG_PAGE_SIZE`` bytes
+            offset (int): Position in ``buf`` of the first page
+            fast (bool): Use FAST_READ (NTAG21x); False falls back to 4-page
+                READs for Ultralight and other tags without it
+            use_cache (bool): False reads the tag even if the range is cached
+        
+        Returns:
+            bool: True if the whole range was read
+        """
+        uid = self._selected_uid()
+        cache = self.cache if uid is not None else None
+        if use_cache and cache is not None and cache.read_into(uid, start, pages, buf, offset):
+            return True
+            
+        end = start + pages
+        page = start
+        pos = offset
+        while page < end:
+            if fast:
+                last = min(end, page + NTAG_FAST_READ_MAX_PAGES) - 1
+                if not self.ntag_fast_read(page, last, buf, pos):
+                    return False
+                pos += (last - page + 1) * NTAG_PAGE_SIZE
+                page = last + 1
+                continue
+                
+            # READ always returns four pages; keep only those in range
+            count = min(NTAG_READ_PAGES, end - page) * NTAG_PAGE_SIZE
+            self._prep_thru(NTAG_CMD_READ, page)
+            if not self._parse_pages(self._transceive(3, 17), count, buf, pos):
+                return False
+            pos += count
+            page += count // NTAG_PAGE_SIZE
+        if cache is not None:
+            cache.write_from(uid, start, pages, NTAG_PAGE_SIZE, buf, offset)
+        return True
+        
+    def ntag_write_page(self, page, data):
+        """Write one 4-byte page of a Type 2 tag; the content cache is written through"""
+        if len(data) != NTAG_PAGE_SIZE:
+            return False
+            
+        cmd_len = self._prep_ntag_write(page, data)
+        ok = self._parse_ok(self._transceive(cmd_len, 1))
+        self._cache_write(page, data, ok)
+        return ok
+        
+    def ntag_write_image(self, start, image, verify=True, allow_config=False, fast=True, use_cache=True):
+        """
+        Bring a page range of a Type 2 tag to ``image``, writing only pages that differ
+        
+        The current contents come from the content cache or one bulk read,
+        and verification is one bulk read of the span that was written. The
+        UID pages are never written. Unless ``allow_config``, neither are the
+        static lock and CC pages, whose bits can only ever be set, nor the
+        last NTAG_CONFIG_TAIL_PAGES pages (dynamic lock bytes, AUTH0 and
+        access settings, PWD, PACK); their position comes from
+        ntag_page_count(), and a tag that does not report its size is not
+        written.
+        
+        Args:
+            start (int): First page of the image
+            image (bytes or bytearray): Page contents back to back
+            verify (bool): Read the written pages back from the tag and compare
+            allow_config (bool): Also write pages 2 and 3 (static lock bytes,
+                CC) and the configuration pages at the end of memory
+            fast (bool): As for ntag_read()
+            use_cache (bool): False reads the current contents from the tag
+        
+        Returns:
+            list: Numbers of the pages that were not written or did not
+            verify; write_blocks holds the number written
+        """
+        pages = len(image) // NTAG_PAGE_SIZE
+        first = max(start, NTAG_CONFIG_START_PAGE if allow_config else NTAG_DATA_START_PAGE)
+        end = start + pages
+        self.write_blocks = 0
+        if first >= end:
+            return []
+        if not allow_config:
+            total = self.ntag_page_count()
+            if not total:
+                return list(range(first, end))
+            end = min(end, total - NTAG_CONFIG_TAIL_PAGES)
+            if first >= end:
+                return []
+        cur = bytearray(pages * NTAG_PAGE_SIZE)
+        if not self.ntag_read(start, end - start, cur, 0, fast, use_cache):
+            return list(range(first, end))
+            
+        img = memoryview(image)
+        curmv = memoryview(cur)
+        failed = []
+        written = []
+        for page in range(first, end):
+            pos = (page - start) * NTAG_PAGE_SIZE
+            if self._same_data(curmv[pos:], img, pos, NTAG_PAGE_SIZE):
+                continue
+            if not self.ntag_write_page(page, img[pos:pos + NTAG_PAGE_SIZE]):
+                failed.append(page)
+                continue
+            written.append(page)
+        self.write_blocks = len(written)
+        if not verify or not written:
+            return failed
+            
+        # One read from the first to the last page written; pages in between
+        # that were skipped or failed are not checked
+        low = written[0]
+        pos = (low - start) * NTAG_PAGE_SIZE
+        if not self.ntag_read(low, written[-1] + 1 - low, cur, pos, fast, False):
+            return sorted(failed + written)
+        for page in written:
+            pos = (page - start) * NTAG_PAGE_SIZE
+            if not self._same_data(curmv[pos:], img, pos, NTAG_PAGE_SIZE):
+                failed.append(page)
+        return sorted(failed)
+        
+    def ntag_read_ndef(self, buf, stop=None, fast=True):
+        """
+        Read the NDEF message of a Type 2 tag, fetching only the pages it needs
+        
+        Pages from NTAG_DATA_START_PAGE on are read into ``buf`` and decoded
+        as they arrive: first one READ-sized block for the TLV header, then
+        the rest of the message, or with ``stop`` up to the end of each record
+        in turn.
+        
+        Args:
+            buf (bytearray): Receives the data area; the records are views into it
+            stop (callable, optional): Called with each record; returning True
+                ends the read without fetching the rest of the message
+            fast (bool): As for ntag_read()
+        
+        Returns:
+            list: NDEFRecord views, or None if a read failed or the message
+            does not fit in ``buf``
+        """
+        dec = NDEFDecoder(buf)
+        records = []
+        avail = 0
+        while not dec.done:
+            want = max(dec.need, avail + NTAG_READ_PAGES * NTAG_PAGE_SIZE)
+            if dec.end:
+                # Without a stop callback the rest of the message goes in one read
+                want = dec.end if stop is None else min(want, dec.end)
+            pages = min((want - avail + NTAG_PAGE_SIZE - 1) // NTAG_PAGE_SIZE, (len(buf) - avail) // NTAG_PAGE_SIZE)
+            if avail + pages * NTAG_PAGE_SIZE < dec.need:
+                return None
+            if not self.ntag_read(NTAG_DATA_START_PAGE + avail // NTAG_PAGE_SIZE, pages, buf, avail, fast):
+                return None
+            avail += pages * NTAG_PAGE_SIZE
+            for record in dec.feed(avail):
+                records.append(record)
+                if stop is not None and stop(record):
+                    return records
+        return records
+        
+    def _auth_key(self, sector, uid, key, auth_type):
+        """Authenticate a sector with a 6-byte key or a MifareKeyManager"""
+        if isinstance(key, MifareKeyManager):
+            return self.mifare_auth_sector(sector, uid, key) is not None
+        return self.mifare_authenticate(auth_type, mifare_sector_first_block(sector), uid, key)
+    
+    def _same_data(self, data, image, pos, size):
+        """Compare ``size`` bytes of ``data`` with ``image`` from ``pos``"""
+        for i in range(size):
+            if data[i] != image[pos + i]:
+                return False
+        return True
+    
+    def _reselect(self, uid):
+        """Re-activate a card after a failed authentication"""
+        return self._same_uid(self.in_list_passive_target(), uid)
+    
+    # Content cache hooks for single-block access; keyed by the selected card
+    
+    def _selected_uid(self):
+        return self._view(VIEW_UID, 0, self._uid_len) if self._uid_len else None
+    
+    def _cache_get(self, block, buf, use_cache):
+        if not use_cache or self.cache is None or not self._uid_len:
+            return None
+        data = self.cache.get(self._selected_uid(), block)
+        if data is None or buf is None:
+            return data
+        buf[:len(data)] = data
+        return buf
+    
+    def _cache_put(self, block, data):
+        if data is not None and self.cache is not None and self._uid_len:
+            self.cache.put(self._selected_uid(), block, data)
+    
+    def _cache_write(self, block, data, keep):
+        """
+        Write through, or drop the entry when ``keep`` is False: a failed
+        write leaves the content unknown and a trailer reads back masked
+        """
+        if self.cache is None or not self._uid_len:
+            return
+        if keep:
+            self.cache.put(self._selected_uid(), block, data)
+        else:
+            self.cache.invalidate(self._selected_uid(), block)
+    
+    # Command encoders: fill nfc_buf and return the command length. Shared with
+    # the async driver, which only replaces the transport.
+    
+    def _prep_rf_config(self, item, data):
+        self.nfc_buf[0] = PN532_COMMAND_RFCONFIGURATION
+        self.nfc_buf[1] = item
+        self.nfc_buf[2:2 + len(data)] = data
+        return 2 + len(data)
+        
+    def _prep_in_list(self, maxtg, brty):
+        self.nfc_buf[0] = PN532_COMMAND_INLISTPASSIVETARGET
+        self.nfc_buf[1] = maxtg
+        self.nfc_buf[2] = brty
+        return 3
+        
+    def _prep_autopoll(self, poll_nr, period, types):
+        self.nfc_buf[0] = PN532_COMMAND_INAUTOPOLL
+        self.nfc_buf[1] = poll_nr
+        self.nfc_buf[2] = period
+        for i in range(len(types)):
+            self.nfc_buf[3 + i] = types[i]
+        return 3 + len(types)
+        
+    def _prep_exchange(self, mifare_cmd, block):
         self.nfc_buf[0] = PN532_COMMAND_INDATAEXCHANGE
-        self.nfc_buf[1] = 1  # Card number
-        self.nfc_buf[2] = MIFARE_CMD_AUTH_A + (auth_type & 0x01)
+        self.nfc_buf[1] = self.target  # Card number
+        self.nfc_buf[2] = mifare_cmd
         self.nfc_buf[3] = block
+        return 4
+        
+    def _prep_auth(self, auth_type, block, uid, key):
+        self._prep_exchange(MIFARE_CMD_AUTH_A + (auth_type & 0x01), block)
         
         # Copy key and UID
         self.nfc_buf[4:10] = key
         self.nfc_buf[10:10 + len(uid)] = uid
+        return 10 + len(uid)
         
-        if not self._write_cmd_check_ack(self.nfc_buf, 10 + len(uid)):
-            return False
-            
-        self._wait_ready()
-        data = self._read_data(8)
+    def _prep_write(self, block, data):
+        self._prep_exchange(MIFARE_CMD_WRITE, block)
+        self.nfc_buf[4:20] = data
+        return 20
         
-        return (data[NFC_FRAME_ID_INDEX] == (PN532_COMMAND_INDATAEXCHANGE + 1) and 
-                data[NFC_FRAME_ID_INDEX + 1] == 0)
-    
-    def mifare_read_block(self, block):
-        """Read a Mifare card block"""
+    def _prep_ntag_write(self, page, data):
+        self._prep_thru(NTAG_CMD_WRITE, page)
+        self.nfc_buf[3:7] = data
+        return 7
+        
+    def _prep_thru(self, tag_cmd, arg1=None, arg2=None):
+        """Raw tag command for InCommunicateThru; responses carry a status byte first"""
+        self.nfc_buf[0] = PN532_COMMAND_INCOMMUNICATETHRU
+        self.nfc_buf[1] = tag_cmd
+        if arg1 is not None:
+            self.nfc_buf[2] = arg1
+        if arg2 is not None:
+            self.nfc_buf[3] = arg2
+        
+    def _prep_jump_for_dep(self, baud=P2P_BAUD_424, active=True, gi=None):
+        """InJumpForDEP; passive 212/424 kbps needs the FeliCa polling request as initiator data"""
+        buf = self.nfc_buf
+        buf[0] = PN532_COMMAND_INJUMPFORDEP
+        buf[1] = 0x01 if active else 0x00
+        buf[2] = baud
+        buf[3] = 0x00  # Next: which optional fields follow
+        n = 4
+        if not active and baud != P2P_BAUD_106:
+            buf[3] |= 0x01
+            buf[4:9] = P2P_FELICA_POLLING
+            n = 9
+        if gi:
+            buf[3] |= 0x04
+            buf[n:n + len(gi)] = gi
+            n += len(gi)
+        return n
+        
+    def _prep_dep_data(self, data, more):
+        """InDataExchange carrying one DEP chunk; MI rides on the Tg byte"""
         self.nfc_buf[0] = PN532_COMMAND_INDATAEXCHANGE
-        self.nfc_buf[1] = 1  # Card number
-        self.nfc_buf[2] = MIFARE_CMD_READ
-        self.nfc_buf[3] = block
+        self.nfc_buf[1] = self.target | P2P_MI if more else self.target
+        n = len(data)
+        self.nfc_buf[2:2 + n] = data
+        return 2 + n
+        
+    def _prep_tg_init(self, gt=None):
+        """TgInitAsTarget, DEP only"""
+        buf = self.nfc_buf
+        buf[0] = PN532_COMMAND_TGINITASTARGET
+        buf[1] = P2P_TG_MODE_DEP_ONLY
+        buf[2:8] = P2P_TG_MIFARE_PARAMS
+        buf[8:26] = P2P_TG_FELICA_PARAMS
+        buf[26:36] = P2P_NFCID3
+        n = len(gt) if gt else 0
+        buf[36] = n
+        if n:
+            buf[37:37 + n] = gt
+        buf[37 + n] = 0  # No historical bytes
+        return 38 + n
+        
+    def _prep_tg_data(self, data, more):
+        """TgSetData, or TgSetMetaData when more chunks follow"""
+        self.nfc_buf[0] = PN532_COMMAND_TGSETMETADATA if more else PN532_COMMAND_TGSETDATA
+        n = len(data)
+        self.nfc_buf[1:1 + n] = data
+        return 1 + n
         
-        if not self._write_cmd_check_ack(self.nfc_buf, 4):
+    # Response decoders: take the PN532Response (or None) of a transaction
+    
+    def _parse_ok(self, resp):
+        return resp is not None and resp.status == 0
+        
+    def _parse_version(self, resp):
+        if resp is None or len(resp.data) < 4:
+            return 0
+            
+        data = resp.data
+        version = (data[0] << 24) | (data[1] << 16) | (data[2] << 8) | data[3]
+        return version
+        
+    def _parse_uid(self, resp):
+        self._uid_len = 0
+        if resp is None or resp.status < 1:
             return None
             
-        self._wait_ready()
-        data = self._read_data(26)
+        data = resp.data
+        if len(data) < 6:
+            return None
+        uid_length = data[5]
+        if uid_length > len(self._uid) or 6 + uid_length > len(data):
+            return None
+        uid = self._uid
+        for i in range(uid_length):
+            uid[i] = data[6 + i]
+        self._uid_len = uid_length
+        # Owned copy: callers keep the UID across polls (_reselect, dump_card)
+        # while _uid follows whichever card answered last
+        return bytes(self._view(VIEW_UID, 0, uid_length))
         
-        if (data[NFC_FRAME_ID_INDEX] != (PN532_COMMAND_INDATAEXCHANGE + 1) or
-            data[NFC_FRAME_ID_INDEX + 1] != 0):
+    def _parse_inventory(self, resp):
+        if resp is None:
             return None
             
-        return bytes(data[8:24])  # Return 16 bytes of block data
+        data = resp.data
+        targets = []
+        pos = 1
+        for _ in range(resp.status):
+            target, pos = self._parse_target_a(data, pos, len(data))
+            if target is None:
+                return None
+            targets.append(target)
+        self._select_uid(targets)
+        return targets
         
-    def mifare_write_block(self, block, data):
-        """Write data to a Mifare card block"""
-        if len(data) != 16:
-            return False
+    def _parse_autopoll(self, resp):
+        if resp is None or resp.kind == PN532_FRAME_ERROR:
+            return []
             
-        self.nfc_buf[0] = PN532_COMMAND_INDATAEXCHANGE
-        self.nfc_buf[1] = 1  # Card number
-        self.nfc_buf[2] = MIFARE_CMD_WRITE
-        self.nfc_buf[3] = block
-        self.nfc_buf[4:20] = data
+        # NbTg, then Type, Length, TargetData per target
+        data = resp.data
+        targets = []
+        pos = 1
+        for _ in range(resp.status):
+            if pos + 2 > len(data):
+                break
+            tg_type = data[pos]
+            end = pos + 2 + data[pos + 1]
+            if end > len(data):
+                break
+            if tg_type in (AUTOPOLL_TYPE_MIFARE, AUTOPOLL_TYPE_ISO14443_4A):
+                target, _ = self._parse_target_a(data, pos + 2, end)
+                if target is not None:
+                    targets.append(target)
+            pos = end
+        self._select_uid(targets)
+        return targets
+    
+    def _select_uid(self, targets):
+        """Remember the UID of target 1, which InDataExchange talks to"""
+        self._uid_len = 0
+        if targets and len(targets[0].uid) <= len(self._uid):
+            uid = targets[0].uid
+            self._uid[:len(uid)] = uid
+            self._uid_len = len(uid)
+        
+    def _parse_target_a(self, data, pos, end):
+        """
+        Parse one ISO14443A target: Tg, SENS_RES (2), SEL_RES, NFCIDLength, NFCID1, [ATS]
         
-        if not self._write_cmd_check_ack(self.nfc_buf, 20):
+        Returns:
+            tuple: (PN532Target or None, position after the target)
+        """
+        if pos + 5 > end:
+            return None, pos
+        tg = data[pos]
+        atqa = (data[pos + 1] << 8) | data[pos + 2]
+        sak = data[pos + 3]
+        uid_length = data[pos + 4]
+        pos += 5
+        if pos + uid_length > end:
+            return None, pos
+        uid = bytes(data[pos:pos + uid_length])
+        pos += uid_length
+        ats = None
+        if sak & SAK_ISO14443_4 and pos < end:
+            ats_length = data[pos]  # Includes the length byte itself
+            if ats_length < 1 or pos + ats_length > end:
+                return None, pos
+            ats = bytes(data[pos + 1:pos + ats_length])
+            pos += ats_length
+        return PN532Target(tg, atqa, sak, uid, ats), pos
+        
+    def _parse_pages(self, resp, count, buf, offset):
+        """Copy ``count`` data bytes after the status byte into ``buf``"""
+        if resp is None or resp.status != 0 or len(resp.data) < count + 1:
             return False
-            
-        self._wait_ready()
-        resp = self._read_data(26)
+        buf[offset:offset + count] = resp.data[1:count + 1]
+        return True
+        
+    def _parse_block(self, resp, buf):
+        if buf is None:
+            if resp is None or resp.status != 0 or len(resp.data) < 17:
+                return None
+            return bytes(resp.data[1:17])  # Return 16 bytes of block data
+        return buf if self._parse_pages(resp, 16, buf, 0) else None
+        
+    def _parse_page_count(self, resp):
+        if resp is None or resp.status != 0 or len(resp.data) < 9:
+            return 0
+        return NTAG_STORAGE_PAGES.get(resp.data[7], 0)
+        
+    def _same_uid(self, found, uid):
+        if found is None or len(found) != len(uid):
+            return False
+        for i in range(len(uid)):
+            if found[i] != uid[i]:
+                return False
+        return True
+    
+    def _transceive(self, cmd_len, expect=None, timeout_ms=None):
+        """
+        Send the command in nfc_buf and read its response
+        
+        Args:
+            cmd_len (int): Number of command bytes in nfc_buf
+            expect (int, optional): Expected payload length, see _read_response
+            timeout_ms (int, optional): Response deadline, see _wait_ready
+        
+        Returns:
+            PN532Response or None: Normal-frame response or None if failed
+        """
+        stats = self.stats
+        if stats is None:
+            return self._exchange(cmd_len, expect, timeout_ms)
+        start = time.ticks_us()
+        resp = self._exchange(cmd_len, expect, timeout_ms)
+        stats.command(self._cmd, resp is not None, time.ticks_diff(time.ticks_us(), start))
+        return resp
+    
+    def _exchange(self, cmd_len, expect, timeout_ms=None):
+        """
+        Run the transaction, retrying up to ``retries`` times on a bus fault
         
-        return (resp[NFC_FRAME_ID_INDEX] == (PN532_COMMAND_INDATAEXCHANGE + 1) and
-                resp[NFC_FRAME_ID_INDEX + 1] == 0)
+        Any valid frame ends the loop: a status byte reporting a card error
+        is an answer, not a bus fault. Error frames are not retried either.
+        Neither is a command that was ACKed but not answered in time: the
+        chip is healthy and still working on it (an InListPassiveTarget on
+        an empty field waits for its retries to run out), and resending
+        could repeat a command the card or peer has already acted on.
+        """
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self._recover(attempt)
+            if not self._write_cmd_check_ack(self.nfc_buf, cmd_len):
+                continue
+            if not self._wait_ready(timeout_ms):
+                self._timed_out()
+                return None
+            resp = self._read_response(expect)
+            if resp is not None:
+                return None if resp.kind == PN532_FRAME_ERROR else resp
+        return None
+    
+    def _timed_out(self):
+        """Abort an ACKed command whose response did not come in time"""
+        self._count(STAT_TIMEOUTS)
+        if self._abort():
+            self._count(STAT_ABORTS)
+    
+    def _recover(self, attempt):
+        """Abort whatever the chip is doing and back off; reset before the last retry"""
+        self._count(STAT_RETRIES)
+        if self._abort():
+            self._count(STAT_ABORTS)
+        time.sleep_ms(PN532_RETRY_BACKOFF_MS << (attempt - 1))
+        if attempt == self.retries and (self.reset is not None or self.bus_factory is not None):
+            self._count(STAT_RESETS)
+            self.reset_chip()
+    
+    def _count(self, field):
+        if self.stats is not None:
+            self.stats.count(self._cmd, field)
     
     def _write_cmd(self, cmd, cmd_len):
         """Write a command to the PN532"""
-        # Calculate checksum
-        checksum = PN532_PREAMBLE + PN532_PREAMBLE + PN532_STARTCODE2
-        frame = bytearray([
-            PN532_PREAMBLE,
-            PN532_PREAMBLE,
-            PN532_STARTCODE2,
-            cmd_len + 1,
-            -(cmd_len + 1) & 0xFF,
-            PN532_HOSTTOPN532
-        ])
-        checksum += PN532_HOSTTOPN532
-        
-        # Add command bytes
-        for i in range(cmd_len):
-            checksum += cmd[i]
-            frame.append(cmd[i])
+        tx = self._tx
+        if cmd is not self.nfc_buf:
+            self.nfc_buf[:cmd_len] = cmd[:cmd_len]
             
-        # Add checksum and postamble
-        frame.append(~checksum & 0xFF)
-        frame.append(PN532_POSTAMBLE)
+        # LEN/LCS cover TFI + command bytes
+        tx[3] = cmd_len + 1
+        tx[4] = -(cmd_len + 1) & 0xFF
+        
+        # Data checksum, computed in place over TFI + command bytes
+        end = PN532_TX_DATA_OFFSET + cmd_len
+        checksum = PN532_HOSTTOPN532
+        for i in range(PN532_TX_DATA_OFFSET, end):
+            checksum += tx[i]
+        tx[end] = -checksum & 0xFF
+        tx[end + 1] = PN532_POSTAMBLE
         
         # Write to I2C
+        return self._write_raw(self._view(VIEW_TX, 0, end + 2))
+    
+    def _write_raw(self, frame):
+        """Write a complete frame"""
         try:
-            self.i2c.writeto(PN532_I2C_ADDRESS, frame)
-            return True
-        except:
+            self.i2c.writeto(self.address, frame)
+        except OSError:
+            self._count(STAT_BUS_ERRORS)
             return False
+        if self.stats is not None:
+            self.stats.bytes_written += len(frame)
+        return True
     
     def _read_data(self, count):
-        """Read data from the PN532"""
+        """
+        Read data from the PN532 into the shared RX buffer
+        
+        Returns:
+            memoryview or None: ``count`` bytes after the status byte, valid
+            until the next read, or None if the read fails
+        """
         try:
-            # Read raw data (add 1 for status byte)
-            data = bytearray(count + 1)
-            self.i2c.readfrom_into(PN532_I2C_ADDRESS, data)
-            return data[1:]  # Skip status byte
-        except Exception as e:
-            print(f"Data read error: {e}")
+            self.i2c.readfrom_into(self.address, self._view(VIEW_RX, 0, count + 1))
+        except OSError:
+            self._count(STAT_BUS_ERRORS)
+            return None
+        if self.stats is not None:
+            self.stats.bytes_read += count + 1
+        return self._view(VIEW_RX, 1, count + 1)  # Skip status byte
+    
+    def _read_response(self, expect=None):
+        """
+        Read and validate one response frame
+        
+        The frame is read in a single transaction when ``expect`` covers it;
+        otherwise the header is read first and the PN532 is NACKed to resend
+        exactly LEN bytes. LCS and DCS are both checked; a corrupt frame is
+        NACKed and read again up to ``retries`` times.
+        
+        Args:
+            expect (int, optional): Expected payload length after the response
+                code; None reads only the header first
+        
+        Returns:
+            PN532Response or None: Response view into the RX buffer, or None if
+            the frame is malformed or answers a different command
+        """
+        if expect is None:
+            count = PN532_HEADER_LEN
+        else:
+            count = PN532_HEADER_LEN + expect + 4  # TFI, code, DCS, postamble
+            
+        nacks = 0
+        while True:
+            need = self._read_frame(count)
+            if not need:
+                return None
+            if need > 0:
+                if count + 1 >= need:
+                    return self._decode_response()
+                # More bytes pending than were read; have the PN532 resend the frame
+                count = need - 1
+            else:
+                # Corrupt frame; have the PN532 send it again
+                if nacks >= self.retries:
+                    return None
+                nacks += 1
+                self._count(STAT_NACKS)
+            if not self._write_nack() or not self._wait_ready():
+                return None
+    
+    def _read_frame(self, count):
+        """
+        Read ``count`` frame bytes into the RX buffer and check them
+        
+        LCS is checked as soon as the header is in; DCS once the whole frame is.
+        
+        Returns:
+            int: RX bytes the whole frame occupies (status byte included), 0 if
+            the read failed or the frame cannot fit, -1 if the frame is corrupt
+        """
+        rx = self._rx
+        if self._read_data(count) is None:
+            return 0
+        # rx[0] is the status byte
+        if rx[1] != PN532_PREAMBLE or rx[2] != PN532_STARTCODE1 or rx[3] != PN532_STARTCODE2:
+            return self._checksum_failure()
+            
+        if rx[4] == 0xFF and rx[5] == 0xFF:
+            start = PN532_EXT_HEADER_LEN + 1
+            if count < PN532_EXT_HEADER_LEN:
+                return start  # Length not read yet
+            if (rx[6] + rx[7] + rx[8]) & 0xFF:
+                return self._checksum_failure()  # LCS mismatch
+            length = (rx[6] << 8) | rx[7]
+        else:
+            start = PN532_HEADER_LEN + 1
+            if (rx[4] + rx[5]) & 0xFF:
+                return self._checksum_failure()  # LCS mismatch
+            length = rx[4]
+            
+        need = start + length + 2
+        if need > len(rx):
+            return 0
+        if length and count + 1 >= need:
+            checksum = 0
+            for i in range(start, start + length + 1):
+                checksum += rx[i]
+            if checksum & 0xFF:
+                return self._checksum_failure()  # DCS mismatch
+        return need
+    
+    def _decode_response(self):
+        """Fill the shared PN532Response from the checked frame in the RX buffer"""
+        rx = self._rx
+        if rx[4] == 0xFF and rx[5] == 0xFF:
+            kind = PN532_FRAME_EXTENDED
+            start = PN532_EXT_HEADER_LEN + 1
+            length = (rx[6] << 8) | rx[7]
+        else:
+            kind = PN532_FRAME_NORMAL
+            start = PN532_HEADER_LEN + 1
+            length = rx[4]
+            
+        if length < 1:
+            return None  # ACK frame, not a response
+            
+        resp = self._resp
+        if rx[start] == PN532_ERROR_TFI:
+            resp.kind = PN532_FRAME_ERROR
+            resp.code = 0
+            resp.data = self._view(VIEW_RX, start + 1, start + length)
+            return resp
+            
+        if rx[start] != PN532_PN532TOHOST or length < 2:
             return None
+        if rx[start + 1] != ((self._cmd + 1) & 0xFF):
+            return None
+            
+        resp.kind = kind
+        resp.code = rx[start + 1]
+        resp.data = self._view(VIEW_RX, start + 2, start + length)
+        return resp
+    
+    def _view(self, buf, start, end):
+        """
+        ``[start:end]`` of the VIEW_* buffer, sliced on first use and then reused
+        
+        Views stay valid because the buffers behind them are never replaced.
+        The key stays a small int, which MicroPython does not allocate.
+        """
+        key = (buf << 20) | (start << 10) | end
+        view = self._views.get(key)
+        if view is None:
+            view = self._views[key] = self._mvs[buf][start:end]
+        return view
+    
+    def _checksum_failure(self):
+        self._count(STAT_CHECKSUM_FAILURES)
+        return -1
+    
+    def _write_nack(self):
+        """Ask the PN532 to resend its last frame"""
+        return self._write_raw(PN532_NACK)
+    
+    def _abort(self):
+        """Cancel the command the PN532 is running; it treats an ACK frame as abort"""
+        return self._write_raw(PN532_ACK)
     
     def _read_ack(self):
         """Read and verify ACK from PN532"""
@@ -196,83 +1610,199 @@ class NFC_Module:
             return False
             
         # Check for ACK pattern
-        return (data[0] == 0x00 and
-                data[1] == 0x00 and
-                data[2] == 0xFF and
-                data[3] == 0x00 and
-                data[4] == 0xFF and
-                data[5] == 0x00)
+        for i in range(6):
+            if data[i] != PN532_ACK[i]:
+                return False
+        return True
     
     def _write_cmd_check_ack(self, cmd, cmd_len):
         """Write command and check for ACK"""
-        if not self._write_cmd(cmd, cmd_len):
+        self._cmd = cmd[0]
+        if self.asleep and not self.wake():
+            self._count(STAT_BUS_ERRORS)
             return False
-            
-        self._wait_ready()
-        return self._read_ack()
+        if (self._write_cmd(cmd, cmd_len) and
+                self._wait_ready(PN532_ACK_TIMEOUT_MS) and
+                self._read_ack()):
+            return True
+        self._count(STAT_ACK_FAILURES)
+        return False
     
-    def _wait_ready(self, timeout_ms=100):
-        """Wait for chip to be ready"""
-        time.sleep_ms(timeout_ms)
-        return True
-
-    def p2p_initiator_init(self,  debug=True):
+    def _is_ready(self):
+        """Check whether the PN532 has a frame pending"""
+        if self.irq is not None:
+            return self.irq.value() == 0
+        try:
+            self.i2c.readfrom_into(self.address, self._status)
+        except OSError:
+            return False  # Chip may NAK its address while busy
+        if self.stats is not None:
+            self.stats.bytes_read += 1
+        return self._status[0] & PN532_I2C_READY
+    
+    def _wait_ready(self, timeout_ms=None):
         """
-        Configure PN532 as an initiator in Peer-to-Peer mode with correct commands.
+        Wait for chip to be ready
+        
+        Args:
+            timeout_ms (int, optional): Deadline; defaults to the entry in
+                PN532_COMMAND_TIMEOUTS for the command in flight
+        
+        Returns:
+            bool: True once the chip is ready, False if the deadline passed
         """
-        # Avoid resend command
-        if not hasattr(self, '_send_flag'):
-            self._send_flag = 1  # Initialize static variable equivalent
-
-        # Prepare the command buffer
-        self.nfc_buf[0] = 0x56  # Command code for INJUMPFORDEP
-        self.nfc_buf[1] = 0x01  # Active mode (0x01 for active, 0x00 for passive)
-        self.nfc_buf[2] = 0x02  # Baud rate (201 Kbps: 0x02, 424 Kbps: 0x02)
-        self.nfc_buf[3] = 0x01  # Presence of NFCID3i field and General Bytes Gi
-
-        # NFCID3i (optional identifier)
-        self.nfc_buf[4:13] = b'\xAA\xBB\xCC\xDD\xEE\xFF\x00\x11\x22'
-
-        # General Bytes Gi (optional parameters)
-        self.nfc_buf[13] = 0x02  # Length of General Bytes Gi
-        self.nfc_buf[14:16] = b'\x00\xFF'  # Example general bytes
-
-        # Send the command if send_flag is set
-        cmd_length = 16  # Adjust length based on the buffer
-        if self._send_flag:
-            self._send_flag = 0
-            if not self._write_cmd_check_ack(self.nfc_buf, cmd_length):
-                print("InJumpForDEP send failed")
+        if timeout_ms is None:
+            timeout_ms = PN532_COMMAND_TIMEOUTS.get(self._cmd, PN532_DEFAULT_TIMEOUT_MS)
+        start = time.ticks_ms()
+        delay = PN532_POLL_MIN_MS
+        while not self._is_ready():
+            if time.ticks_diff(time.ticks_ms(), start) >= timeout_ms:
                 return False
-            print("InJumpForDEP command sent")
-    
-        # Wait for response
-        self._wait_ready(10)
-        self._read_data(25)
+            if self.irq is not None:
+                time.sleep_us(100)  # Pin reads cost no bus traffic
+                continue
+            time.sleep_ms(delay)
+            if delay < PN532_POLL_MAX_MS:
+                delay <<= 1
+        return True
 
-        # Debug: Print the full response
-        if debug:
+    def p2p_initiator_init(self, baud=P2P_BAUD_424, active=True, gi=None, debug=False):
+        """
+        Configure PN532 as an initiator in Peer-to-Peer mode (InJumpForDEP)
+        
+        Args:
+            baud (int): P2P_BAUD_106, P2P_BAUD_212 or P2P_BAUD_424
+            active (bool): Active mode (both sides power the field) or passive
+            gi (bytes, optional): General bytes for ATR_REQ, e.g. an LLCP header
+            debug (bool): Print the ATR_RES
+        
+        Returns:
+            bool: True if a target answered; p2p_exchange() can then be used
+        """
+        cmd_len = self._prep_jump_for_dep(baud, active, gi)
+        resp = self._transceive(cmd_len, 17)
+        if debug and resp is not None:
             print("Response after InJumpForDEP command:")
-            print(" ".join(f"{byte:02X}" for byte in self.nfc_buf[:25]))
-
-
-
-        # Verify response
-        if self.nfc_buf[5] != 0xD5:
-            print("InJumpForDEP read failed")
+            print(" ".join(f"{byte:02X}" for byte in resp.data))
+        if not self._parse_ok(resp) or len(resp.data) < 2:
             return False
-    
-        if self.nfc_buf[6] != 0x57:  # Response should be 0x57
-            print("Initiator init failed")
+        self.target = resp.data[1]
+        return True
+        
+    def p2p_exchange(self, tx, rx, offset=0):
+        """
+        Send ``tx`` to the DEP target and receive its reply into ``rx``
+        
+        Payloads longer than P2P_CHUNK_MAX are chained with the MI bit; a
+        chained reply is pulled with empty InDataExchange frames.
+        
+        Returns:
+            int or None: Reply length, or None if the exchange failed or the
+            reply does not fit in ``rx``
+        """
+        start = time.ticks_us()
+        resp = self._dep_send(tx, self._prep_dep_data, P2P_CHUNK_MAX + 1)
+        count = self._dep_receive(resp, rx, offset, self._prep_dep_data(b'', False))
+        self._p2p_done(len(tx), count, start)
+        return count
+        
+    def p2p_target_init(self, timeout_ms=None, gt=None):
+        """
+        Wait to be activated as a DEP target (TgInitAsTarget)
+        
+        Args:
+            timeout_ms (int, optional): How long to wait for an initiator;
+                defaults to the TgInitAsTarget entry of PN532_COMMAND_TIMEOUTS
+            gt (bytes, optional): General bytes for ATR_RES
+        
+        Returns:
+            bool: True once an initiator activated us; p2p_mode holds the mode byte
+        """
+        cmd_len = self._prep_tg_init(gt)
+        if not self._write_cmd_check_ack(self.nfc_buf, cmd_len):
             return False
-    
-        if self.nfc_buf[7] != 0:
-            print("Initiator init error")
+        if not self._wait_ready(timeout_ms):
+            self._abort()
             return False
-    
-        print("InJumpForDEP read success")
-        self._send_flag = 1
+        resp = self._read_response(P2P_ATR_EXPECT)
+        if resp is None or resp.kind == PN532_FRAME_ERROR or not len(resp.data):
+            return False
+        self.p2p_mode = resp.data[0]
         return True
+        
+    def p2p_target_receive(self, rx, offset=0):
+        """
+        Receive the initiator's payload into ``rx``, following MI chaining
+        
+        Returns:
+            int or None: Bytes received, or None on failure
+        """
+        start = time.ticks_us()
+        self.nfc_buf[0] = PN532_COMMAND_TGGETDATA
+        count = self._dep_receive(self._transceive(1, P2P_CHUNK_MAX + 1, P2P_TIMEOUT_MS), rx, offset, 1)
+        self._p2p_done(0, count, start)
+        return count
+        
+    def p2p_target_send(self, tx):
+        """
+        Answer the initiator with ``tx``, chained with TgSetMetaData when it
+        does not fit in one frame
+        
+        Returns:
+            bool: True if every chunk was accepted
+        """
+        start = time.ticks_us()
+        ok = self._parse_ok(self._dep_send(tx, self._prep_tg_data, 1))
+        self._p2p_done(len(tx) if ok else 0, 0, start)
+        return ok
+        
+    def p2p_throughput(self):
+        """Payload bytes per second of the last P2P transfer (both directions)"""
+        return self.p2p_bytes * 1000000 // self.p2p_us if self.p2p_us else 0
+        
+    def _dep_send(self, tx, prep, expect):
+        """
+        Send ``tx`` in P2P_CHUNK_MAX pieces with MI set on all but the last
+        
+        Returns:
+            PN532Response or None: Response to the last chunk sent
+        """
+        tx = memoryview(tx)
+        total = len(tx)
+        sent = 0
+        while True:
+            n = min(P2P_CHUNK_MAX, total - sent)
+            more = sent + n < total
+            resp = self._transceive(prep(tx[sent:sent + n], more), expect if not more else 1, P2P_TIMEOUT_MS)
+            sent += n
+            if not more or resp is None or resp.status & P2P_STATUS_MASK:
+                return resp
+                
+    def _dep_receive(self, resp, rx, offset, pull_len):
+        """
+        Copy a DEP payload into ``rx``, re-sending the pull command already
+        in nfc_buf (``pull_len`` bytes) while the MI bit is set
+        
+        Returns:
+            int or None: Bytes received, None on error or if ``rx`` is too small
+        """
+        pos = offset
+        while True:
+            if resp is None or resp.status & P2P_STATUS_MASK:
+                return None
+            data = resp.data[1:]
+            end = pos + len(data)
+            if end > len(rx):
+                return None
+            rx[pos:end] = data
+            pos = end
+            if not resp.status & P2P_MI:
+                return pos - offset
+            resp = self._transceive(pull_len, P2P_CHUNK_MAX + 1, P2P_TIMEOUT_MS)
+            
+    def _p2p_done(self, sent, received, start):
+        self.p2p_bytes = sent + (received or 0)
+        self.p2p_us = time.ticks_diff(time.ticks_us(), start)
     
     def send_command_get_response(self, command, response_length):
         """
@@ -308,7 +1838,7 @@ class NFC_Module:
         """
         try:
             # Typical I2C write method
-            self.i2c.writeto(PN532_I2C_ADDRESS, command)
+            self.i2c.writeto(self.address, command)
             return True
         except Exception as e:
             print(f"Command write error: {e}")
@@ -327,7 +1857,7 @@ class NFC_Module:
         try:
             # Read raw data (add 1 for status byte)
             data = bytearray(count + 1)
-            self.i2c.readfrom_into(PN532_I2C_ADDRESS, data)
+            self.i2c.readfrom_into(self.address, data)
             return data[1:]  # Skip status byte
         except Exception as e:
             print(f"Data read error: {e}")
@@ -0,0 +1,123 @@
+try:
+    from collections import OrderedDict
+except ImportError:
+    from ucollections import OrderedDict
+
+CACHE_MAX_BYTES = 4096
+CACHE_ENTRY_OVERHEAD = 16   # Rough cost of a dict slot and bytes header per entry
+
+
+class CardCache:
+    """
+    Bounded LRU of card contents keyed by UID
+
+    Each card maps an address (Classic block or Type 2 page) to the bytes
+    last read from or written to it. Drivers attached with enable_cache()
+    consult it before reading and update it on every write, so a hit is
+    what the card held after our own last access. Past ``max_bytes`` whole
+    cards are dropped, least recently used first.
+
+    Args:
+        max_bytes (int): Memory cap, counting CACHE_ENTRY_OVERHEAD per entry
+    """
+    def __init__(self, max_bytes=CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.clear()
+
+    def clear(self):
+        """Forget every card"""
+        self._cards = OrderedDict()  # UID -> [entries, bytes used]
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _card(self, uid, create=False):
+        key = bytes(uid)
+        card = self._cards.pop(key, None)
+        if card is None:
+            if not create:
+                return None
+            card = [{}, 0]
+        self._cards[key] = card  # Most recently used goes last
+        return card
+
+    def get(self, uid, addr):
+        """Cached bytes of one address, or None"""
+        card = self._card(uid)
+        data = card[0].get(addr) if card is not None else None
+        if data is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return data
+
+    def read_into(self, uid, addr, count, buf, offset=0):
+        """
+        Copy ``count`` consecutive addresses into ``buf`` back to back
+
+        Returns:
+            bool: True if all of them were cached; ``buf`` is untouched otherwise
+        """
+        card = self._card(uid)
+        if card is None:
+            self.misses += 1
+            return False
+        entries = card[0]
+        for a in range(addr, addr + count):
+            if a not in entries:
+                self.misses += 1
+                return False
+        for a in range(addr, addr + count):
+            data = entries[a]
+            buf[offset:offset + len(data)] = data
+            offset += len(data)
+        self.hits += 1
+        return True
+
+    def put(self, uid, addr, data):
+        """Store the contents of one address"""
+        self._store(self._card(uid, True), addr, bytes(data))
+        self._evict()
+
+    def write_from(self, uid, addr, count, size, buf, offset=0):
+        """Store ``count`` consecutive ``size``-byte entries taken from ``buf``"""
+        card = self._card(uid, True)
+        mv = memoryview(buf)
+        for a in range(addr, addr + count):
+            self._store(card, a, bytes(mv[offset:offset + size]))
+            offset += size
+        self._evict()
+
+    def invalidate(self, uid, addr=None):
+        """Drop one address of a card, or the whole card"""
+        key = bytes(uid)
+        card = self._cards.get(key)
+        if card is None:
+            return
+        if addr is None:
+            self.bytes_used -= card[1]
+            del self._cards[key]
+            return
+        data = card[0].pop(addr, None)
+        if data is not None:
+            cost = len(data) + CACHE_ENTRY_OVERHEAD
+            card[1] -= cost
+            self.bytes_used -= cost
+
+    def _store(self, card, addr, data):
+        entries = card[0]
+        old = entries.get(addr)
+        cost = len(data) + CACHE_ENTRY_OVERHEAD
+        if old is not None:
+            cost -= len(old) + CACHE_ENTRY_OVERHEAD
+        entries[addr] = data
+        card[1] += cost
+        self.bytes_used += cost
+
+    def _evict(self):
+        while self.bytes_used > self.max_bytes and self._cards:
+            key = next(iter(self._cards))
+            self.bytes_used -= self._cards.pop(key)[1]
+
+    def __len__(self):
+        return len(self._cards)
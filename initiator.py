@@ -1,16 +1,14 @@
 from machine import I2C, Pin
 import time
-from NFCModule import NFC_Module  # Assuming the provided NFC library is named 'library.py'
-import testNFC  
+from NFCModule import NFC_Module, PROFILE_P2P
 
 # Initialize I2C and NFC module
 i2c = I2C(0, scl=Pin(22), sda=Pin(21))  # Modify pins as per your setup
 nfc = NFC_Module(i2c)
 
 # Define RX and TX buffers
-tx_buf = b"Hi, this message comes from NFC INITIATOR."
-tx_len = len(tx_buf)
-rx_buf = bytearray(50)
+tx_buf = b"Hi, this message comes from NFC INITIATOR. " * 24  # ~1 KB, sent in chained frames
+rx_buf = bytearray(2048)
 
 def setup():
     """Setup NFC module"""
@@ -27,25 +25,26 @@ def setup():
     print(f"Firmware ver. {(version_data >> 16) & 0xFF}.{(version_data >> 8) & 0xFF}")
     
     # Set normal mode, disable SAM
-    #testNFC.configure_sam_debug()
-#     if not nfc.sam_configuration():
-#         print("Failed to configure SAM mode")
-#         while True:
-#             pass  # Halt
-    nfc.p2p_initiator_init()
+    if not nfc.sam_configuration():
+        print("Failed to configure SAM mode")
+        while True:
+            pass  # Halt
+    
+    # Collision avoidance and DEP timeouts for peer-to-peer
+    nfc.apply_profile(PROFILE_P2P)
 
 
 
 def loop():
     """Run NFC initiator process"""
-    if nfc.in_list_passive_target():
+    # Activate a target at 424 kbps
+    if nfc.p2p_initiator_init():
         print("Target is sensed.")
         
-        rx_len = bytearray(1)
-        if nfc.mifare_write_block(tx_buf, tx_len):
-            print("Data sent successfully")
-            data_received = nfc.mifare_read_block(tx_len)
-            print(f"Data Received: {data_received.decode('utf-8')}")
+        rx_len = nfc.p2p_exchange(tx_buf, rx_buf)
+        if rx_len is not None:
+            print(f"Exchanged {len(tx_buf)} + {rx_len} bytes in {nfc.p2p_us // 1000} ms ({nfc.p2p_throughput()} B/s)")
+            print(f"Data Received: {bytes(rx_buf[:rx_len]).decode('utf-8')}")
         else:
             print("Data exchange failed")
 
@@ -1,5 +1,95 @@
-from machine import Pin, SPI
+import time
+from machine import Pin, SPI, idle
 from os import uname
+try:
+	from array import array
+except ImportError:
+	from uarray import array
+from mifare_layout import (MIFARE_1K_SECTORS, MIFARE_4K_SECTORS, MIFARE_BLOCK_SIZE, classic_trailer,
+                           mifare_sector_blocks, mifare_sector_first_block)
+from nfc_stats import NFCStats, STAT_TIMEOUTS
+
+
+FIFO_SIZE = 64
+FIFO_DATA = 0x09
+FIFO_READ_ADDR = ((FIFO_DATA << 1) & 0x7e) | 0x80
+# FIFO transfer sizes whose views are cut at init: frames and answers up
+# to 7 bytes (REQA, ACK, ATQA, SAK, READ, HLTA, anticollision), SELECT,
+# MFAuthent, a block, a block + CRC_A
+FIFO_VIEW_SIZES = (0, 1, 2, 3, 4, 5, 6, 7, 9, 12, 16, 18)
+
+# How _tocard() waits for a command to finish
+WAIT_POLL = 0     # Read ComIrqReg back to back
+WAIT_TIMER = 1    # Read it every TIMER_POLL_US; the chip timer ends a silent exchange
+WAIT_IRQ = 2      # Watch the IRQ pin; no SPI traffic until the chip raises it
+
+TIMER_RELOAD = 30           # TReloadReg: 30 ticks of 0.5 ms, the card response timeout
+TIMER_POLL_US = 500
+TOCARD_DEADLINE_MS = 25     # Wall-clock backstop, past the chip timer
+
+SEL_CASCADE = (0x93, 0x95, 0x97)  # SEL codes of cascade levels 1-3
+CASCADE_TAG = 0x88
+SAK_UID_INCOMPLETE = 0x04         # SAK bit: UID continues at the next cascade level
+INVENTORY_MAX = 8
+RF_RESET_MS = 5                   # Field off, then on, long enough for cards to reset and power up
+
+CRC_A_INIT = 0x6363  # ISO/IEC 14443-3 CRC_A preset; also ModeReg CRCPreset 01
+CRC_A_POLY = 0x8408  # x^16 + x^12 + x^5 + 1, bit-reversed
+
+
+def _crc_a_table():
+	table = array('H', [0] * 256)
+	for i in range(256):
+		crc = i
+		for _ in range(8):
+			crc = (crc >> 1) ^ CRC_A_POLY if crc & 1 else crc >> 1
+		table[i] = crc
+	return table
+
+
+CRC_A_TABLE = _crc_a_table()
+
+
+def crc_a(data, n=None, crc=CRC_A_INIT):
+	"""
+	CRC_A of ``data[:n]``, one table lookup per byte
+
+	Pass the result back as ``crc`` to continue over the next chunk. Over a
+	frame that ends in its own CRC_A (low byte first) the result is 0.
+
+	Args:
+		data (bytes, bytearray or memoryview): Input
+		n (int, optional): Bytes to cover; all of ``data`` by default
+		crc (int): Running value from a previous call
+
+	Returns:
+		int: 16-bit CRC; transmitted low byte first
+	"""
+	table = CRC_A_TABLE
+	for i in range(len(data) if n is None else n):
+		crc = (crc >> 8) ^ table[(crc ^ data[i]) & 0xff]
+	return crc
+
+
+class MFRC522Target:
+	"""ISO14443A card found by MFRC522.select_card() or inventory()"""
+	def __init__(self, atqa, sak, uid):
+		self.atqa = atqa  # ATQA, as an int
+		self.sak = sak    # SAK of the last cascade level
+		self.uid = uid    # 4, 7 or 10 bytes, cascade tags removed
+
+	@property
+	def is_classic(self):
+		"""True for Mifare Classic Mini/1K/4K"""
+		return self.sak in (0x09, 0x08, 0x18)
+
+	@property
+	def is_type2(self):
+		"""True for Ultralight/NTAG (NFC Forum Type 2) tags"""
+		return self.sak == 0x00
+
+	def __repr__(self):
+		return f"MFRC522Target(atqa=0x{self.atqa:04X}, sak=0x{self.sak:02X}, uid={self.uid.hex().upper()})"
 
 
 class MFRC522:
@@ -7,35 +97,118 @@ class MFRC522:
 	OK = 0
 	NOTAGERR = 1
 	ERR = 2
+	COLLERR = 3  # Bit collision: several cards answered
 
 	REQIDL = 0x26
 	REQALL = 0x52
 	AUTHENT1A = 0x60
 	AUTHENT1B = 0x61
 
-	def __init__(self, spi, cs):
+	def __init__(self, spi, cs, soft_crc=True, irq=None, wait=None, deadline_ms=TOCARD_DEADLINE_MS):
+		"""
+		Args:
+			spi (SPI): Bus the reader is on
+			cs (Pin): Chip select, active low
+			soft_crc (bool): Compute CRC_A on the host; False uses the
+				reader's CRC coprocessor, at five or more SPI transfers a frame
+			irq (Pin, optional): Input wired to the IRQ output (active low);
+				init() makes the output push-pull, so no pull-up is needed
+			wait (int, optional): WAIT_IRQ, WAIT_TIMER or WAIT_POLL; defaults
+				to WAIT_IRQ with a pin and WAIT_TIMER without
+			deadline_ms (int): Longest a command may run, in wall-clock time
+		"""
 
 		self.spi = spi
 		self.cs = cs
+		self.soft_crc = soft_crc
+		self.irq = irq
+		if wait is None:
+			wait = WAIT_IRQ if irq is not None else WAIT_TIMER
+		if wait == WAIT_IRQ and irq is None:
+			raise ValueError("WAIT_IRQ needs an irq pin")
+		self.wait = wait
+		self.deadline_ms = deadline_ms
+		self.stats = None  # NFCStats when instrumentation is enabled
+		self.cache = None  # Optional CardCache, keyed by the selected UID
+		self._uid = None
+		self.atqa = 0  # ATQA from the last request()
+		# Preallocated transfer buffers; every register or FIFO access is one
+		# SPI transaction under one CS assertion. Slicing a memoryview
+		# allocates on MicroPython, so the views of each FIFO transfer size are
+		# cut once (see _fifo_views()); the frame sizes used are cut here, and
+		# after that a transfer allocates nothing
+		self._reg = bytearray(2)
+		self._regrx = bytearray(2)
+		self._ftx = bytearray(FIFO_SIZE + 1)  # Address byte + FIFO data
+		self._ftx[0] = (FIFO_DATA << 1) & 0x7e
+		self._ftxmv = memoryview(self._ftx)
+		self._fread = bytearray([FIFO_READ_ADDR] * FIFO_SIZE + [0])  # Burst read: address per byte
+		self._freadmv = memoryview(self._fread)
+		self._frx = bytearray(FIFO_SIZE + 1)
+		self._frxmv = memoryview(self._frx)
+		self._fviews = {}  # Transfer size -> views, see _fifo_views()
+		for n in FIFO_VIEW_SIZES:
+			self._fifo_views(n)
+		self._cmd = bytearray(18)  # Frame being built: command bytes + CRC_A
+		self._cmdmv = memoryview(self._cmd)
+		self._ser = bytearray(5)  # UID + BCC from the last anticoll()
+		self._uidbuf = bytearray(10)  # UID being assembled across cascade levels
 		self.cs.value(1)
 		self.spi.init()
 		self.init()
 
 	def _wreg(self, reg, val):
 
+		self._reg[0] = (reg << 1) & 0x7e
+		self._reg[1] = val & 0xff
 		self.cs.value(0)
-		self.spi.write(b'%c' % int(0xff & ((reg << 1) & 0x7e)))
-		self.spi.write(b'%c' % int(0xff & val))
+		self.spi.write(self._reg)
 		self.cs.value(1)
 
 	def _rreg(self, reg):
 
+		self._reg[0] = ((reg << 1) & 0x7e) | 0x80
+		self._reg[1] = 0
 		self.cs.value(0)
-		self.spi.write(b'%c' % int(0xff & (((reg << 1) & 0x7e) | 0x80)))
-		val = self.spi.read(1)
+		self.spi.write_readinto(self._reg, self._regrx)
 		self.cs.value(1)
 
-		return val[0]
+		return self._regrx[1]
+
+	def _fifo_views(self, n):
+		"""
+		Views for an ``n``-byte FIFO transfer, cut on first use
+
+		Returns:
+			tuple: (address + data to write, burst-read addresses, address +
+			data read, data read)
+		"""
+
+		views = self._fviews.get(n)
+		if views is None:
+			views = self._fviews[n] = (self._ftxmv[:n + 1], self._freadmv[FIFO_SIZE - n:],
+				self._frxmv[:n + 1], self._frxmv[1:n + 1])
+		return views
+
+	def _wfifo(self, data, n):
+		"""Burst-write ``n`` bytes into the FIFO"""
+
+		ftx = self._ftx
+		for i in range(n):
+			ftx[i + 1] = data[i]
+		self.cs.value(0)
+		self.spi.write(self._fifo_views(n)[0])
+		self.cs.value(1)
+
+	def _rfifo(self, n):
+		"""Burst-read ``n`` FIFO bytes; the view is valid until the next FIFO read"""
+
+		(_, addr, rx, data) = self._fifo_views(n)
+		self.cs.value(0)
+		self.spi.write_readinto(addr, rx)
+		self.cs.value(1)
+
+		return data
 
 	def _sflags(self, reg, mask):
 		self._wreg(reg, self._rreg(reg) | mask)
@@ -43,47 +216,54 @@ class MFRC522:
 	def _cflags(self, reg, mask):
 		self._wreg(reg, self._rreg(reg) & (~mask))
 
-	def _tocard(self, cmd, send):
+	def _tocard(self, cmd, send, n_send=None):
+		"""
+		Run a FIFO command (0x0C Transceive, 0x0E MFAuthent)
+
+		Returns:
+			tuple: (status, received bytes as a memoryview valid until the next
+			transfer, number of valid bits received). On COLLERR the bytes are
+			those received, valid up to the collision.
+		"""
 
-		recv = []
-		bits = irq_en = wait_irq = n = 0
+		recv = self._fifo_views(0)[3]
+		bits = wait_irq = n = 0
 		stat = self.ERR
 
 		if cmd == 0x0E:
-			irq_en = 0x12
 			wait_irq = 0x10
 		elif cmd == 0x0C:
-			irq_en = 0x77
 			wait_irq = 0x30
 
-		self._wreg(0x02, irq_en | 0x80)
+		# Only completion and the timer drive the (inverted) IRQ pin
+		self._wreg(0x02, wait_irq | 0x01 | 0x80)
 		self._cflags(0x04, 0x80)
 		self._sflags(0x0A, 0x80)
 		self._wreg(0x01, 0x00)
 
-		for c in send:
-			self._wreg(0x09, c)
+		self._wfifo(send, len(send) if n_send is None else n_send)
 		self._wreg(0x01, cmd)
 
+		start = time.ticks_us()
 		if cmd == 0x0C:
 			self._sflags(0x0D, 0x80)
 
-		i = 2000
-		while True:
-			n = self._rreg(0x04)
-			i -= 1
-			if ~((i != 0) and ~(n & 0x01) and ~(n & wait_irq)):
-				break
+		n = self._wait_irq(wait_irq | 0x01)
+		if self.stats is not None:
+			self.stats.command(cmd, n & wait_irq != 0, time.ticks_diff(time.ticks_us(), start))
+			if not n:
+				self.stats.count(cmd, STAT_TIMEOUTS)
 
 		self._cflags(0x0D, 0x80)
 
-		if i:
-			if (self._rreg(0x06) & 0x1B) == 0x00:
-				stat = self.OK
+		if n & wait_irq:
+			err = self._rreg(0x06)
+			if err & 0x13:
+				stat = self.ERR  # Buffer overflow, parity or protocol error
+			else:
+				stat = self.COLLERR if err & 0x08 else self.OK
 
-				if n & irq_en & 0x01:
-					stat = self.NOTAGERR
-				elif cmd == 0x0C:
+				if cmd == 0x0C:
 					n = self._rreg(0x0A)
 					lbits = self._rreg(0x0C) & 0x07
 					if lbits != 0:
@@ -93,44 +273,97 @@ class MFRC522:
 
 					if n == 0:
 						n = 1
-					elif n > 16:
-						n = 16
+					elif n > FIFO_SIZE:
+						n = FIFO_SIZE
 
-					for _ in range(n):
-						recv.append(self._rreg(0x09))
-			else:
-				stat = self.ERR
+					recv = self._rfifo(n)
+		elif n & 0x01:
+			stat = self.NOTAGERR  # Timer ran out: nothing answered
 
 		return stat, recv, bits
 
-	def _crc(self, data):
+	def _wait_irq(self, mask):
+		"""
+		Wait for a ComIrqReg bit in ``mask``
+
+		Returns:
+			int: ComIrqReg, or 0 if deadline_ms passed first
+		"""
+
+		start = time.ticks_ms()
+		if self.wait == WAIT_IRQ:
+			irq = self.irq
+			while irq.value():
+				if time.ticks_diff(time.ticks_ms(), start) >= self.deadline_ms:
+					return 0
+				idle()
+			return self._rreg(0x04)
+
+		timer = self.wait == WAIT_TIMER
+		while True:
+			n = self._rreg(0x04)
+			if n & mask:
+				return n
+			if time.ticks_diff(time.ticks_ms(), start) >= self.deadline_ms:
+				return 0
+			if timer:
+				time.sleep_us(TIMER_POLL_US)
+
+	def enable_stats(self, stats=None):
+		"""
+		Record per-command completion time (0x0C Transceive, 0x0E MFAuthent)
+
+		Returns:
+			NFCStats: The attached collector
+		"""
+		self.stats = stats if stats is not None else NFCStats()
+		return self.stats
+
+	def disable_stats(self):
+		self.stats = None
+
+	def _crc(self, buf, n):
+		"""Append CRC_A of ``buf[:n]`` at ``buf[n]``; returns the new length"""
+
+		if not self.soft_crc:
+			return self._crc_hw(buf, n)
+		crc = crc_a(buf, n)
+		buf[n] = crc & 0xff
+		buf[n + 1] = crc >> 8
+		return n + 2
+
+	def _crc_hw(self, buf, n):
+		"""_crc() on the CRC coprocessor (CalcCRC)"""
 
 		self._cflags(0x05, 0x04)
 		self._sflags(0x0A, 0x80)
 
-		for c in data:
-			self._wreg(0x09, c)
+		self._wfifo(buf, n)
 
 		self._wreg(0x01, 0x03)
 
 		i = 0xFF
 		while True:
-			n = self._rreg(0x05)
+			m = self._rreg(0x05)
 			i -= 1
-			if not ((i != 0) and not (n & 0x04)):
+			if not ((i != 0) and not (m & 0x04)):
 				break
 
-		return [self._rreg(0x22), self._rreg(0x21)]
+		buf[n] = self._rreg(0x22)
+		buf[n + 1] = self._rreg(0x21)
+		return n + 2
 
 	def init(self):
 
 		self.reset()
 		self._wreg(0x2A, 0x8D)
 		self._wreg(0x2B, 0x3E)
-		self._wreg(0x2D, 30)
+		self._wreg(0x2D, TIMER_RELOAD)
 		self._wreg(0x2C, 0)
 		self._wreg(0x15, 0x40)
 		self._wreg(0x11, 0x3D)
+		if self.irq is not None:
+			self._wreg(0x03, 0x80)  # IRQPushPull: the IRQ output is open-drain by default
 		self.antenna_on()
 
 	def reset(self):
@@ -144,69 +377,401 @@ class MFRC522:
 			self._cflags(0x14, 0x03)
 
 	def request(self, mode):
+		"""
+		REQA (REQIDL) or WUPA (REQALL); WUPA also wakes halted cards
+
+		The ATQA is kept in ``atqa``. Cards of different types garble it
+		between them, which still means at least one card answered.
+
+		Returns:
+			tuple: (status, bits received); NOTAGERR if nothing answered,
+			ERR for a garbled answer or a reader fault
+		"""
 
 		self._wreg(0x0D, 0x07)
-		(stat, recv, bits) = self._tocard(0x0C, [mode])
+		self._cmd[0] = mode
+		(stat, recv, bits) = self._tocard(0x0C, self._cmd, 1)
 
-		if (stat != self.OK) | (bits != 0x10):
-			stat = self.ERR
+		if (stat != self.OK and stat != self.COLLERR) | (bits != 0x10):
+			stat = self.NOTAGERR if stat == self.NOTAGERR else self.ERR
+		else:
+			stat = self.OK
+			self.atqa = recv[0] | (recv[1] << 8)
 
 		return stat, bits
 
-	def anticoll(self):
+	def anticoll(self, sel=0x93):
+		"""
+		Anticollision loop of one cascade level
 
-		ser_chk = 0
-		ser = [0x93, 0x20]
+		Each bit collision reported in CollReg is settled for the cards
+		sending a 1 there, and the loop repeats with the known prefix until
+		a single card answers with its full UID CLn.
 
-		self._wreg(0x0D, 0x00)
-		(stat, recv, bits) = self._tocard(0x0C, ser)
-
-		if stat == self.OK:
-			if len(recv) == 5:
-				for i in range(4):
-					ser_chk = ser_chk ^ recv[i]
-				if ser_chk != recv[4]:
-					stat = self.ERR
-			else:
+		Args:
+			sel (int): SEL code of the level, 0x93, 0x95 or 0x97
+
+		Returns:
+			tuple: (status, UID CLn + BCC as a bytearray reused by the next call)
+		"""
+
+		buf = self._cmd
+		buf[0] = sel
+		buf[2:7] = b'\x00\x00\x00\x00\x00'
+		self._cflags(0x0E, 0x80)  # Bits received after a collision read as 0
+		known = 0
+		stat = self.ERR
+
+		while known < 40:
+			nbytes = known >> 3
+			nbits = known & 0x07
+			buf[1] = ((2 + nbytes) << 4) | nbits  # NVB
+			self._wreg(0x0D, (nbits << 4) | nbits)  # RxAlign, TxLastBits
+			(stat, recv, bits) = self._tocard(0x0C, buf, 2 + nbytes + (nbits != 0))
+			if stat != self.OK and stat != self.COLLERR:
+				break
+
+			# The first byte received completes the partial byte sent
+			keep = (1 << nbits) - 1
+			pos = 2 + nbytes
+			for i in range(min(len(recv), 7 - pos)):
+				buf[pos + i] = (buf[pos + i] & keep) | (recv[i] & ~keep)
+				keep = 0
+
+			if stat == self.OK:
+				known = 40
+				break
+
+			coll = self._rreg(0x0E)
+			if coll & 0x20:
+				stat = self.ERR  # CollPosNotValid
+				break
+			# CollPos counts from the first bit received, i.e. after the known ones
+			coll = known + ((coll & 0x1F) or 32) - 1  # Bit index in CLn + BCC
+			if coll < known or coll >= 40:
 				stat = self.ERR
+				break
+			byte = 2 + (coll >> 3)
+			bit = 1 << (coll & 0x07)
+			buf[byte] = (buf[byte] & (bit - 1)) | bit  # Follow the cards sending 1
+			known = coll + 1
+
+		self._wreg(0x0D, 0x00)
+		if stat == self.OK and buf[2] ^ buf[3] ^ buf[4] ^ buf[5] != buf[6]:
+			stat = self.ERR
+
+		self._ser[:] = buf[2:7] if stat == self.OK else b'\x00\x00\x00\x00\x00'
+		return stat, self._ser
 
-		return stat, recv
+	def _select(self, sel, ser):
+		"""
+		SELECT one cascade level
+
+		Returns:
+			int: SAK, or -1 if the card did not answer
+		"""
+
+		buf = self._cmd
+		buf[0] = sel
+		buf[1] = 0x70
+		buf[2:7] = ser[:5]
+		self._wreg(0x0D, 0x00)
+		(stat, recv, bits) = self._tocard(0x0C, buf, self._crc(buf, 7))
+		if stat != self.OK or bits != 0x18:
+			return -1
+		if self.soft_crc and crc_a(recv, 3):
+			return -1
+		return recv[0]
 
 	def select_tag(self, ser):
+		"""Select the card whose level-1 UID + BCC is ``ser``, as from anticoll()"""
+
+		sak = self._select(0x93, ser)
+		if sak >= 0:
+			self._uid = bytes(ser[:4])
+			return self.OK
+		self._uid = None
+		return self.ERR
+
+	def select_card(self):
+		"""
+		Anticollision and SELECT through every cascade level, after request()
+
+		With several cards in the field one of them is selected; the others
+		stay ready until the next request(). Classic cards with a 7-byte UID
+		authenticate with the last four UID bytes.
+
+		Returns:
+			MFRC522Target or None: The selected card, None if failed
+		"""
+
+		uid = self._uidbuf
+		n = 0
+		self._uid = None
+		for sel in SEL_CASCADE:
+			(stat, ser) = self.anticoll(sel)
+			if stat != self.OK:
+				return None
+			sak = self._select(sel, ser)
+			if sak < 0:
+				return None
+			if not sak & SAK_UID_INCOMPLETE:
+				uid[n:n + 4] = ser[:4]
+				self._uid = bytes(uid[:n + 4])
+				return MFRC522Target(self.atqa, sak, self._uid)
+			if ser[0] != CASCADE_TAG:
+				return None
+			uid[n:n + 3] = ser[1:4]
+			n += 3
+		return None
+
+	def select_uid(self, uid):
+		"""
+		Select a card by its known 4, 7 or 10-byte UID, after request()
+
+		Skips the anticollision loop, e.g. for a card from inventory(): wake
+		it with request(REQALL) and select it here.
+
+		Returns:
+			int: SAK, or -1 if failed
+		"""
+
+		self._uid = None
+		if len(uid) not in (4, 7, 10):
+			return -1
+		ser = self._ser
+		levels = len(uid) // 3  # 4 -> 1, 7 -> 2, 10 -> 3
+		pos = 0
+		sak = -1
+		for level in range(levels):
+			if level < levels - 1:
+				ser[0] = CASCADE_TAG
+				ser[1:4] = uid[pos:pos + 3]
+				pos += 3
+			else:
+				ser[0:4] = uid[pos:pos + 4]
+			ser[4] = ser[0] ^ ser[1] ^ ser[2] ^ ser[3]
+			sak = self._select(SEL_CASCADE[level], ser)
+			if sak < 0 or bool(sak & SAK_UID_INCOMPLETE) != (level < levels - 1):
+				return -1
+		self._uid = bytes(uid)
+		return sak
+
+	def halt(self):
+		"""
+		HLTA the selected card; it then answers only to WUPA (REQALL)
+
+		Returns:
+			int: OK if the card went quiet
+		"""
+
+		buf = self._cmd
+		buf[0] = 0x50
+		buf[1] = 0x00
+		self._wreg(0x0D, 0x00)
+		stat = self._tocard(0x0C, buf, self._crc(buf, 2))[0]
+		self.stop_crypto1()  # After HLTA: an authenticated card expects it encrypted
+		self._uid = None
+		return self.OK if stat == self.NOTAGERR else self.ERR
+
+	def inventory(self, max_cards=INVENTORY_MAX):
+		"""
+		Enumerate every card in the field
+
+		Cycle the field so that cards halted earlier are IDLE again, then
+		REQA, select one card through the full cascade and HLTA it until
+		nothing answers. Every card found is left halted; use
+		request(REQALL) and select_uid() to talk to one of them.
+
+		Args:
+			max_cards (int): Stop after this many cards
+
+		Returns:
+			list: MFRC522Target records, empty if no card answered
+		"""
+
+		# A card woken by WUPA falls back to HALT, not IDLE, when another
+		# card wins the anticollision, and REQA would never see it again
+		self.stop_crypto1()
+		self.antenna_on(False)
+		time.sleep_ms(RF_RESET_MS)
+		self.antenna_on()
+		time.sleep_ms(RF_RESET_MS)
 
-		buf = [0x93, 0x70] + ser[:5]
-		buf += self._crc(buf)
-		(stat, recv, bits) = self._tocard(0x0C, buf)
-		return self.OK if (stat == self.OK) and (bits == 0x18) else self.ERR
+		found = []
+		for _ in range(2 * max_cards):  # A card lost mid-select is retried once
+			if len(found) >= max_cards or self.request(self.REQIDL)[0] != self.OK:
+				break
+			target = self.select_card()
+			if target is not None:
+				found.append(target)
+				self.halt()
+		return found
 
 	def auth(self, mode, addr, sect, ser):
-		return self._tocard(0x0E, [mode, addr] + sect + ser[:4])[0]
+
+		buf = self._cmd
+		buf[0] = mode
+		buf[1] = addr
+		for i in range(6):
+			buf[2 + i] = sect[i]
+		for i in range(4):
+			buf[8 + i] = ser[i]
+		return self._tocard(0x0E, buf, 12)[0]
 
 	def stop_crypto1(self):
 		self._cflags(0x08, 0x08)
 
-	def read(self, addr):
-
-		data = [0x30, addr]
-		data += self._crc(data)
-		(stat, recv, _) = self._tocard(0x0C, data)
-		return recv if stat == self.OK else None
+	def read(self, addr, use_cache=True, buf=None):
+		"""
+		Read one 16-byte block
+
+		Returns:
+			bytearray or None: Block data (``buf`` when given) or None if failed
+		"""
+
+		if use_cache and self.cache is not None and self._uid is not None:
+			cached = self.cache.get(self._uid, addr)
+			if cached is not None:
+				if buf is None:
+					return bytearray(cached)
+				buf[:16] = cached
+				return buf
+
+		cmd = self._cmd
+		cmd[0] = 0x30
+		cmd[1] = addr
+		(stat, recv, _) = self._tocard(0x0C, cmd, self._crc(cmd, 2))
+		if stat != self.OK or len(recv) < 18:
+			return None
+		if self.soft_crc and crc_a(recv, 18):
+			return None  # Corrupted in the air
+		recv = self._fifo_views(MIFARE_BLOCK_SIZE)[3]  # Same bytes without CRC_A
+		if self.cache is not None and self._uid is not None:
+			self.cache.put(self._uid, addr, recv)
+		if buf is None:
+			return bytearray(recv)
+		for i in range(MIFARE_BLOCK_SIZE):
+			buf[i] = recv[i]
+		return buf
+
+	def read_sector(self, sector, key, buf, offset=0, mode=AUTHENT1A, use_cache=True):
+		"""
+		Authenticate once and read every block of a sector of the selected card
+
+		On failure Crypto1 is switched off and the card has dropped out of
+		the selected state; dump_card() reselects it.
+
+		Args:
+			sector (int): Sector number
+			key (bytes or list): 6-byte key
+			buf (bytearray): Destination; blocks are stored back to back
+			offset (int): Position in ``buf`` of the first block
+			mode (int): AUTHENT1A or AUTHENT1B
+			use_cache (bool): False reads the card even if the sector is cached
+
+		Returns:
+			bool: True if the whole sector was read
+		"""
+
+		uid = self._uid
+		if uid is None:
+			return False
+		first = mifare_sector_first_block(sector)
+		blocks = mifare_sector_blocks(sector)
+		if use_cache and self.cache is not None and self.cache.read_into(uid, first, blocks, buf, offset):
+			return True
+		if self.auth(mode, first, key, uid[-4:]) != self.OK:
+			self.stop_crypto1()
+			return False
+
+		mv = memoryview(buf)
+		pos = offset
+		for block in range(first, first + blocks):
+			if self.read(block, False, mv[pos:pos + MIFARE_BLOCK_SIZE]) is None:
+				self.stop_crypto1()
+				return False
+			pos += MIFARE_BLOCK_SIZE
+		return True
+
+	def dump_card(self, key, buf, sectors=MIFARE_1K_SECTORS, mode=AUTHENT1A, use_cache=True):
+		"""
+		Read the selected Mifare Classic card into one buffer
+
+		Sectors follow each other under nested authentication, without
+		reselecting. A sector that fails is left untouched in ``buf`` and
+		the card is woken and reselected by UID for the remaining ones.
+		Crypto1 is off again when this returns.
+
+		Args:
+			key (bytes or list): 6-byte key used for every sector
+			buf (bytearray): Destination, at least 1024 bytes (4096 with
+				sectors=MIFARE_4K_SECTORS)
+			sectors (int): Number of sectors to read
+			mode (int): AUTHENT1A or AUTHENT1B
+			use_cache (bool): As for read_sector()
+
+		Returns:
+			list: Numbers of the sectors that could not be read
+		"""
+
+		failed = []
+		uid = self._uid
+		for sector in range(sectors):
+			offset = mifare_sector_first_block(sector) * MIFARE_BLOCK_SIZE
+			if not self.read_sector(sector, key, buf, offset, mode, use_cache):
+				failed.append(sector)
+				if uid is None or not self._reselect(uid):
+					failed.extend(range(sector + 1, sectors))
+					break
+		self.stop_crypto1()
+		return failed
+
+	def dump_1k(self, key, buf, mode=AUTHENT1A, use_cache=True):
+		"""dump_card() of the 16 sectors of a Classic 1K into a 1024-byte ``buf``"""
+		return self.dump_card(key, buf, MIFARE_1K_SECTORS, mode, use_cache)
+
+	def dump_4k(self, key, buf, mode=AUTHENT1A, use_cache=True):
+		"""dump_card() of the 40 sectors of a Classic 4K into a 4096-byte ``buf``"""
+		return self.dump_card(key, buf, MIFARE_4K_SECTORS, mode, use_cache)
+
+	def _reselect(self, uid):
+		"""
+		Wake and reselect a card after a failed authentication or read
+
+		A card still active after the failure ignores WUPA; cycling the
+		field resets it.
+		"""
+		self.stop_crypto1()
+		if self.request(self.REQALL)[0] != self.OK:
+			self.antenna_on(False)
+			time.sleep_ms(RF_RESET_MS)
+			self.antenna_on()
+			time.sleep_ms(RF_RESET_MS)
+			if self.request(self.REQALL)[0] != self.OK:
+				return False
+		return self.select_uid(uid) >= 0
 
 	def write(self, addr, data):
 
-		buf = [0xA0, addr]
-		buf += self._crc(buf)
-		(stat, recv, bits) = self._tocard(0x0C, buf)
+		buf = self._cmd
+		buf[0] = 0xA0
+		buf[1] = addr
+		(stat, recv, bits) = self._tocard(0x0C, buf, self._crc(buf, 2))
 
 		if not (stat == self.OK) or not (bits == 4) or not ((recv[0] & 0x0F) == 0x0A):
 			stat = self.ERR
 		else:
-			buf = []
-			for i in range(16):
-				buf.append(data[i])
-			buf += self._crc(buf)
-			(stat, recv, bits) = self._tocard(0x0C, buf)
+			buf[0:16] = bytes(data[:16]) if isinstance(data, list) else data[:16]
+			(stat, recv, bits) = self._tocard(0x0C, buf, self._crc(buf, 16))
 			if not (stat == self.OK) or not (bits == 4) or not ((recv[0] & 0x0F) == 0x0A):
 				stat = self.ERR
 
+		# Write through; a trailer reads back masked and a failed write is unknown
+		if self.cache is not None and self._uid is not None:
+			if stat == self.OK and not classic_trailer(addr):
+				self.cache.put(self._uid, addr, data[:16])
+			else:
+				self.cache.invalidate(self._uid, addr)
+
 		return stat
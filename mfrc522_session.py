@@ -0,0 +1,116 @@
+from mfrc522 import MFRC522
+
+SESSION_LEAVE_POLLS = 2       # Consecutive silent polls before the card counts as gone
+SESSION_REINIT_ERRORS = 3     # Consecutive faulty polls before the chip is re-initialised
+
+
+class ReaderSession:
+    """
+    Long-lived MFRC522 poll loop that tracks the card in the field
+
+    The reader is set up once. Each poll is a WUPA: silence means an empty
+    field and costs a single frame. When something answers and a card is
+    already known, it is reselected by UID, skipping the anticollision
+    loop; only a failed reselect runs the full cascade to find the new
+    card. The card is halted after every poll so the next WUPA finds it
+    again, whether or not it left the field in between.
+
+    The chip is re-initialised only after ``reinit_errors`` consecutive
+    polls ended in a garbled answer or a reader fault, never on an empty
+    field. Such polls leave the tracked card as it was.
+
+    Example:
+        session = ReaderSession(MFRC522(spi, cs))
+        while True:
+            target = session.poll()
+            if session.arrived:
+                print(target)
+
+    Args:
+        rdr (MFRC522): Reader; already initialised by its constructor
+        leave_polls (int): Silent polls before the card is reported gone
+        reinit_errors (int): Faulty polls in a row before rdr.init()
+    """
+    def __init__(self, rdr, leave_polls=SESSION_LEAVE_POLLS, reinit_errors=SESSION_REINIT_ERRORS):
+        self.rdr = rdr
+        self.leave_polls = leave_polls
+        self.reinit_errors = reinit_errors
+        self.target = None      # MFRC522Target in the field, None if empty
+        self.arrived = False    # True when the last poll found a new card
+        self._misses = 0
+        self._faults = 0
+        self.polls = 0
+        self.arrivals = 0
+        self.errors = 0
+        self.reinits = 0
+
+    def poll(self):
+        """
+        One presence check
+
+        Returns:
+            MFRC522Target or None: The card in the field; kept through up to
+            leave_polls - 1 silent polls so a card at the edge does not flicker
+        """
+        rdr = self.rdr
+        self.polls += 1
+        self.arrived = False
+        stat = rdr.request(rdr.REQALL)[0]
+        if stat == MFRC522.NOTAGERR:
+            self._faults = 0
+            return self._missed()
+        if stat != MFRC522.OK:
+            return self._fault()
+
+        target = self.target
+        if target is not None:
+            if rdr.select_uid(target.uid) >= 0:
+                return self._seen(target)
+            # Another card, or the same one answering badly: start over
+            if rdr.request(rdr.REQALL)[0] != MFRC522.OK:
+                return self._fault()
+
+        found = rdr.select_card()
+        if found is None:
+            return self._fault()
+        if target is None or found.uid != target.uid:
+            self.arrived = True
+            self.arrivals += 1
+        return self._seen(found)
+
+    def forget(self):
+        """Drop the tracked card; the next poll reports it as arriving again"""
+        self.target = None
+        self._misses = 0
+
+    def as_dict(self):
+        """Snapshot of the counters"""
+        return {
+            'polls': self.polls,
+            'arrivals': self.arrivals,
+            'errors': self.errors,
+            'reinits': self.reinits,
+        }
+
+    def _seen(self, target):
+        self.rdr.halt()
+        self.target = target
+        self._misses = 0
+        self._faults = 0
+        return target
+
+    def _missed(self):
+        if self.target is not None:
+            self._misses += 1
+            if self._misses >= self.leave_polls:
+                self.forget()
+        return self.target
+
+    def _fault(self):
+        self.errors += 1
+        self._faults += 1
+        if self._faults >= self.reinit_errors:
+            self.rdr.init()
+            self.reinits += 1
+            self._faults = 0
+        return self.target  # A fault says nothing about the card
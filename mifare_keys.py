@@ -0,0 +1,89 @@
+try:
+    from collections import OrderedDict
+except ImportError:
+    from ucollections import OrderedDict
+
+KEY_DEFAULT = b'\xFF\xFF\xFF\xFF\xFF\xFF'      # Transport key
+KEY_MAD = b'\xA0\xA1\xA2\xA3\xA4\xA5'          # MAD sector key A
+KEY_NDEF = b'\xD3\xF7\xD3\xF7\xD3\xF7'         # NFC Forum sector key A
+KEY_ZERO = b'\x00\x00\x00\x00\x00\x00'
+COMMON_KEYS = (KEY_DEFAULT, KEY_MAD, KEY_NDEF, KEY_ZERO)
+
+AUTH_A = 0
+AUTH_B = 1
+
+KEY_CACHE_SIZE = 64         # UID/sector entries kept
+
+
+class MifareKeyManager:
+    """
+    Key dictionary for Mifare Classic plus a cache of the key that worked
+
+    Pass it wherever a driver method takes ``key``. Candidates come from
+    candidates(): the key that last opened the sector on that card first,
+    then every dictionary key as key A and as key B. The cache is a bounded
+    LRU keyed by UID and sector, so a card seen before authenticates on the
+    first try.
+
+    Args:
+        keys (iterable): 6-byte keys to try, in order
+        cache_size (int): Maximum number of UID/sector entries remembered
+        auth_types (tuple): Key slots to try for each key (AUTH_A, AUTH_B)
+    """
+    def __init__(self, keys=COMMON_KEYS, cache_size=KEY_CACHE_SIZE, auth_types=(AUTH_A, AUTH_B)):
+        self.keys = [bytes(k) for k in keys]
+        self.cache_size = cache_size
+        self.auth_types = auth_types
+        self._cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def add_key(self, key):
+        """Append a key to the dictionary"""
+        key = bytes(key)
+        if key not in self.keys:
+            self.keys.append(key)
+
+    def candidates(self, uid, sector):
+        """Yield (auth_type, key) pairs, the cached one first"""
+        cached = self._cache.get((bytes(uid), sector))
+        if cached is not None:
+            yield cached
+        for key in self.keys:
+            for auth_type in self.auth_types:
+                if cached is None or cached[0] != auth_type or cached[1] != key:
+                    yield auth_type, key
+
+    def lookup(self, uid, sector):
+        """Cached (auth_type, key) for a sector, or None"""
+        return self._cache.get((bytes(uid), sector))
+
+    def remember(self, uid, sector, auth_type, key):
+        """Record the key that opened a sector, evicting the least recently used entry"""
+        entry = (bytes(uid), sector)
+        cached = self._cache.pop(entry, None)
+        if cached is not None and cached[0] == auth_type and cached[1] == key:
+            self.hits += 1
+        else:
+            self.misses += 1
+            cached = (auth_type, bytes(key))
+        self._cache[entry] = cached
+        if len(self._cache) > self.cache_size:
+            del self._cache[next(iter(self._cache))]
+
+    def forget(self, uid, sector=None):
+        """Drop the cached key of one sector, or of every sector of a card"""
+        uid = bytes(uid)
+        if sector is not None:
+            self._cache.pop((uid, sector), None)
+            return
+        for entry in [e for e in self._cache if e[0] == uid]:
+            del self._cache[entry]
+
+    def clear(self):
+        self._cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._cache)
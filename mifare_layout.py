@@ -0,0 +1,37 @@
+# Mifare Classic layout, shared by the PN532 and MFRC522 drivers
+MIFARE_BLOCK_SIZE = 16
+MIFARE_1K_SECTORS = 16
+MIFARE_4K_SECTORS = 40
+MIFARE_1K_SIZE = 1024
+MIFARE_4K_SIZE = 4096
+
+
+def classic_trailer(block):
+    """True if a Mifare Classic block is a sector trailer (key A never reads back)"""
+    if block < 128:
+        return block & 0x03 == 0x03
+    return (block - 128) & 0x0F == 0x0F
+
+
+def mifare_sector_first_block(sector):
+    """First block of a sector (sectors 32+ of a 4K card hold 16 blocks)"""
+    if sector < 32:
+        return sector * 4
+    return 128 + (sector - 32) * 16
+
+
+def mifare_sector_blocks(sector):
+    """Number of blocks in a sector, including the trailer"""
+    return 4 if sector < 32 else 16
+
+
+def mifare_sector_of(block):
+    """Sector holding a block"""
+    if block < 128:
+        return block // 4
+    return 32 + (block - 128) // 16
+
+
+def mifare_block_writable(block, allow_trailers=False):
+    """False for the manufacturer block, and for trailers unless allowed"""
+    return block != 0 and (allow_trailers or not classic_trailer(block))
@@ -1,12 +1,14 @@
 from machine import I2C, Pin
-import time
 from NFCModule import NFC_Module  # Ensure this matches your library filename
-import testNFC  
+from mifare_keys import MifareKeyManager, COMMON_KEYS
 
 # Initialize I2C and NFC module
 i2c = I2C(0, scl=Pin(22), sda=Pin(21))  # Adjust pins for your setup
 nfc = NFC_Module(i2c)
 
+# Keys tried per sector (A and B); the one that works is remembered per card
+keys = MifareKeyManager(COMMON_KEYS)
+
 def setup():
     """Setup NFC module"""
     print("MF1S50 Reader Demo From Elechouse!")
@@ -23,50 +25,46 @@ def setup():
     print(f"Firmware ver. {(versiondata >> 16) & 0xFF}.{(versiondata >> 8) & 0xFF}")
     
     # Configure SAM (Set normal mode)
-    testNFC.configure_sam_debug()
-#     if not nfc.sam_configuration():
-#         print("Failed to configure SAM mode")
-#         while True:
-#             pass  # Halt execution
+    if not nfc.sam_configuration():
+        print("Failed to configure SAM mode")
+        while True:
+            pass  # Halt execution
+
+# Blocks 4 to 7 (sector 1)
+sector_buf = bytearray(4 * 16)
 
 def loop():
     """Main loop for polling and reading NFC cards"""
-    buf = bytearray(32)
     print("Polling for an NFC card...")
     
-    # Poll for MIFARE cards
-    if nfc.in_list_passive_target():
+    # Let the PN532 poll for MIFARE cards; returns as soon as one is in the field
+    targets = nfc.autopoll()
+    if targets:
         print("Card detected!")
+        uid = targets[0].uid
         
         # Check the UID length and proceed if valid
-        uid_length = buf[0]
+        uid_length = len(uid)
         if uid_length == 4:  # MIFARE Classic card typically has a 4-byte UID
             print(f"UUID length: {uid_length}")
-            uid = buf[1:1+uid_length]
-            print(f"UUID: {uid.hex().upper()}")
+            print(f"UUID: {bytes(uid).hex().upper()}")
             
-            # Default KeyA for MIFARE: 0xFF 0xFF 0xFF 0xFF 0xFF 0xFF
-            key = bytearray([0xFF] * 6)
             blocknum = 4
             
-            # Authenticate block 4
-            if nfc.mifare_authenticate(0, blocknum, uid, key):
+            # Uncomment below to write to block 4
+            # if nfc.mifare_auth_sector(1, uid, keys):
+            #     block_data = bytearray(b"Elechouse - NFC")
+            #     if nfc.mifare_write_block(blocknum, block_data):
+            #         print("Write block successfully.")
+            
+            # Find the sector key (cached after the first visit), then read blocks 4 to 7
+            if nfc.read_sector(1, uid, keys, sector_buf):
                 print("Authentication success.")
-                
-                # Uncomment below to write to block 4
-                # block_data = bytearray(b"Elechouse - NFC")
-                # if nfc.mifare_write_block(blocknum, block_data):
-                #     print("Write block successfully.")
-                
-                # Read blocks 4 to 7
                 for i in range(4):
-                    block = nfc.mifare_read_block(blocknum + i)
-                    if block:
-                        print(f"Read block {blocknum + i} successfully: {block.hex().upper()}")
-                    else:
-                        print(f"Failed to read block {blocknum + i}.")
+                    block = sector_buf[i * 16:(i + 1) * 16]
+                    print(f"Read block {blocknum + i} successfully: {block.hex().upper()}")
             else:
-                print("Authentication failed.")
+                print("Failed to read blocks 4 to 7.")
         else:
             print("Invalid UID length or unsupported card.")
     else:
@@ -78,4 +76,3 @@ setup()
 # Continuous polling
 while True:
     loop()
-    time.sleep(1)
@@ -0,0 +1,389 @@
+"""
+NDEF messages in Type 2 tag memory
+
+Decoding works on the card-memory buffer itself: records are memoryview
+slices of it, nothing is copied. NDEFDecoder can be fed while pages are
+still arriving, so a reader can stop as soon as it has the record it wants.
+NDEFWriter encodes a message, wrapped in its TLV, into a preallocated buffer.
+"""
+
+# TLV blocks of the Type 2 tag data area
+TLV_NULL = 0x00
+TLV_LOCK_CONTROL = 0x01
+TLV_MEMORY_CONTROL = 0x02
+TLV_NDEF = 0x03
+TLV_PROPRIETARY = 0xFD
+TLV_TERMINATOR = 0xFE
+
+# Record header flags
+NDEF_MB = 0x80      # Message begin
+NDEF_ME = 0x40      # Message end
+NDEF_CF = 0x20      # Chunk flag: the payload continues in the next record
+NDEF_SR = 0x10      # Short record: one-byte payload length
+NDEF_IL = 0x08      # ID length field present
+NDEF_TNF_MASK = 0x07
+
+# Type Name Format
+TNF_EMPTY = 0x00
+TNF_WELL_KNOWN = 0x01
+TNF_MEDIA = 0x02
+TNF_ABSOLUTE_URI = 0x03
+TNF_EXTERNAL = 0x04
+TNF_UNKNOWN = 0x05
+TNF_UNCHANGED = 0x06    # Type of every chunk after the first
+TNF_RESERVED = 0x07
+
+# Well-known record types
+RTD_TEXT = b'T'
+RTD_URI = b'U'
+
+NDEF_RECORD_MIN = 3     # Header, type length and short payload length
+
+# URI identifier codes; the index is the first payload byte of a URI record
+URI_PREFIXES = (
+    '', 'http://www.', 'https://www.', 'http://', 'https://', 'tel:', 'mailto:',
+    'ftp://anonymous:anonymous@', 'ftp://ftp.', 'ftps://', 'sftp://', 'smb://',
+    'nfs://', 'ftp://', 'dav://', 'news:', 'telnet://', 'imap:', 'rtsp://',
+    'urn:', 'pop:', 'sip:', 'sips:', 'tftp:', 'btspp://', 'btl2cap://',
+    'btgoep://', 'tcpobex://', 'irdaobex://', 'file://', 'urn:epc:id:',
+    'urn:epc:tag:', 'urn:epc:pat:', 'urn:epc:raw:', 'urn:epc:', 'urn:nfc:',
+)
+
+
+class NDEFRecord:
+    """
+    View of one NDEF record inside a card-memory buffer
+
+    ``type``, ``id`` and ``payload`` are memoryview slices of that buffer and
+    stay valid only as long as its contents do. A chunked record keeps one
+    payload view per chunk in ``chunks``; ``payload`` is then the first chunk.
+    """
+    def __init__(self, header, type, id, payload, chunks=None):
+        self.header = header
+        self.type = type
+        self.id = id
+        self.payload = payload
+        self.chunks = chunks
+
+    @property
+    def tnf(self):
+        return self.header & NDEF_TNF_MASK
+
+    @property
+    def payload_length(self):
+        if self.chunks is None:
+            return len(self.payload)
+        n = 0
+        for chunk in self.chunks:
+            n += len(chunk)
+        return n
+
+    def payload_into(self, buf, offset=0):
+        """
+        Copy the whole payload, chunks joined, into ``buf`` at ``offset``
+
+        Returns:
+            int: Bytes copied
+        """
+        pos = offset
+        for chunk in self.chunks if self.chunks is not None else (self.payload,):
+            buf[pos:pos + len(chunk)] = chunk
+            pos += len(chunk)
+        return pos - offset
+
+    def is_type(self, tnf, type):
+        return self.tnf == tnf and len(self.type) == len(type) and bytes(self.type) == type
+
+    def uri(self):
+        """URI of a well-known U or absolute-URI record, else None"""
+        if self.tnf == TNF_ABSOLUTE_URI:
+            return bytes(self.type).decode('utf-8')
+        if not self.is_type(TNF_WELL_KNOWN, RTD_URI):
+            return None
+        data = self._joined()
+        if not data:
+            return None
+        prefix = URI_PREFIXES[data[0]] if data[0] < len(URI_PREFIXES) else ''
+        return prefix + bytes(data[1:]).decode('utf-8')
+
+    def text(self):
+        """Text of a well-known T record, else None"""
+        if not self.is_type(TNF_WELL_KNOWN, RTD_TEXT):
+            return None
+        data = self._joined()
+        if not data:
+            return None
+        start = 1 + (data[0] & 0x3F)  # Status byte, then the language code
+        try:
+            return bytes(data[start:]).decode('utf-16' if data[0] & 0x80 else 'utf-8')
+        except (UnicodeError, LookupError):
+            return None
+
+    def lang(self):
+        """Language code of a T record, else None"""
+        if not self.is_type(TNF_WELL_KNOWN, RTD_TEXT) or not len(self.payload):
+            return None
+        return bytes(self.payload[1:1 + (self.payload[0] & 0x3F)]).decode()
+
+    def _joined(self):
+        if self.chunks is None:
+            return self.payload
+        buf = bytearray(self.payload_length)
+        self.payload_into(buf)
+        return buf
+
+    def __repr__(self):
+        return 'NDEFRecord(tnf={}, type={}, payload={} bytes)'.format(
+            self.tnf, bytes(self.type), self.payload_length)
+
+
+class NDEFDecoder:
+    """
+    Incremental TLV and NDEF decoder over a buffer that is being filled
+
+    Call feed() with the number of valid bytes after each read. ``need`` is
+    how many bytes must be valid before decoding can go on, ``end`` the end
+    of the NDEF message once its TLV has been seen, ``done`` whether the
+    message (or the TLV area) is finished.
+
+        dec = NDEFDecoder(buf)
+        while not dec.done:
+            avail = read_more(buf, dec.need)
+            for record in dec.feed(avail):
+                ...
+    """
+    def __init__(self, buf, start=0):
+        self.mv = memoryview(buf)
+        self.pos = start
+        self.need = start + 1
+        self.end = 0
+        self.done = False
+        self._head = None    # (header, type, id) of a chunked record in progress
+        self._chunks = None
+
+    def feed(self, avail):
+        """Decode as far as the first ``avail`` bytes allow; yields each completed NDEFRecord"""
+        avail = min(avail, len(self.mv))
+        while not self.done and self.need <= avail:
+            if not self.end:
+                self._tlv(avail)
+                continue
+            record = self._record(avail)
+            if record is not None:
+                yield record
+
+    def _tlv(self, avail):
+        mv = self.mv
+        pos = self.pos
+        tag = mv[pos]
+        if tag == TLV_NULL:
+            self.pos = pos + 1
+            self._expect(self.pos + 1, len(mv))
+            return
+        if tag == TLV_TERMINATOR:
+            self.done = True  # No NDEF message
+            return
+        if avail < pos + 2:
+            self.need = pos + 2
+            return
+        length = mv[pos + 1]
+        start = pos + 2
+        if length == 0xFF:
+            if avail < pos + 4:
+                self.need = pos + 4
+                return
+            length = (mv[pos + 2] << 8) | mv[pos + 3]
+            start = pos + 4
+        if tag == TLV_NDEF:
+            self.pos = start
+            self.end = start + length
+            if not length:
+                self.done = True  # Empty message
+                return
+            self._expect(start + NDEF_RECORD_MIN, self.end)
+        else:
+            self.pos = start + length
+            self._expect(self.pos + 1, len(self.mv))
+
+    def _record(self, avail):
+        mv = self.mv
+        pos = self.pos
+        header = mv[pos]
+        type_len = mv[pos + 1]
+        if header & NDEF_SR:
+            payload_len = mv[pos + 2]
+            p = pos + 3
+        else:
+            if avail < pos + 6:
+                self._expect(pos + 6, self.end)
+                return None
+            payload_len = (mv[pos + 2] << 24) | (mv[pos + 3] << 16) | (mv[pos + 4] << 8) | mv[pos + 5]
+            p = pos + 6
+        id_len = 0
+        if header & NDEF_IL:
+            if avail < p + 1:
+                self._expect(p + 1, self.end)
+                return None
+            id_len = mv[p]
+            p += 1
+        end = p + type_len + id_len + payload_len
+        if end > self.end:
+            self.done = True  # Record overruns the message
+            return None
+        if avail < end:
+            self.need = end
+            return None
+
+        type = mv[p:p + type_len]
+        p += type_len
+        id = mv[p:p + id_len]
+        payload = mv[p + id_len:end]
+        self.pos = end
+        if header & NDEF_ME or end == self.end:
+            self.done = True
+        else:
+            self._expect(end + NDEF_RECORD_MIN, self.end)
+
+        if header & NDEF_CF:
+            if self._chunks is None:
+                self._head = (header, type, id)
+                self._chunks = [payload]
+            else:
+                self._chunks.append(payload)
+            return None
+        if self._chunks is not None:
+            # Last chunk: report the record under the first chunk's header and type
+            self._chunks.append(payload)
+            head, type, id = self._head
+            record = NDEFRecord((head & ~NDEF_CF) | (header & NDEF_ME), type, id, self._chunks[0], self._chunks)
+            self._head = self._chunks = None
+            return record
+        return NDEFRecord(header, type, id, payload)
+
+    def _expect(self, need, limit):
+        """Set the next requirement, or finish if it lies beyond ``limit``"""
+        if need > limit:
+            self.done = True
+        else:
+            self.need = need
+
+
+def decode_message(buf, start=0):
+    """Decode every record of the NDEF message in a fully read TLV area"""
+    return list(NDEFDecoder(buf, start).feed(len(buf)))
+
+
+class NDEFWriter:
+    """
+    Encodes an NDEF message, wrapped in an NDEF TLV, into a preallocated buffer
+
+        w = NDEFWriter(buf)
+        w.uri('https://example.com')
+        w.text('hello')
+        n = w.finish()  # Bytes used, terminator TLV included
+
+    Raises ValueError when the buffer is too small.
+    """
+    def __init__(self, buf, offset=0):
+        self.buf = buf
+        self.offset = offset
+        self.pos = offset + 4  # Room for the long TLV header (03 FF hh ll)
+        self._last = -1        # Header position of the last record
+
+    def record(self, tnf, type, payload, id=None):
+        """Append a record; ``type``, ``payload`` and ``id`` are bytes-like"""
+        pos = self._header(tnf, len(type), len(payload), len(id) if id else 0, type)
+        if id:
+            pos = self._put(pos, id)
+        self.pos = self._put(pos, payload)
+
+    def uri(self, uri):
+        """Append a well-known URI record, abbreviating the longest known prefix"""
+        code = 0
+        for i in range(1, len(URI_PREFIXES)):
+            if uri.startswith(URI_PREFIXES[i]) and len(URI_PREFIXES[i]) > len(URI_PREFIXES[code]):
+                code = i
+        rest = uri[len(URI_PREFIXES[code]):]
+        if isinstance(rest, str):
+            rest = rest.encode('utf-8')
+        pos = self._header(TNF_WELL_KNOWN, 1, 1 + len(rest), 0, RTD_URI)
+        self.buf[pos] = code
+        self.pos = self._put(pos + 1, rest)
+
+    def text(self, text, lang='en'):
+        """Append a well-known UTF-8 text record"""
+        if isinstance(text, str):
+            text = text.encode('utf-8')
+        lang = lang.encode()
+        pos = self._header(TNF_WELL_KNOWN, 1, 1 + len(lang) + len(text), 0, RTD_TEXT)
+        self.buf[pos] = len(lang)
+        pos = self._put(pos + 1, lang)
+        self.pos = self._put(pos, text)
+
+    def finish(self):
+        """
+        Set ME on the last record, fill in the TLV header and add the terminator
+
+        Returns:
+            int: End offset of the encoded TLV area
+        """
+        buf = self.buf
+        start = self.offset + 4
+        length = self.pos - start
+        if self._last >= 0:
+            buf[self._last] |= NDEF_ME
+        if length < 0xFF:
+            # Short TLV length: slide the records down over the unused two bytes
+            for i in range(start, self.pos):
+                buf[i - 2] = buf[i]
+            start -= 2
+            buf[self.offset + 1] = length
+        else:
+            buf[self.offset + 1] = 0xFF
+            buf[self.offset + 2] = length >> 8
+            buf[self.offset + 3] = length & 0xFF
+        buf[self.offset] = TLV_NDEF
+        end = start + length
+        self._check(end + 1)
+        buf[end] = TLV_TERMINATOR
+        return end + 1
+
+    def _header(self, tnf, type_len, payload_len, id_len, type):
+        """Write a record header and type; returns where the ID/payload go"""
+        buf = self.buf
+        pos = self.pos
+        short = payload_len < 0x100
+        self._check(pos + (3 if short else 6) + (1 if id_len else 0) + type_len + id_len + payload_len)
+        flags = tnf
+        if self._last < 0:
+            flags |= NDEF_MB
+        if short:
+            flags |= NDEF_SR
+        if id_len:
+            flags |= NDEF_IL
+        buf[pos] = flags
+        buf[pos + 1] = type_len
+        self._last = pos
+        pos += 2
+        if short:
+            buf[pos] = payload_len
+            pos += 1
+        else:
+            buf[pos] = payload_len >> 24
+            buf[pos + 1] = (payload_len >> 16) & 0xFF
+            buf[pos + 2] = (payload_len >> 8) & 0xFF
+            buf[pos + 3] = payload_len & 0xFF
+            pos += 4
+        if id_len:
+            buf[pos] = id_len
+            pos += 1
+        return self._put(pos, type)
+
+    def _put(self, pos, data):
+        end = pos + len(data)
+        self.buf[pos:end] = data
+        return end
+
+    def _check(self, end):
+        if end > len(self.buf):
+            raise ValueError('NDEF message does not fit in the buffer')
@@ -0,0 +1,190 @@
+"""
+Throughput benchmark for NFC_Module against the PN532 simulator
+
+    python nfc_bench.py [iterations] [chip_latency_ms]
+
+Reports transactions/sec, p50/p99 latency and heap allocation per operation
+for get_version, poll, authenticate, read-block, full-card dumps, a 1 KB
+P2P round trip, and one scan of four readers in turn versus through a
+ReaderPool.
+
+The simulator needs CPython, so allocation comes from tracemalloc snapshots
+filtered to the driver modules (BENCH_DRIVER_MODULES): bytes allocated by
+driver code and still live when the operation returns, such as returned
+data or held response views. The simulator's own allocations are left out,
+and so are driver temporaries freed within the call. The figures are for
+comparing runs, not MicroPython heap use.
+"""
+import sys
+import time
+import tracemalloc
+
+import pn532_sim
+
+BENCH_UID = b'\x01\x02\x03\x04'
+BENCH_NTAG_UID = b'\x04\x11\x22\x33\x44\x55\x66'
+BENCH_READERS = 4
+BENCH_DRIVER_MODULES = ('NFCModule', 'AsyncNFCModule', 'nfc_pool', 'nfc_power', 'nfc_stats',
+                        'card_cache', 'mifare_keys', 'ndef')
+
+
+def _alloc_probe():
+    """Return (start, stop) functions measuring driver bytes allocated in between"""
+    filters = [tracemalloc.Filter(True, sys.modules[name].__file__)
+               for name in BENCH_DRIVER_MODULES if name in sys.modules]
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+    def start():
+        return tracemalloc.take_snapshot().filter_traces(filters)
+
+    def stop(mark):
+        diff = tracemalloc.take_snapshot().filter_traces(filters).compare_to(mark, 'filename')
+        return sum(stat.size_diff for stat in diff if stat.size_diff > 0)
+    return start, stop
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * fraction))
+    return sorted_values[index]
+
+
+def run(name, op, iterations):
+    """
+    Time ``op`` over ``iterations`` calls
+
+    Returns:
+        dict: name, ops, failures, tps, p50_us, p99_us, alloc_per_op
+    """
+    alloc_start, alloc_stop = _alloc_probe()
+    op()  # Warm up caches and lazily created state
+    latencies = []
+    failures = 0
+    alloc = 0
+    for _ in range(iterations):
+        mark = alloc_start()
+        t0 = time.ticks_us()
+        ok = op()
+        latencies.append(time.ticks_diff(time.ticks_us(), t0))
+        alloc += alloc_stop(mark)
+        if not ok:
+            failures += 1
+    total_us = sum(latencies)  # Excludes the allocation snapshots
+    latencies.sort()
+    return {
+        'name': name,
+        'ops': iterations,
+        'failures': failures,
+        'tps': iterations * 1000000 / total_us if total_us else 0,
+        'p50_us': _percentile(latencies, 0.50),
+        'p99_us': _percentile(latencies, 0.99),
+        'alloc_per_op': alloc // iterations if iterations else 0,
+    }
+
+
+def benchmarks(nfc, chip):
+    """The standard operation set; returns (name, op, setup) triples"""
+    key = pn532_sim.DEFAULT_KEY
+    block = bytearray(16)
+    card = bytearray(1024)
+    ntag = bytearray(135 * 4)
+    payload = bytes(1024)
+    reply = bytearray(1024)
+
+    def classic():
+        chip.cards[:] = [pn532_sim.VirtualMifareClassic(BENCH_UID)]
+        return nfc.in_list_passive_target()
+
+    def type2():
+        chip.cards[:] = [pn532_sim.VirtualNTAG(BENCH_NTAG_UID)]
+        return nfc.in_list_passive_target()
+
+    def peer():
+        chip.cards[:] = [pn532_sim.VirtualP2PTarget()]
+        return nfc.p2p_initiator_init()
+
+    def authenticate():
+        return nfc.mifare_authenticate(0, 4, BENCH_UID, key)
+
+    def read_block():
+        return nfc.mifare_read_block(4, block) is not None
+
+    def dump():
+        return not nfc.dump_card(BENCH_UID, key, card)
+
+    def ntag_dump():
+        return nfc.ntag_read(0, 135, ntag)
+
+    def p2p():
+        return nfc.p2p_exchange(payload, reply) == len(payload)
+
+    return [
+        ('get_version', lambda: nfc.get_version() != 0, None),
+        ('poll', lambda: nfc.in_list_passive_target() is not None, classic),
+        ('authenticate', authenticate, classic),
+        ('read-block', read_block, lambda: classic() and authenticate()),
+        ('dump-1k', dump, classic),
+        ('ntag215-dump', ntag_dump, type2),
+        ('p2p-1k', p2p, peer),
+    ]
+
+
+def pool_benchmarks(latency_ms):
+    """Four readers on two buses, a card on each: scan them in turn, then interleaved"""
+    from NFCModule import NFC_Module
+    from nfc_pool import ReaderPool
+
+    buses = (pn532_sim.SimI2C(), pn532_sim.SimI2C())
+    readers = []
+    for i in range(BENCH_READERS):
+        chip = pn532_sim.PN532Simulator(latency_ms=latency_ms)
+        chip.add_card(pn532_sim.VirtualMifareClassic(bytes([i + 1]) + BENCH_UID[1:]))
+        address = pn532_sim.PN532_I2C_ADDRESS + i // 2
+        buses[i % 2].devices[address] = chip
+        readers.append(NFC_Module(buses[i % 2], address=address))
+    pool = ReaderPool(readers, profile=None)
+
+    def sequential():
+        ok = True
+        for reader in readers:
+            ok = reader.inventory(1) and ok
+        return ok
+
+    def pooled():
+        target = pool.scans + len(readers)
+        while pool.scans < target:
+            pool.step()
+        return True
+
+    return [
+        ('scan-4-seq', sequential, None),
+        ('scan-4-pool', pooled, pool.start),
+    ]
+
+
+def main(iterations=50, latency_ms=2):
+    pn532_sim.install()
+    from NFCModule import NFC_Module
+
+    chip = pn532_sim.PN532Simulator(latency_ms=latency_ms)
+    bus = pn532_sim.SimI2C({pn532_sim.PN532_I2C_ADDRESS: chip})
+    nfc = NFC_Module(bus)
+
+    results = []
+    print(f"{'operation':<14}{'tps':>10}{'p50 us':>10}{'p99 us':>10}{'alloc B':>10}{'fail':>6}")
+    for name, op, setup in benchmarks(nfc, chip) + pool_benchmarks(latency_ms):
+        if setup is not None:
+            setup()
+        # Whole-card dumps are slow; keep the run time in check
+        count = max(1, iterations // 10) if 'dump' in name else iterations
+        res = run(name, op, count)
+        results.append(res)
+        print(f"{name:<14}{res['tps']:>10.1f}{res['p50_us']:>10}{res['p99_us']:>10}{res['alloc_per_op']:>10}{res['failures']:>6}")
+    return results
+
+
+if __name__ == '__main__':
+    args = [int(a) for a in sys.argv[1:3]]
+    main(*args)
@@ -0,0 +1,192 @@
+import time
+try:
+    from collections import deque
+except ImportError:
+    from ucollections import deque
+
+from NFCModule import (PN532_COMMAND_INLISTPASSIVETARGET, PN532_COMMAND_TIMEOUTS,
+                       PN532_DEFAULT_TIMEOUT_MS, PROFILE_FAST_POLL)
+
+EVENT_ARRIVED = 0
+EVENT_LEFT = 1
+
+POOL_QUEUE_SIZE = 16        # Events kept before the oldest is dropped
+POOL_LEAVE_SCANS = 2        # Consecutive empty scans before a card counts as gone
+POOL_IDLE_US = 250          # Pause after a pass in which no reader finished
+POOL_SCAN_TIMEOUT_MS = PN532_COMMAND_TIMEOUTS.get(PN532_COMMAND_INLISTPASSIVETARGET,
+                                                  PN532_DEFAULT_TIMEOUT_MS)
+
+
+class TagEvent:
+    """
+    A card arriving at or leaving one reader of a ReaderPool
+
+    Args:
+        kind (int): EVENT_ARRIVED or EVENT_LEFT
+        reader (int): Index of the reader in the pool
+        target (PN532Target): The card, as last reported by that reader
+        ticks (int): time.ticks_ms() when the scan completed
+    """
+    def __init__(self, kind, reader, target, ticks):
+        self.kind = kind
+        self.reader = reader
+        self.target = target
+        self.ticks = ticks
+
+    def __repr__(self):
+        kind = 'arrived' if self.kind == EVENT_ARRIVED else 'left'
+        return f"TagEvent({kind}, reader={self.reader}, uid={self.target.uid.hex().upper()})"
+
+
+class ReaderPool:
+    """
+    Round-robin scheduler for several PN532 readers
+
+    Every reader keeps an InListPassiveTarget in flight. step() visits the
+    readers in turn, collects the response of any chip that is ready and
+    sends it the next scan straight away, so the RF time of one chip is spent
+    talking to the others instead of waiting. Readers may share a bus or sit
+    on separate ones; each NFC_Module carries its own address.
+
+    Arrivals and departures from all readers go into one bounded queue, read
+    with get(). A card is reported as gone after POOL_LEAVE_SCANS empty scans
+    so a tag at the edge of the field does not flicker.
+
+    Example:
+        pool = ReaderPool([NFC_Module(i2c0), NFC_Module(i2c1, address=0x25)])
+        pool.start()
+        while True:
+            event = pool.get(1000)
+
+    Args:
+        readers (iterable): NFC_Module instances, already SAM-configured
+        maxtg (int): Targets per scan
+        queue_size (int): Events kept; the oldest is dropped past this
+        profile (str, optional): RF profile applied to every reader by start();
+            the default keeps an empty scan down to a few ms
+        timeout_ms (int): A scan still pending after this long is aborted and resent
+    """
+    def __init__(self, readers=(), maxtg=1, queue_size=POOL_QUEUE_SIZE, profile=PROFILE_FAST_POLL,
+                 timeout_ms=POOL_SCAN_TIMEOUT_MS):
+        self.readers = []
+        self.maxtg = maxtg
+        self.queue_size = queue_size
+        self.profile = profile
+        self.timeout_ms = timeout_ms
+        self.events = deque((), queue_size)
+        self._started = []  # ticks_ms the scan in flight was sent, None if not running
+        self._present = []  # Per reader: UID -> [PN532Target, empty scans since last seen]
+        self.scans = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.dropped = 0
+        for reader in readers:
+            self.add(reader)
+
+    def add(self, reader):
+        """
+        Add a reader; call start() afterwards, or it is started on the next step()
+
+        Returns:
+            int: Index reported in TagEvent.reader
+        """
+        self.readers.append(reader)
+        self._started.append(None)
+        self._present.append({})
+        return len(self.readers) - 1
+
+    def start(self):
+        """Apply the RF profile to every reader and put a scan in flight on each"""
+        for i, reader in enumerate(self.readers):
+            if self.profile is not None:
+                reader.apply_profile(self.profile)
+            self._start(i)
+
+    def stop(self):
+        """Abort the scans in flight"""
+        for i, reader in enumerate(self.readers):
+            if self._started[i] is not None:
+                reader.cancel_scan()
+                self._started[i] = None
+
+    def step(self):
+        """
+        Visit every reader once without waiting for any of them
+
+        Returns:
+            int: Number of scans that completed in this pass
+        """
+        done = 0
+        for i, reader in enumerate(self.readers):
+            started = self._started[i]
+            if started is None:
+                self._start(i)
+                continue
+            if not reader.scan_ready():
+                if time.ticks_diff(time.ticks_ms(), started) >= self.timeout_ms:
+                    self.timeouts += 1
+                    reader.cancel_scan()
+                    self._start(i)
+                continue
+            targets = reader.finish_scan()
+            now = time.ticks_ms()
+            self._start(i)
+            done += 1
+            if targets is None:
+                self.failures += 1
+                continue
+            self.scans += 1
+            self._update(i, targets, now)
+        return done
+
+    def get(self, timeout_ms=None):
+        """
+        Next event from any reader, running the scheduler until one arrives
+
+        Args:
+            timeout_ms (int, optional): Give up after this long; None waits forever
+
+        Returns:
+            TagEvent or None: None if the deadline passed first
+        """
+        start = time.ticks_ms()
+        while not len(self.events):
+            if timeout_ms is not None and time.ticks_diff(time.ticks_ms(), start) >= timeout_ms:
+                return None
+            if not self.step():
+                time.sleep_us(POOL_IDLE_US)
+        return self.events.popleft()
+
+    def present(self, reader):
+        """PN532Target records currently in the field of one reader"""
+        return [entry[0] for entry in self._present[reader].values()]
+
+    def _start(self, i):
+        if self.readers[i].start_scan(self.maxtg):
+            self._started[i] = time.ticks_ms()
+        else:
+            self.failures += 1
+            self._started[i] = None  # Sent again on the next pass
+
+    def _update(self, i, targets, now):
+        present = self._present[i]
+        if not targets and not present:
+            return  # Idle reader: the common case allocates nothing
+        for entry in present.values():
+            entry[1] += 1
+        for target in targets:
+            entry = present.get(target.uid)
+            if entry is None:
+                present[target.uid] = [target, 0]
+                self._push(EVENT_ARRIVED, i, target, now)
+            else:
+                entry[0] = target
+                entry[1] = 0
+        for uid in [uid for uid in present if present[uid][1] >= POOL_LEAVE_SCANS]:
+            self._push(EVENT_LEFT, i, present.pop(uid)[0], now)
+
+    def _push(self, kind, reader, target, now):
+        if len(self.events) >= self.queue_size:
+            self.events.popleft()
+            self.dropped += 1
+        self.events.append(TagEvent(kind, reader, target, now))
@@ -0,0 +1,171 @@
+import time
+
+from NFCModule import PROFILE_FAST_POLL, WAKE_I2C, WAKE_RF
+
+POWER_FAST_MS = 100         # Poll interval after a detection
+POWER_MAX_MS = 1600         # Longest interval once the field has been idle
+POWER_IDLE_POLLS = 10       # Empty polls at one interval before it doubles
+POWER_IRQ_SLICE_MS = 10     # IRQ pin check period while waiting for an RF wake-up
+
+
+class PowerManager:
+    """
+    Adaptive poll loop that keeps the PN532 in PowerDown between scans
+
+    Each poll wakes the chip, runs one InListPassiveTarget and, if nothing
+    answered, powers it down again with ``wake`` as wake-up sources. After
+    ``idle_polls`` empty polls at one interval the interval doubles, up to
+    ``max_ms``; a detection drops it straight back to ``fast_ms``. A card
+    that is found leaves the chip awake so the caller can talk to it; the
+    next poll puts it back to sleep if the card has gone.
+
+    Passive cards have no field of their own and are only seen at the next
+    poll. A phone or other active device does switch a field on: with
+    WAKE_RF and an IRQ pin on the driver that ends the wait at once.
+
+    The loop only stays low-power if an empty scan is short, so ``profile``
+    is applied here and again before every poll: PowerDown switches the
+    field off, and the caller may have changed profile to talk to a card.
+    Only settings that differ are sent.
+
+    Duty-cycle figures cover the chip: awake_us from each wake-up to the
+    next PowerDown, asleep_us the rest.
+
+    Args:
+        nfc (NFC_Module): Reader, SAM-configured
+        fast_ms (int): Interval after a detection
+        max_ms (int): Interval ceiling
+        idle_polls (int): Empty polls before the interval doubles
+        wake (int): WAKE_* sources passed to power_down()
+        sleep (callable, optional): Host wait in ms between polls, e.g.
+            machine.lightsleep; defaults to time.sleep_ms
+        maxtg (int): Targets per scan
+        profile (str): RF profile for the scans; PROFILE_FAST_POLL keeps an
+            empty scan, and so the time awake, to a few ms
+    """
+    def __init__(self, nfc, fast_ms=POWER_FAST_MS, max_ms=POWER_MAX_MS, idle_polls=POWER_IDLE_POLLS,
+                 wake=WAKE_I2C | WAKE_RF, sleep=None, maxtg=1, profile=PROFILE_FAST_POLL):
+        self.nfc = nfc
+        self.fast_ms = fast_ms
+        self.max_ms = max_ms
+        self.idle_polls = idle_polls
+        self.wake = wake | WAKE_I2C  # Without it only the reset pin could wake the chip
+        self.sleep = sleep if sleep is not None else time.sleep_ms
+        self.maxtg = maxtg
+        self.profile = profile
+        self.interval_ms = fast_ms
+        self._idle = 0
+        self.reset_stats()
+        if not nfc.apply_profile(profile):
+            self.failures += 1
+
+    def reset_stats(self):
+        """Clear the counters and start a new duty-cycle window"""
+        self.polls = 0
+        self.detections = 0
+        self.rf_wakeups = 0
+        self.failures = 0
+        self.awake_us = 0
+        self.asleep_us = 0
+        self._mark = time.ticks_us()
+
+    def poll(self):
+        """
+        One scan; powers the chip down again unless a card answered
+
+        Returns:
+            list or None: PN532Target records (empty if no card), None if the scan failed
+        """
+        self._account(self.nfc.asleep)
+        if not self.nfc.apply_profile(self.profile):
+            self.failures += 1
+        targets = self.nfc.inventory(self.maxtg)
+        self.polls += 1
+        if targets:
+            self.detections += 1
+            self._fast()
+            return targets
+        if targets is None:
+            self.failures += 1
+        self._idle += 1
+        if self._idle >= self.idle_polls and self.interval_ms < self.max_ms:
+            self.interval_ms = min(self.max_ms, self.interval_ms * 2)
+            self._idle = 0
+        if not self.nfc.power_down(self.wake):
+            self.failures += 1
+        self._account(False)  # Awake from the wake-up until the chip went down
+        return targets
+
+    def wait(self, timeout_ms=None):
+        """
+        Poll at the adaptive interval until a card is found
+
+        Args:
+            timeout_ms (int, optional): Give up after this long; None waits forever
+
+        Returns:
+            list: PN532Target records, empty if the deadline passed first
+        """
+        start = time.ticks_ms()
+        while True:
+            targets = self.poll()
+            if targets:
+                return targets
+            delay = self.interval_ms
+            if timeout_ms is not None:
+                left = timeout_ms - time.ticks_diff(time.ticks_ms(), start)
+                if left <= 0:
+                    return []
+                delay = min(delay, left)
+            self._sleep(delay)
+
+    def duty_cycle(self):
+        """Fraction of the window the chip was awake"""
+        self._account(self.nfc.asleep)
+        total = self.awake_us + self.asleep_us
+        return self.awake_us / total if total else 0.0
+
+    def as_dict(self):
+        """Snapshot of the counters, the current interval and the duty cycle"""
+        duty = self.duty_cycle()
+        return {
+            'polls': self.polls,
+            'detections': self.detections,
+            'rf_wakeups': self.rf_wakeups,
+            'failures': self.failures,
+            'interval_ms': self.interval_ms,
+            'awake_us': self.awake_us,
+            'asleep_us': self.asleep_us,
+            'duty_cycle': duty,
+        }
+
+    def _fast(self):
+        self.interval_ms = self.fast_ms
+        self._idle = 0
+
+    def _sleep(self, ms):
+        """Wait between polls; with an IRQ pin and WAKE_RF, return early on an RF wake-up"""
+        irq = self.nfc.irq
+        if irq is None or not self.wake & WAKE_RF or not self.nfc.asleep:
+            self.sleep(ms)
+            return
+        start = time.ticks_ms()
+        while True:
+            if irq.value() == 0:
+                self.rf_wakeups += 1
+                self._fast()
+                return
+            left = ms - time.ticks_diff(time.ticks_ms(), start)
+            if left <= 0:
+                return
+            self.sleep(min(left, POWER_IRQ_SLICE_MS))
+
+    def _account(self, asleep):
+        """Add the time since the last mark to the state the chip was in"""
+        now = time.ticks_us()
+        elapsed = time.ticks_diff(now, self._mark)
+        self._mark = now
+        if asleep:
+            self.asleep_us += elapsed
+        else:
+            self.awake_us += elapsed
@@ -0,0 +1,98 @@
+# Per-command counters, in the order they are stored
+STAT_FIELDS = ('calls', 'ack_failures', 'checksum_failures', 'timeouts', 'bus_errors',
+               'retries', 'nacks', 'aborts', 'resets')
+STAT_CALLS = 0
+STAT_ACK_FAILURES = 1
+STAT_CHECKSUM_FAILURES = 2
+STAT_TIMEOUTS = 3
+STAT_BUS_ERRORS = 4         # OSError from the I2C peripheral
+STAT_RETRIES = 5            # Transactions sent again
+STAT_NACKS = 6              # Corrupt frames re-requested with NACK
+STAT_ABORTS = 7             # Stale commands cancelled with an ACK frame
+STAT_RESETS = 8             # Reset pin pulses / bus re-inits
+
+# Latency histogram bucket upper bounds (us); one extra bucket catches the rest
+LATENCY_BUCKETS_US = (1000, 2000, 5000, 10000, 20000, 50000, 100000, 200000, 500000)
+
+
+class NFCStats:
+    """
+    Opt-in counters for a PN532 driver
+
+    Attach with NFC_Module.enable_stats(). Each command code gets one flat
+    list holding the STAT_FIELDS counters followed by two latency
+    histograms, one for successful and one for failed transactions, so
+    recording a transaction only touches list slots.
+    """
+    def __init__(self, buckets=LATENCY_BUCKETS_US):
+        self.buckets = buckets
+        self.reset()
+
+    def reset(self):
+        """Clear every counter"""
+        self.commands = {}
+        self.bytes_written = 0
+        self.bytes_read = 0
+
+    def _entry(self, cmd):
+        entry = self.commands.get(cmd)
+        if entry is None:
+            entry = self.commands[cmd] = [0] * (len(STAT_FIELDS) + 2 * (len(self.buckets) + 1))
+        return entry
+
+    def count(self, cmd, field):
+        """Increment one STAT_* counter of a command"""
+        self._entry(cmd)[field] += 1
+
+    def command(self, cmd, ok, elapsed_us):
+        """
+        Record one finished transaction
+
+        Args:
+            cmd (int): PN532 command code
+            ok (bool): Whether a valid response came back; selects the
+                success or the failure latency histogram
+            elapsed_us (int): Time from command write to decoded response, or
+                until the transaction was given up
+        """
+        entry = self._entry(cmd)
+        entry[STAT_CALLS] += 1
+        i = 0 if ok else len(self.buckets) + 1
+        for bound in self.buckets:
+            if elapsed_us <= bound:
+                break
+            i += 1
+        entry[len(STAT_FIELDS) + i] += 1
+
+    def as_dict(self):
+        """
+        Snapshot of all counters
+
+        Returns:
+            dict: ``bytes_written``, ``bytes_read`` and ``commands``, which maps
+            the command code (e.g. ``'0x40'``) to its counters and a
+            ``latency_us`` histogram of successful transactions keyed by
+            bucket bound (``'<=1000'``, ...), and ``failure_latency_us`` for
+            the failed ones
+        """
+        commands = {}
+        for cmd, entry in self.commands.items():
+            item = {}
+            for i in range(len(STAT_FIELDS)):
+                item[STAT_FIELDS[i]] = entry[i]
+            hist = self._histogram(entry, len(STAT_FIELDS))
+            item['latency_us'] = hist
+            item['failure_latency_us'] = self._histogram(entry, len(STAT_FIELDS) + len(self.buckets) + 1)
+            commands['0x%02X' % cmd] = item
+        return {
+            'bytes_written': self.bytes_written,
+            'bytes_read': self.bytes_read,
+            'commands': commands,
+        }
+
+    def _histogram(self, entry, base):
+        hist = {}
+        for i in range(len(self.buckets)):
+            hist['<=' + str(self.buckets[i])] = entry[base + i]
+        hist['>' + str(self.buckets[-1])] = entry[base + len(self.buckets)]
+        return hist
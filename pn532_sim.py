@@ -0,0 +1,732 @@
+"""
+Host-side PN532 simulator
+
+Lets NFC_Module and the demo scripts run under CPython:
+
+    import pn532_sim
+    bus = pn532_sim.install()          # machine/time stand-ins + PN532 at 0x24
+    bus.devices[0x24].add_card(pn532_sim.VirtualMifareClassic(b'\\x01\\x02\\x03\\x04'))
+
+    from NFCModule import NFC_Module
+    nfc = NFC_Module(bus)
+
+The simulator speaks the PN532 I2C framing (status byte, ACK/NACK, normal
+and error frames), answers the commands NFC_Module uses and models chip
+latency in wall-clock time.
+"""
+import sys
+import time
+
+PN532_I2C_ADDRESS = 0x24
+
+ACK_FRAME = b'\x00\x00\xFF\x00\xFF\x00'
+NACK_FRAME = b'\x00\x00\xFF\xFF\x00\x00'
+ERROR_FRAME = b'\x00\x00\xFF\x01\xFF\x7F\x81\x00'
+
+# InDataExchange / InCommunicateThru status codes
+STATUS_OK = 0x00
+STATUS_TIMEOUT = 0x01
+STATUS_MIFARE_ERROR = 0x14  # Authentication failure
+STATUS_NO_TARGET = 0x27     # Command not acceptable in current context
+STATUS_MI = 0x40            # More Information: a DEP payload continues in the next frame
+
+FIRMWARE_VERSION = b'\x32\x01\x06\x07'  # PN532 v1.6, all protocols
+
+# PowerDown wake-up sources
+WAKE_RF = 0x08
+WAKE_I2C = 0x80
+
+DEFAULT_KEY = b'\xFF\xFF\xFF\xFF\xFF\xFF'
+DEFAULT_ACCESS = b'\xFF\x07\x80\x69'
+
+
+# --- Stand-ins for MicroPython modules ---------------------------------------
+
+class Pin:
+    """machine.Pin stand-in; remembers the last value written"""
+    IN = 0
+    OUT = 1
+    PULL_UP = 2
+    IRQ_FALLING = 2
+    IRQ_RISING = 1
+
+    def __init__(self, id=None, mode=None, pull=None, value=1):
+        self.id = id
+        self._value = value
+
+    def init(self, *args, **kwargs):
+        pass
+
+    def value(self, v=None):
+        if v is None:
+            return self._value
+        self._value = 1 if v else 0
+
+    def on(self):
+        self._value = 1
+
+    def off(self):
+        self._value = 0
+
+    def irq(self, handler=None, trigger=None):
+        pass
+
+
+class SimI2C:
+    """
+    machine.I2C stand-in routing transfers to simulated devices by address
+
+    Args:
+        devices (dict, optional): I2C address -> device with write()/read_into()
+    """
+    def __init__(self, devices=None):
+        self.devices = devices if devices is not None else {}
+
+    def _device(self, addr):
+        dev = self.devices.get(addr)
+        if dev is None:
+            raise OSError(19)  # ENODEV, as MicroPython reports a missing device
+        return dev
+
+    def scan(self):
+        return sorted(self.devices)
+
+    def writeto(self, addr, buf, stop=True):
+        self._device(addr).write(buf)
+        return len(buf)
+
+    def readfrom_into(self, addr, buf, stop=True):
+        self._device(addr).read_into(buf)
+
+    def readfrom(self, addr, nbytes, stop=True):
+        buf = bytearray(nbytes)
+        self._device(addr).read_into(buf)
+        return bytes(buf)
+
+
+class SPI:
+    """machine.SPI stand-in with no device attached; reads return zeros"""
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def init(self, *args, **kwargs):
+        pass
+
+    def write(self, buf):
+        pass
+
+    def read(self, nbytes, write=0x00):
+        return bytes(nbytes)
+
+    def readinto(self, buf, write=0x00):
+        for i in range(len(buf)):
+            buf[i] = 0
+
+    def write_readinto(self, wbuf, rbuf):
+        self.readinto(rbuf)
+
+
+def _install_time():
+    """Add the MicroPython time functions CPython lacks"""
+    start = time.monotonic()
+    if not hasattr(time, 'ticks_ms'):
+        time.ticks_ms = lambda: int((time.monotonic() - start) * 1000)
+        time.ticks_us = lambda: int((time.monotonic() - start) * 1000000)
+        time.ticks_cpu = time.ticks_us
+        time.ticks_add = lambda ticks, delta: ticks + delta
+        time.ticks_diff = lambda a, b: a - b
+    if not hasattr(time, 'sleep_ms'):
+        time.sleep_ms = lambda ms: time.sleep(ms / 1000)
+        time.sleep_us = lambda us: time.sleep(us / 1000000)
+
+
+def install(bus=None):
+    """
+    Register ``machine`` and ``time`` stand-ins for CPython
+
+    Every ``machine.I2C(...)`` constructed afterwards returns ``bus`` so the
+    demo scripts talk to the simulator. Call before importing any module that
+    imports ``machine``.
+
+    Args:
+        bus (SimI2C, optional): Bus to hand out; by default one with a
+            PN532Simulator at address 0x24
+
+    Returns:
+        SimI2C: The shared bus
+    """
+    import types
+    _install_time()
+    if bus is None:
+        bus = SimI2C({PN532_I2C_ADDRESS: PN532Simulator()})
+    machine = types.ModuleType('machine')
+    machine.Pin = Pin
+    machine.I2C = lambda *args, **kwargs: bus
+    machine.SPI = SPI
+    machine.freq = lambda *args: 240000000
+    machine.lightsleep = lambda ms=0: time.sleep_ms(ms)
+    machine.idle = lambda: time.sleep_us(20)
+    sys.modules['machine'] = machine
+    return bus
+
+
+_install_time()
+
+
+# --- Virtual cards ------------------------------------------------------------
+
+class VirtualMifareClassic:
+    """
+    Mifare Classic 1K/4K with per-sector keys
+
+    Args:
+        uid (bytes): 4-byte UID
+        size (int): 1024 or 4096
+        keys (dict, optional): sector -> (key A, key B); unlisted sectors use FF x6
+    """
+    def __init__(self, uid, size=1024, keys=None):
+        self.uid = bytes(uid)
+        self.atqa = 0x0004 if size == 1024 else 0x0002
+        self.sak = 0x08 if size == 1024 else 0x18
+        self.ats = None
+        self.blocks = [bytearray(16) for _ in range(size // 16)]
+        self.blocks[0][:4] = self.uid
+        self.blocks[0][4] = self.uid[0] ^ self.uid[1] ^ self.uid[2] ^ self.uid[3]
+        keys = keys or {}
+        for sector in range(self.sectors()):
+            key_a, key_b = keys.get(sector, (DEFAULT_KEY, DEFAULT_KEY))
+            trailer = self.blocks[self.trailer(sector)]
+            trailer[0:6] = key_a
+            trailer[6:10] = DEFAULT_ACCESS
+            trailer[10:16] = key_b
+        self.reset()
+
+    def reset(self):
+        """Card leaves and re-enters the field"""
+        self.auth_sector = None
+        self.halted = False
+
+    def sectors(self):
+        return 16 if len(self.blocks) == 64 else 40
+
+    @staticmethod
+    def sector_of(block):
+        return block // 4 if block < 128 else 32 + (block - 128) // 16
+
+    def trailer(self, sector):
+        if sector < 32:
+            return sector * 4 + 3
+        return 128 + (sector - 32) * 16 + 15
+
+    def exchange(self, data):
+        """Handle one InDataExchange payload; returns (status, response bytes)"""
+        if self.halted:
+            return STATUS_TIMEOUT, b''
+        op = data[0]
+        if op in (0x60, 0x61):
+            block = data[1]
+            if block >= len(self.blocks):
+                return STATUS_MIFARE_ERROR, b''
+            sector = self.sector_of(block)
+            trailer = self.blocks[self.trailer(sector)]
+            key = trailer[0:6] if op == 0x60 else trailer[10:16]
+            if bytes(data[2:8]) != bytes(key) or bytes(data[8:12]) != self.uid[:4]:
+                self.auth_sector = None
+                self.halted = True  # Failed auth leaves the card mute until reselected
+                return STATUS_MIFARE_ERROR, b''
+            self.auth_sector = sector
+            return STATUS_OK, b''
+        if op in (0x30, 0xA0):
+            block = data[1]
+            if block >= len(self.blocks) or self.sector_of(block) != self.auth_sector:
+                self.halted = True
+                return STATUS_MIFARE_ERROR, b''
+            if op == 0x30:
+                out = bytearray(self.blocks[block])
+                if block == self.trailer(self.auth_sector):
+                    out[0:6] = bytes(6)  # Key A never reads back
+                return STATUS_OK, bytes(out)
+            if len(data) < 18:
+                return STATUS_MIFARE_ERROR, b''
+            self.blocks[block][:] = data[2:18]
+            return STATUS_OK, b''
+        return STATUS_MIFARE_ERROR, b''
+
+
+class VirtualNTAG:
+    """
+    NTAG21x / Ultralight Type 2 tag
+
+    Args:
+        uid (bytes): 7-byte UID
+        pages (int): 45 (NTAG213), 135 (NTAG215) or 231 (NTAG216)
+    """
+    STORAGE = {45: 0x0F, 135: 0x11, 231: 0x13}
+
+    def __init__(self, uid, pages=135):
+        self.uid = bytes(uid)
+        self.atqa = 0x0044
+        self.sak = 0x00
+        self.ats = None
+        self.pages = [bytearray(4) for _ in range(pages)]
+        self.pages[0][:3] = self.uid[:3]
+        self.pages[1][:4] = self.uid[3:7]
+        self.reset()
+
+    def reset(self):
+        self.halted = False
+
+    def exchange(self, data):
+        """Handle one raw tag command (READ, FAST_READ, WRITE, GET_VERSION)"""
+        op = data[0]
+        n = len(self.pages)
+        if op == 0x60:
+            return STATUS_OK, bytes([0x00, 0x04, 0x04, 0x02, 0x01, 0x00, self.STORAGE.get(n, 0x11), 0x03])
+        if op == 0x30:
+            page = data[1]
+            if page >= n:
+                return STATUS_MIFARE_ERROR, b''
+            return STATUS_OK, b''.join(bytes(self.pages[(page + i) % n]) for i in range(4))
+        if op == 0x3A:
+            start, end = data[1], data[2]
+            if start > end or end >= n:
+                return STATUS_MIFARE_ERROR, b''
+            return STATUS_OK, b''.join(bytes(self.pages[i]) for i in range(start, end + 1))
+        if op == 0xA2:
+            page = data[1]
+            if page < 3 or page >= n or len(data) < 6:
+                return STATUS_MIFARE_ERROR, b''
+            self.pages[page][:] = data[2:6]
+            return STATUS_OK, b''
+        return STATUS_MIFARE_ERROR, b''
+
+
+# --- P2P peers ----------------------------------------------------------------
+
+class VirtualP2PTarget:
+    """
+    NFC-DEP target in the field, for the simulated chip acting as initiator
+
+    Reassembles a chained request and answers it with ``handler(request)``
+    (an echo by default), chained in ``chunk``-byte pieces.
+    """
+    def __init__(self, handler=None, chunk=252, nfcid3=b'\x01\x02\x03\x04\x05\x06\x07\x08\x09\x0A'):
+        self.uid = bytes(nfcid3[:4])
+        self.atqa = 0x0044
+        self.sak = 0x40
+        self.ats = None
+        self.nfcid3 = bytes(nfcid3)
+        self.handler = handler or bytes
+        self.chunk = chunk
+        self.requests = []
+        self.reset()
+
+    def reset(self):
+        self._rx = bytearray()
+        self._tx = b''
+
+    def exchange(self, data, more=False):
+        """Handle one DEP information PDU; returns (status, response bytes)"""
+        if self._tx:
+            return self._next()  # Initiator pulling the rest of a chained reply
+        self._rx += data
+        if more:
+            return STATUS_OK, b''
+        request = bytes(self._rx)
+        self._rx = bytearray()
+        self.requests.append(request)
+        self._tx = bytes(self.handler(request))
+        return self._next()
+
+    def _next(self):
+        out, self._tx = self._tx[:self.chunk], self._tx[self.chunk:]
+        return (STATUS_MI if self._tx else STATUS_OK), out
+
+
+class VirtualP2PInitiator:
+    """
+    NFC-DEP initiator that activates the simulated chip in target mode,
+    sends ``payload`` in ``chunk``-byte pieces and records each reply
+    """
+    ATR_REQ = b'\x11\xD4\x00\x01\x02\x03\x04\x05\x06\x07\x08\x09\x00\x00\x00\x32\x00'
+
+    def __init__(self, payload=b'', chunk=252):
+        self.payload = bytes(payload)
+        self.chunk = chunk
+        self.replies = []
+        self.reset()
+
+    def reset(self):
+        self._tx = self.payload
+        self._rx = bytearray()
+
+    def get(self):
+        """TgGetData: next piece of the payload"""
+        out, self._tx = self._tx[:self.chunk], self._tx[self.chunk:]
+        return (STATUS_MI if self._tx else STATUS_OK), out
+
+    def put(self, data, more):
+        """TgSetData / TgSetMetaData: a piece of the reply"""
+        self._rx += data
+        if not more:
+            self.replies.append(bytes(self._rx))
+            self._rx = bytearray()
+        return STATUS_OK
+
+
+# --- The chip -----------------------------------------------------------------
+
+class PN532Simulator:
+    """
+    PN532 behind an I2C address
+
+    Args:
+        latency_ms (float): Time from ACK to response for most commands
+        command_latency (dict, optional): command code -> latency override (ms)
+        ack_latency_ms (float): Time from command frame to ACK
+        wake_latency_ms (float): Time from the access that wakes the chip out
+            of PowerDown until it answers; accesses before that are NAKed
+    """
+    def __init__(self, latency_ms=2, command_latency=None, ack_latency_ms=0.2, wake_latency_ms=1.5):
+        self.latency_ms = latency_ms
+        self.command_latency = command_latency or {}
+        self.ack_latency_ms = ack_latency_ms
+        self.wake_latency_ms = wake_latency_ms
+        self.cards = []
+        self.active = []      # Cards activated by the last InListPassiveTarget/InAutoPoll
+        self.handlers = {
+            0x02: self._get_firmware_version,
+            0x14: self._sam_configuration,
+            0x16: self._power_down,
+            0x4A: self._in_list_passive_target,
+            0x40: self._in_data_exchange,
+            0x42: self._in_communicate_thru,
+            0x60: self._in_autopoll,
+            0x12: self._set_parameters,
+            0x32: self._rf_configuration,
+            0x56: self._in_jump_for_dep,
+            0x8C: self._tg_init_as_target,
+            0x86: self._tg_get_data,
+            0x8E: self._tg_set_data,
+            0x94: self._tg_set_meta_data,
+        }
+        self.commands = []    # Command codes received, in order
+        self.frames_in = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.checksum_errors = 0
+        self._ack_at = None
+        self._out = None
+        self._out_at = 0
+        self._last = None
+        self._polling = False  # Endless InAutoPoll waiting for a card
+        self.initiator = None  # VirtualP2PInitiator in the field
+        self.params = 0x14     # SetParameters flags
+        self.rf_config = {}    # CfgItem -> last ConfigurationData
+        self.max_rty_passive = 0xFF  # MxRtyPassiveActivation; 0xFF waits for a card forever
+        self._listening = False  # TgInitAsTarget waiting for an initiator
+        self.asleep = False    # In PowerDown
+        self.wake_sources = 0  # WakeUpEnable of the last PowerDown
+        self.wake_irq = False  # GenerateIRQ of the last PowerDown
+        self.power_downs = 0
+        self.wakeups = 0
+        self._sleep_after_read = False  # PowerDown answered; sleep once it is read
+        self._wake_at = None   # Oscillator start-up in progress
+        self._irq_wake = False  # IRQ held low after a wake-up event
+
+    # Card population
+
+    def add_card(self, card):
+        self.cards.append(card)
+        if self._polling:
+            self._polling = False
+            self._answer(0x60, *self._in_autopoll(b''))
+        return card
+
+    def add_initiator(self, peer):
+        """Bring an NFC-DEP initiator into the field; it activates TgInitAsTarget"""
+        self.initiator = peer
+        self.external_field()
+        if self._listening:
+            self._listening = False
+            self._answer(0x8C, *self._tg_init_as_target(b''))
+        return peer
+
+    def _answer(self, cmd, delay, data):
+        """Late response to a command that was left waiting"""
+        self._out = self._last = self._encode(bytes([0xD5, cmd + 1]) + data)
+        self._out_at = self._now() + delay
+
+    def external_field(self):
+        """An active device switches its field on; wakes the chip if WAKE_RF is set"""
+        if self.asleep and self.wake_sources & WAKE_RF:
+            self._start_wake()
+            self._irq_wake = self.wake_irq
+
+    def _start_wake(self):
+        if self._wake_at is None:
+            self._wake_at = self._now() + self.wake_latency_ms
+
+    def _awake(self):
+        """Whether the chip answers on the bus; the first access of a sleeping chip starts waking it"""
+        if not self.asleep:
+            return True
+        if self._wake_at is None:
+            if self.wake_sources & WAKE_I2C:
+                self._start_wake()
+            return False
+        if self._now() < self._wake_at:
+            return False
+        self.asleep = False
+        self._wake_at = None
+        self.wakeups += 1
+        return True
+
+    def remove_card(self, card):
+        if card in self.cards:
+            self.cards.remove(card)
+        if card in self.active:
+            self.active.remove(card)
+        card.reset()
+
+    def irq_pin(self):
+        """Pin-like object mirroring the PN532 IRQ line (low while a frame is ready)"""
+        sim = self
+
+        class _IRQ(Pin):
+            def value(self, v=None):
+                return 0 if sim._ready() else 1
+
+        return _IRQ()
+
+    # I2C device interface
+
+    def _now(self):
+        return time.monotonic() * 1000
+
+    def _ready(self):
+        if self._irq_wake:
+            return True
+        if self.asleep:
+            return False
+        now = self._now()
+        if self._ack_at is not None:
+            return now >= self._ack_at
+        return self._out is not None and now >= self._out_at
+
+    def read_into(self, buf):
+        if not len(buf):
+            return
+        if not self._awake():
+            raise OSError(19)  # NAK, as MicroPython reports it
+        self._irq_wake = False
+        now = self._now()
+        if self._ack_at is not None and now >= self._ack_at:
+            frame = ACK_FRAME
+            if len(buf) > 1:
+                self._ack_at = None
+                self._out_at = max(self._out_at, now)
+        elif self._ack_at is None and self._out is not None and now >= self._out_at:
+            frame = self._out
+            if len(buf) > 1:
+                self._out = None
+                if self._sleep_after_read:
+                    self._sleep_after_read = False
+                    self.asleep = True
+                    self.power_downs += 1
+        else:
+            buf[0] = 0x00
+            for i in range(1, len(buf)):
+                buf[i] = 0x00
+            self.bytes_out += len(buf)
+            return
+        buf[0] = 0x01
+        for i in range(1, len(buf)):
+            buf[i] = frame[i - 1] if i - 1 < len(frame) else 0x00
+        self.bytes_out += len(buf)
+
+    def write(self, buf):
+        if not self._awake():
+            raise OSError(19)
+        self._irq_wake = False
+        buf = bytes(buf)
+        self.bytes_in += len(buf)
+        if buf == NACK_FRAME:
+            self._out = self._last
+            self._out_at = self._now()
+            return
+        if buf == ACK_FRAME:
+            self._ack_at = None  # Abort the running command
+            self._out = None
+            self._polling = False
+            self._listening = False
+            return
+        payload = self._decode(buf)
+        if payload is None:
+            self.checksum_errors += 1
+            return  # The real chip stays silent on a bad frame
+        self.frames_in += 1
+        cmd = payload[1]
+        self.commands.append(cmd)
+        self._polling = False
+        self._listening = False
+        now = self._now()
+        self._ack_at = now + self.ack_latency_ms
+        handler = self.handlers.get(cmd)
+        if handler is None:
+            out = ERROR_FRAME
+            delay = 0
+        else:
+            result = handler(payload[2:])
+            if result is None:
+                self._out = None  # No answer yet (e.g. endless InAutoPoll)
+                return
+            delay, data = result
+            out = self._encode(bytes([0xD5, cmd + 1]) + data)
+        self._out = self._last = out
+        self._out_at = self._ack_at + delay
+
+    @staticmethod
+    def _decode(buf):
+        if len(buf) < 7 or buf[0:3] != b'\x00\x00\xFF':
+            return None
+        length = buf[3]
+        if (length + buf[4]) & 0xFF or len(buf) < 5 + length + 1:
+            return None
+        payload = buf[5:5 + length]
+        if (sum(payload) + buf[5 + length]) & 0xFF or payload[0] != 0xD4 or length < 2:
+            return None
+        return payload
+
+    @staticmethod
+    def _encode(data):
+        return (bytes([0x00, 0x00, 0xFF, len(data), -len(data) & 0xFF]) + data +
+                bytes([-sum(data) & 0xFF, 0x00]))
+
+    def _latency(self, cmd):
+        return self.command_latency.get(cmd, self.latency_ms)
+
+    def _dep_latency(self, cmd, nbytes):
+        """Command latency plus air time at 424 kbit/s (424 bits per ms)"""
+        return self._latency(cmd) + nbytes * 8 / 424
+
+    # Command handlers: return (latency_ms, response payload) or None
+
+    def _get_firmware_version(self, params):
+        return self._latency(0x02), FIRMWARE_VERSION
+
+    def _sam_configuration(self, params):
+        return self._latency(0x14), b''
+
+    def _power_down(self, params):
+        if not params:
+            return self._latency(0x16), bytes([STATUS_NO_TARGET])
+        self.wake_sources = params[0]
+        self.wake_irq = len(params) > 1 and params[1] & 0x01
+        self._sleep_after_read = True  # The response still goes out first
+        self.active = []
+        for card in self.cards:
+            card.reset()  # The field drops
+        return self._latency(0x16), b'\x00'
+
+    def _target_record(self, tg, card):
+        rec = bytes([tg, card.atqa >> 8, card.atqa & 0xFF, card.sak, len(card.uid)]) + card.uid
+        if card.ats is not None:
+            rec += bytes([len(card.ats) + 1]) + card.ats
+        return rec
+
+    def _activate(self, maxtg):
+        self.active = []
+        for card in self.cards:
+            if len(self.active) >= maxtg:
+                break
+            card.reset()
+            self.active.append(card)
+        return self.active
+
+    def _set_parameters(self, params):
+        self.params = params[0]
+        return self._latency(0x12), b''
+
+    def _rf_configuration(self, params):
+        self.rf_config[params[0]] = bytes(params[1:])
+        if params[0] == 0x05 and len(params) >= 4:
+            self.max_rty_passive = params[3]
+        return self._latency(0x32), b''
+
+    def _in_list_passive_target(self, params):
+        maxtg = min(params[0], 2) if params else 1
+        if not self.cards:
+            if self.max_rty_passive == 0xFF:
+                return None  # Keeps trying to activate a card; the host times out
+            return self._latency(0x4A) * (self.max_rty_passive + 1), b'\x00'
+        active = self._activate(maxtg)
+        out = bytes([len(active)])
+        for i, card in enumerate(active):
+            out += self._target_record(i + 1, card)
+        return self._latency(0x4A), out
+
+    def _card(self, tg):
+        if 1 <= tg <= len(self.active):
+            return self.active[tg - 1]
+        return None
+
+    def _in_data_exchange(self, params):
+        card = self._card(params[0] & 0x3F)
+        if card is None:
+            return self._latency(0x40), bytes([STATUS_NO_TARGET])
+        if isinstance(card, VirtualP2PTarget):
+            status, data = card.exchange(params[1:], bool(params[0] & STATUS_MI))
+            return self._dep_latency(0x40, len(params) - 1 + len(data)), bytes([status]) + data
+        status, data = card.exchange(params[1:])
+        return self._latency(0x40), bytes([status]) + data
+
+    def _in_jump_for_dep(self, params):
+        for card in self.cards:
+            if isinstance(card, VirtualP2PTarget):
+                card.reset()
+                self.active = [card]
+                # Status, Tg, NFCID3t, DIDt, BSt, BRt, TO, PPt
+                return self._latency(0x56), b'\x00\x01' + card.nfcid3 + b'\x00\x00\x00\x0E\x32'
+        return self._latency(0x56), bytes([STATUS_TIMEOUT])
+
+    def _tg_init_as_target(self, params):
+        if self.initiator is None:
+            self._listening = True
+            return None  # Waits until an initiator arrives or the host aborts
+        self.initiator.reset()
+        # Mode: 424 kbps, DEP, active framing; then the ATR_REQ that activated us
+        return self._latency(0x8C), b'\x25' + self.initiator.ATR_REQ
+
+    def _tg_get_data(self, params):
+        if self.initiator is None:
+            return self._latency(0x86), bytes([STATUS_NO_TARGET])
+        status, data = self.initiator.get()
+        return self._dep_latency(0x86, len(data)), bytes([status]) + data
+
+    def _tg_set_data(self, params, more=False):
+        cmd = 0x94 if more else 0x8E
+        if self.initiator is None:
+            return self._latency(cmd), bytes([STATUS_NO_TARGET])
+        return self._dep_latency(cmd, len(params)), bytes([self.initiator.put(params, more)])
+
+    def _tg_set_meta_data(self, params):
+        return self._tg_set_data(params, True)
+
+    def _in_communicate_thru(self, params):
+        card = self.active[0] if self.active else None
+        if card is None:
+            return self._latency(0x42), bytes([STATUS_NO_TARGET])
+        status, data = card.exchange(params)
+        return self._latency(0x42), bytes([status]) + data
+
+    def _in_autopoll(self, params):
+        if not self.cards:
+            if params and params[0] != 0xFF:
+                return params[0] * params[1] * 150, b'\x00'
+            self._polling = True
+            return None  # Keeps polling until a card arrives or the host aborts
+        active = self._activate(1)
+        rec = self._target_record(1, active[0])
+        kind = 0x20 if active[0].ats is not None else 0x10
+        return self._latency(0x60), bytes([1, kind, len(rec)]) + rec
@@ -2,6 +2,7 @@ from time import sleep_ms
 from machine import Pin, SPI
 #from lib.rfid.mfrc522 import MFRC522
 from mfrc522 import MFRC522
+from mfrc522_session import ReaderSession
 
 sck = Pin(18, Pin.OUT)
 mosi = Pin(23, Pin.OUT)
@@ -26,15 +27,16 @@ print("hi init")
 #                     sleep_ms(100)
 #     except KeyboardInterrupt:
 #         print("Bye")
+_session = None
+
 def do_read():
-    rdr = MFRC522(spi, sda)
-    uid = None
-    
-    (stat, tag_type) = rdr.request(rdr.REQIDL)
-    if stat == rdr.OK:
-        (stat, raw_uid) = rdr.anticoll()
-        if stat == rdr.OK:
-            uid = ("0x%02x%02x%02x%02x" % (raw_uid[0], raw_uid[1], raw_uid[2], raw_uid[3]))
-            return int(uid, 16)
+    """UID of the card in the field as an int, or None; the reader is set up on the first call"""
+    global _session
+    if _session is None:
+        _session = ReaderSession(MFRC522(spi, sda))
+
+    target = _session.poll()
+    if target is not None:
+        return int.from_bytes(target.uid, 'big')
     
     return None
\ No newline at end of file
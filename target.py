@@ -1,15 +1,14 @@
 from machine import I2C, Pin
 import time
-from NFCModule import NFC_Module  
-import testNFC  
+from NFCModule import NFC_Module, PROFILE_P2P
 
 # Initialize I2C and NFC module
 i2c = I2C(0, scl=Pin(22), sda=Pin(21))  # Adjust pins for your setup
 nfc = NFC_Module(i2c)
 
 # Define RX and TX buffers
-tx_buf = b"Hi, This message comes from NFC TARGET."
-rx_buf = bytearray(50)  # Buffer for received data
+tx_buf = b"Hi, This message comes from NFC TARGET. " * 25  # ~1 KB, sent in chained frames
+rx_buf = bytearray(2048)  # Buffer for received data
 
 def setup():
     """Setup NFC module as a Target"""
@@ -27,29 +26,34 @@ def setup():
     print(f"Firmware ver. {(versiondata >> 16) & 0xFF}.{(versiondata >> 8) & 0xFF}")
     
     # Configure SAM (Set normal mode)
-    testNFC.configure_sam_debug()
-#     if not nfc.sam_configuration():
-#         print("Failed to configure SAM mode")
-#         while True:
-#             pass  # Halt execution
+    if not nfc.sam_configuration():
+        print("Failed to configure SAM mode")
+        while True:
+            pass  # Halt execution
+    
+    # Collision avoidance and DEP timeouts for peer-to-peer
+    nfc.apply_profile(PROFILE_P2P)
 
 def loop():
     """Main loop to handle P2P Target mode"""
     print("Waiting for an Initiator...")
     
     # Initialize as Target
-    if nfc.P2PTargetInit():
+    if nfc.p2p_target_init():
         print("Initiator is sensed.")
         
-        # Prepare to send and receive data
-        tx_len = len(tx_buf)
+        # Receive the initiator's payload, then answer it
+        rx_len = nfc.p2p_target_receive(rx_buf)
+        if rx_len is None:
+            print("Failed to receive data.")
+            return
+        print(f"Data Received ({rx_len} bytes, {nfc.p2p_throughput()} B/s):")
+        print(bytes(rx_buf[:rx_len]).decode('utf-8'))  # Assuming received data is UTF-8 encoded
         
-        # Transmit and receive data
-        if nfc.P2PTargetTxRx(tx_buf, tx_len, rx_buf):
-            print("Data Received:")
-            print(rx_buf.decode('utf-8'))  # Assuming received data is UTF-8 encoded
+        if nfc.p2p_target_send(tx_buf):
+            print(f"Sent {len(tx_buf)} bytes in {nfc.p2p_us // 1000} ms")
         else:
-            print("Failed to send/receive data.")
+            print("Failed to send data.")
     else:
         print("No Initiator detected.")
 
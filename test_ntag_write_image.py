@@ -0,0 +1,69 @@
+"""
+ntag_write_image against the PN532 simulator
+
+    python -m pytest test_ntag_write_image.py
+"""
+import asyncio
+
+import pn532_sim
+
+pn532_sim.install()
+
+from AsyncNFCModule import AsyncNFC_Module
+from NFCModule import NFC_Module, NTAG_PAGE_SIZE
+
+NTAG_UID = b'\x04\x11\x22\x33\x44\x55\x66'
+NTAG215_PAGES = 135
+NTAG215_CONFIG = range(0x82, 0x87)  # Dynamic lock bytes, CFG0, CFG1, PWD, PACK
+
+
+def _reader(driver=NFC_Module):
+    chip = pn532_sim.PN532Simulator()
+    tag = chip.add_card(pn532_sim.VirtualNTAG(NTAG_UID, NTAG215_PAGES))
+    for page in NTAG215_CONFIG:
+        tag.pages[page][:] = bytes((page,)) * NTAG_PAGE_SIZE
+    tag.pages[2][2:4] = b'\x00\x00'
+    tag.pages[3][:] = b'\xE1\x10\x3E\x00'
+    return driver(pn532_sim.SimI2C({pn532_sim.PN532_I2C_ADDRESS: chip})), tag
+
+
+def _full_image():
+    return bytes([0xA5]) * (NTAG215_PAGES * NTAG_PAGE_SIZE)
+
+
+def _check_untouched(tag):
+    for page in NTAG215_CONFIG:
+        assert tag.pages[page] == bytes((page,)) * NTAG_PAGE_SIZE
+    assert tag.pages[2][2:4] == b'\x00\x00'
+    assert tag.pages[3] == b'\xE1\x10\x3E\x00'
+
+
+def test_full_image_leaves_config_pages():
+    nfc, tag = _reader()
+    nfc.in_list_passive_target()
+    assert nfc.ntag_write_image(0, _full_image()) == []
+    assert nfc.write_blocks == NTAG215_CONFIG[0] - 4
+    assert all(tag.pages[page] == b'\xA5\xA5\xA5\xA5' for page in range(4, NTAG215_CONFIG[0]))
+    _check_untouched(tag)
+
+
+def test_full_image_leaves_config_pages_async():
+    nfc, tag = _reader(AsyncNFC_Module)
+
+    async def run():
+        await nfc.in_list_passive_target()
+        return await nfc.ntag_write_image(0, _full_image())
+
+    assert asyncio.run(run()) == []
+    assert nfc.write_blocks == NTAG215_CONFIG[0] - 4
+    _check_untouched(tag)
+
+
+def test_allow_config_writes_config_pages():
+    nfc, tag = _reader()
+    nfc.in_list_passive_target()
+    image = bytearray(_full_image())
+    # UID, BCC and static lock bytes as they are
+    image[0:3 * NTAG_PAGE_SIZE] = b''.join(bytes(page) for page in tag.pages[0:3])
+    assert nfc.ntag_write_image(0, image, allow_config=True) == []
+    assert all(tag.pages[page] == b'\xA5\xA5\xA5\xA5' for page in NTAG215_CONFIG)